@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Benchmark every stage of the emission factor pipeline offline.
+
+Stages are timed on the IESO reports bundled in ``data/IESO/<year>/`` and on synthetic
+inputs built from one bundled month, scaled up in generators and in hours (a scale of
+100 means 10x the generators over 10x the days). Every case runs in its own process so
+that its peak RSS is not inflated by earlier cases.
+
+Each case records the best wall time over ``--repeat`` runs, the peak RSS of its process
+(``setup_rss_mb`` is the peak before the timed stage started) and the rows processed per
+second: parsed generator rows for ``parse``, ``aggregate`` and ``transform``, hourly
+timesteps for ``supply_ef`` and ``consumption_ef``.
+
+Example:
+    # Record a baseline, then flag cases that got more than 20% slower or larger
+    python benchmarks/bench_pipeline.py --output benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --compare benchmarks/baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "src"))
+
+from ontario_ef import pipeline as ef  # noqa: E402
+
+
+STAGES = ["parse", "aggregate", "transform", "supply_ef", "consumption_ef"]
+DEFAULT_SCALES = [10, 100]
+SYNTHETIC_BASE_YEAR = 2020
+MEASUREMENTS = ("Capability", "Output", "Forecast", "Available Capacity")
+
+
+### 1. Inputs
+def available_years():
+    """Return the years with generator reports in ``data/IESO``."""
+    ieso_dir = os.path.join(REPO_DIR, "data", "IESO")
+    return sorted(int(name) for name in os.listdir(ieso_dir) if name.isdigit() and os.path.isdir(os.path.join(ieso_dir, name, "Generator")))
+
+def split_scale(scale):
+    """Split a scale into ``(generator factor, day factor)`` with factors as close as possible."""
+    generator_factor = max(f for f in range(1, math.isqrt(scale) + 1) if scale % f == 0)
+    return scale // generator_factor, generator_factor
+
+def write_generator_report(path, df):
+    """Write parsed generator rows back out in the ``PUB_GenOutputCapabilityMonth`` layout."""
+    with open(path, "w", newline="") as f:
+        f.write("\\\\Generator Output Capability Month Report,,,,,,,,,,,,,,,,,,,,,,,,,,,\n")
+        f.write("\\\\Created at 2000-01-01 00:00:00,,,,,,,,,,,,,,,,,,,,,,,,,,,\n")
+        f.write("\\\\For Synthetic,,,,,,,,,,,,,,,,,,,,,,,,,,,\n")
+        f.write(",".join(ef.GENERATOR_COLUMNS) + "\n")
+        df.assign(Trailing="").to_csv(f, header=False, index=False, float_format="%.0f")
+
+def build_synthetic_inputs(scale, work_dir):
+    """
+    Write a synthetic dataset built from January of ``SYNTHETIC_BASE_YEAR``.
+
+    Generators are copied under new names and the month is repeated over consecutive
+    days, one generator report per repeat. Demand and trade flows are tiled to match.
+
+    Returns:
+        dict: Description of the dataset, passed on to the case processes.
+    """
+    generator_factor, day_factor = split_scale(scale)
+    dataset_dir = os.path.join(work_dir, f"synthetic-{scale}x")
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    generator_files, (_, demand_path), (_, trade_flow_path) = ef.year_source_files(SYNTHETIC_BASE_YEAR)
+    month = ef.parse_and_clean_generator_month(generator_files[0][1], MEASUREMENTS)
+    month_days = pd.to_datetime(month["Delivery Date"])
+    days_in_month = month_days.dt.day.max()
+
+    copies = []
+    for copy in range(generator_factor):
+        suffix = "" if copy == 0 else f" #{copy}"
+        copies.append(month.assign(Generator=month["Generator"].astype(str) + suffix))
+    scaled_month = pd.concat(copies, ignore_index=True)
+    scaled_days = pd.to_datetime(scaled_month["Delivery Date"])
+
+    paths = []
+    for repeat in range(day_factor):
+        path = os.path.join(dataset_dir, f"PUB_GenOutputCapabilityMonth_synthetic_{repeat:03d}.csv")
+        shifted = scaled_month.assign(**{"Delivery Date": (scaled_days + pd.Timedelta(days=int(repeat * days_in_month))).dt.strftime("%Y-%m-%d")})
+        write_generator_report(path, shifted)
+        paths.append(path)
+
+    # Demand and trade flows of the same month, repeated over the synthetic days
+    hours = days_in_month * 24
+    dates = np.repeat(pd.date_range(month_days.min(), periods=days_in_month * day_factor, freq="D").strftime("%Y-%m-%d"), 24)
+    demand = ef.parse_and_clean_demand(demand_path).iloc[:hours]
+    demand = pd.concat([demand] * day_factor, ignore_index=True).assign(Date=dates)
+    trade_flow = ef.transform_trade_flow(ef.parse_and_clean_trade_flow(trade_flow_path)).iloc[:hours]
+    trade_flow = pd.concat([trade_flow] * day_factor, ignore_index=True).assign(Date=dates)
+
+    demand_path = os.path.join(dataset_dir, "demand.pkl")
+    trade_flow_path = os.path.join(dataset_dir, "trade_flow.pkl")
+    demand.to_pickle(demand_path)
+    trade_flow.to_pickle(trade_flow_path)
+
+    return {
+        "name": f"synthetic-{scale}x",
+        "generator_files": paths,
+        "demand": demand_path,
+        "trade_flow": trade_flow_path,
+        "generator_factor": generator_factor,
+        "day_factor": day_factor,
+    }
+
+def real_inputs(year):
+    """Describe the bundled dataset of ``year``."""
+    return {"name": f"ieso-{year}", "year": year}
+
+
+### 2. Stages
+def load_generator_rows(dataset):
+    """Parse and concatenate the generator reports of ``dataset``."""
+    if "year" in dataset:
+        return ef.aggregate_generator_data(dataset["year"], download=False, jobs=1)
+    return ef.concat_generator_months([ef.parse_and_clean_generator_month(path) for path in dataset["generator_files"]])
+
+def load_demand_and_trade(dataset):
+    """Return the demand and transformed trade flow frames of ``dataset``."""
+    if "year" in dataset:
+        _, (_, demand_path), (_, trade_flow_path) = ef.year_source_files(dataset["year"])
+        return ef.parse_and_clean_demand(demand_path), ef.transform_trade_flow(ef.parse_and_clean_trade_flow(trade_flow_path))
+    return pd.read_pickle(dataset["demand"]), pd.read_pickle(dataset["trade_flow"])
+
+def prepare_stage(stage, dataset):
+    """
+    Build the inputs of ``stage`` outside the timed region.
+
+    Returns:
+        callable: Runs the stage once.
+        int: Rows processed by one run.
+    """
+    if "year" in dataset:
+        generator_paths = [path for _, path in ef.year_source_files(dataset["year"])[0]]
+    else:
+        generator_paths = dataset["generator_files"]
+
+    if stage == "parse":
+        rows = sum(len(ef.parse_and_clean_generator_month(path)) for path in generator_paths)
+        return lambda: [ef.parse_and_clean_generator_month(path) for path in generator_paths], rows
+
+    raw = load_generator_rows(dataset)
+    if stage == "aggregate":
+        return lambda: load_generator_rows(dataset), len(raw)
+    if stage == "transform":
+        return lambda: ef.transform_generator_data(raw), len(raw)
+
+    emission_rates = ef.get_emission_rates(interactive=False)
+    transformed = ef.transform_generator_data(raw).fillna(0)
+    del raw
+    if stage == "supply_ef":
+        return lambda: ef.calculate_supply_based_ef(transformed, emission_rates), len(transformed)
+
+    neighboring_emission_factors = ef.get_neighboring_emission_factors(interactive=False)
+    demand_df, transformed_trade_flow = load_demand_and_trade(dataset)
+    supplybased_ef, total_output_df = ef.calculate_supply_based_ef(transformed, emission_rates)
+    del transformed
+    return (
+        lambda: ef.calculate_consumption_based_ef(supplybased_ef, demand_df, transformed_trade_flow, neighboring_emission_factors, total_output_df),
+        len(supplybased_ef)
+    )
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_case(stage, dataset, repeat):
+    """Time ``stage`` on ``dataset`` in the current process."""
+    os.chdir(REPO_DIR)
+    run, rows = prepare_stage(stage, dataset)
+    setup_rss = peak_rss_mb()
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start_time)
+
+    wall = min(timings)
+    return {
+        "wall_s": wall,
+        "rows": rows,
+        "rows_per_s": rows / wall if wall > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "setup_rss_mb": setup_rss,
+        "repeat": repeat,
+    }
+
+def run_case_subprocess(stage, dataset, repeat):
+    """Run one case in a fresh interpreter and return its measurements."""
+    with tempfile.NamedTemporaryFile("r", suffix=".json", delete=False) as f:
+        result_path = f.name
+    try:
+        command = [sys.executable, os.path.abspath(__file__), "--run-case", stage, json.dumps(dataset), str(repeat), result_path]
+        process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if process.returncode != 0:
+            return {"error": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit code {process.returncode}"}
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(result_path)
+
+
+### 3. Baselines
+def run_benchmarks(years, scales, stages, repeat, work_dir):
+    """Run every stage on every dataset, returning the results keyed by ``dataset/stage``."""
+    os.chdir(REPO_DIR)
+    datasets = [real_inputs(year) for year in years]
+    for scale in scales:
+        print(f"Building synthetic inputs at {scale}x...")
+        datasets.append(build_synthetic_inputs(scale, work_dir))
+
+    results = {}
+    for dataset in datasets:
+        for stage in stages:
+            case = f"{dataset['name']}/{stage}"
+            results[case] = run_case_subprocess(stage, dataset, repeat)
+            print(format_result(case, results[case]))
+
+    return results
+
+def format_result(case, result):
+    if "error" in result:
+        return f"{case:<36} failed: {result['error']}"
+    return (f"{case:<36} {result['wall_s']:9.3f} s {result['peak_rss_mb']:9.1f} MB "
+            f"{result['rows_per_s'] or 0:14,.0f} rows/s")
+
+def compare_results(baseline, results, threshold):
+    """
+    Compare ``results`` with the ``baseline`` results.
+
+    Returns:
+        list: Regression messages for cases whose wall time or peak RSS grew by more
+        than ``threshold`` (e.g. 0.2 for 20%), or that failed.
+    """
+    regressions = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base is None or "error" in base:
+            continue
+        if "error" in result:
+            regressions.append(f"{case}: failed ({result['error']})")
+            continue
+        for metric, unit in (("wall_s", "s"), ("peak_rss_mb", "MB")):
+            if result[metric] > base[metric] * (1 + threshold):
+                change = result[metric] / base[metric] - 1
+                regressions.append(f"{case}: {metric} {base[metric]:.3f} -> {result[metric]:.3f} {unit} (+{change:.0%})")
+    return regressions
+
+def environment_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+### 4. Command line
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the emission factor pipeline stages.")
+    parser.add_argument("--years", type=ef.parse_years, default=None, help="Bundled years to benchmark (default: every year in data/IESO).")
+    parser.add_argument("--scales", type=int, nargs="*", default=DEFAULT_SCALES, help="Synthetic input scales (default: 10 100).")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is kept.")
+    parser.add_argument("--output", help="Write the results to this JSON baseline.")
+    parser.add_argument("--compare", help="Flag regressions against this JSON baseline.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative growth of wall time or peak RSS reported as a regression.")
+    parser.add_argument("--work-dir", help="Directory for the synthetic inputs (default: a temporary directory).")
+    parser.add_argument("--run-case", nargs=4, metavar=("STAGE", "DATASET", "REPEAT", "RESULT"), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.run_case:
+        stage, dataset, repeat, result_path = args.run_case
+        result = run_case(stage, json.loads(dataset), int(repeat))
+        with open(result_path, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    years = args.years if args.years is not None else available_years()
+    start_time = time.time()
+    if args.work_dir:
+        results = run_benchmarks(years, args.scales, args.stages, args.repeat, os.path.abspath(args.work_dir))
+    else:
+        with tempfile.TemporaryDirectory(prefix="ef-bench-") as work_dir:
+            results = run_benchmarks(years, args.scales, args.stages, args.repeat, work_dir)
+    print(f"Benchmarks finished in {time.time() - start_time:.1f} s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment_info(), "results": results}, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline["results"], results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions against {args.compare} (threshold {args.threshold:.0%}).")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
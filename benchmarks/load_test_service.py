@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Load-test the emission factor HTTP service on localhost.
+
+The service (``src/ef_service.py``) is started in a subprocess on a free local port and
+each workload is run for ``--duration`` seconds over ``--connections`` concurrent
+keep-alive connections. Requests per second and latency percentiles are printed per
+workload. By default the service reads synthetic hourly EFs written to a temporary
+directory, so no computed output is needed; pass ``--output-dir`` (and ``--store``) to
+test against real results.
+
+Example:
+    python benchmarks/load_test_service.py --connections 32 --duration 5 --output benchmarks/service.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE = os.path.join(REPO_DIR, "src", "ef_service.py")
+
+WORKLOADS = ["point", "range", "aggregate", "batch"]
+DEFAULT_YEARS = [2020, 2021, 2022, 2023, 2024]
+
+
+### 1. Service
+def write_synthetic_outputs(out_dir, years=DEFAULT_YEARS, seed=0):
+    """Write ``Consumption-based_EF_<year>.csv`` files with random hourly EFs."""
+    rng = np.random.default_rng(seed)
+    for year in years:
+        days = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D").strftime("%Y-%m-%d")
+        pd.DataFrame({
+            "Delivery Date": np.repeat(days, 24),
+            "Hour": np.tile(np.arange(1, 25), len(days)),
+            "Consumption-based EF (g CO2e/kWh)": rng.uniform(5, 150, len(days) * 24),
+        }).to_csv(os.path.join(out_dir, f"Consumption-based_EF_{year}.csv"), index=False)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_service(port, store, output_dir, cache_size):
+    """Start the service and wait until it accepts connections."""
+    process = subprocess.Popen(
+        [sys.executable, SERVICE, "--port", str(port), "--store", store, "--output-dir", output_dir,
+         "--cache-size", str(cache_size)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The service exited with code {process.returncode}.")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The service did not start within 60 s.")
+
+
+### 2. Client
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client connection."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(self, method, target, body=b""):
+        self.writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, await self.reader.readexactly(length)
+
+    def close(self):
+        self.writer.close()
+
+def request_factory(workload, years, batch_size, rng):
+    """Return a function drawing random ``(method, target, body)`` requests of ``workload``."""
+    first, last = datetime(min(years), 1, 1), datetime(max(years) + 1, 1, 1)
+    minutes = int((last - first) / timedelta(minutes=1))
+
+    def random_time():
+        return (first + timedelta(minutes=rng.randrange(minutes))).isoformat()
+
+    def point():
+        return "GET", f"/ef?time={random_time()}", b""
+
+    def day_range():
+        start = first + timedelta(days=rng.randrange(minutes // (24 * 60)))
+        return "GET", f"/range?start={start.isoformat()}&end={(start + timedelta(days=1)).isoformat()}", b""
+
+    def aggregate():
+        # A handful of popular queries, as served from the LRU cache
+        return "GET", f"/aggregate?period={rng.choice(['month', 'year', 'hour'])}&how={rng.choice(['mean', 'max'])}", b""
+
+    def batch():
+        return "POST", "/batch", json.dumps({"times": [random_time() for _ in range(batch_size)]}).encode()
+
+    return {"point": point, "range": day_range, "aggregate": aggregate, "batch": batch}[workload]
+
+async def run_workload(port, workload, connections, duration, years, batch_size, seed):
+    """Send requests over ``connections`` connections for ``duration`` seconds."""
+    latencies, errors = [], 0
+    pools = []
+    for i in range(connections):
+        rng = random.Random(seed + i)
+        next_request = request_factory(workload, years, batch_size, rng)
+        pools.append((rng, [next_request() for _ in range(64)]))
+    deadline = time.perf_counter() + duration
+
+    async def worker(i):
+        nonlocal errors
+        rng, requests = pools[i]
+        connection = await Connection.open(port)
+        try:
+            while time.perf_counter() < deadline:
+                method, target, body = rng.choice(requests)
+                start = time.perf_counter()
+                status, _ = await connection.request(method, target, body)
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    count = len(latencies)
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99]) if count else (np.nan,) * 3
+    return {
+        "workload": workload,
+        "requests": count,
+        "errors": errors,
+        "requests_per_s": count / elapsed,
+        "timestamps_per_s": count * (batch_size if workload == "batch" else 1) / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+### 3. Command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the emission factor HTTP service on localhost.")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=WORKLOADS, help="Workloads to run.")
+    parser.add_argument("--connections", type=int, default=16, help="Concurrent keep-alive connections.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per workload.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Timestamps per batch request.")
+    parser.add_argument("--output-dir", default=None, help="Output directory served (default: synthetic 2020-2024 EFs).")
+    parser.add_argument("--store", default="", help="Hourly EF store served along with --output-dir.")
+    parser.add_argument("--cache-size", type=int, default=256, help="LRU cache size of the service.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random requests.")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ef_service_") as work_dir:
+        output_dir = args.output_dir
+        years = DEFAULT_YEARS
+        if output_dir is None:
+            output_dir = work_dir
+            write_synthetic_outputs(output_dir, years, args.seed)
+
+        port = free_port()
+        service = start_service(port, args.store, output_dir, args.cache_size)
+        try:
+            results = []
+            for workload in args.workloads:
+                result = asyncio.run(run_workload(port, workload, args.connections, args.duration, years, args.batch_size, args.seed))
+                results.append(result)
+                print(f"{workload:<10} {result['requests_per_s']:>9,.0f} req/s {result['timestamps_per_s']:>11,.0f} timestamps/s "
+                      f"p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:6.2f} ms  p99 {result['p99_ms']:6.2f} ms"
+                      f"{'  errors ' + str(result['errors']) if result['errors'] else ''}")
+        finally:
+            service.terminate()
+            service.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"connections": args.connections, "duration_s": args.duration, "batch_size": args.batch_size,
+                       "results": results}, f, indent=2)
+        print(f"Results saved to: {args.output}")
+    return 1 if any(result["errors"] for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
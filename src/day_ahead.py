@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Command line entry point of the day-ahead emission factor forecast.
+
+The implementation lives in ``ontario_ef.day_ahead``; see its docstring for the method.
+
+Example:
+    python src/day_ahead.py --date 2024-12-31
+    python src/day_ahead.py --backtest 2024-06-01 2024-06-30
+"""
+
+import sys
+
+from ontario_ef.day_ahead import main
+
+if __name__ == "__main__":
+    sys.exit(main())
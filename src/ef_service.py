@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Command line entry point of the emission factor HTTP service.
+
+The implementation lives in ``ontario_ef.service``; see its docstring for the endpoints.
+
+Example:
+    python src/ef_service.py --port 8080
+    curl "http://127.0.0.1:8080/ef?time=2022-03-05T13:30"
+"""
+
+import sys
+
+from ontario_ef.service import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Command line entry point of the 5-minute emission factors.
+
+The implementation lives in ``ontario_ef.five_minute``; see its docstring for the method.
+
+Example:
+    python src/five_minute.py 2024 --data-dir data/IESO_5min --memory-mb 256
+"""
+
+import sys
+
+from ontario_ef.five_minute import main
+
+if __name__ == "__main__":
+    sys.exit(main())
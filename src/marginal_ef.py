@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Command line entry point of the marginal emission factors.
+
+The implementation lives in ``ontario_ef.marginal``; see its docstring for the method.
+
+Example:
+    python src/marginal_ef.py --years 2020-2024 --window-days 30
+"""
+
+import sys
+
+from ontario_ef.marginal import main
+
+if __name__ == "__main__":
+    sys.exit(main())
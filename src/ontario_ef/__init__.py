@@ -0,0 +1,56 @@
+"""Ontario hourly supply- and consumption-based electricity emission factors.
+
+The library API is imported lazily: ``import ontario_ef`` loads no third-party module,
+and pandas/numpy are imported the first time an attribute below is used.
+
+Example:
+    from ontario_ef import compute_year, get_emission_rates, get_neighboring_emission_factors
+
+    rates = get_emission_rates(interactive=False)
+    neighbors = get_neighboring_emission_factors(interactive=False)
+    hourly = compute_year(2022, rates, neighbors, data_dir="data/IESO")
+"""
+
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    "compute_year": "pipeline",
+    "prepare_year_data": "pipeline",
+    "YearStages": "pipeline",
+    "calculate_supply_based_ef": "pipeline",
+    "calculate_consumption_based_ef": "pipeline",
+    "get_emission_rates": "pipeline",
+    "get_neighboring_emission_factors": "pipeline",
+    "run_year": "pipeline",
+    "run_years": "pipeline",
+    "iter_year_months": "streaming",
+    "run_year_streaming": "streaming",
+    "MisalignedTimestepsError": "pipeline",
+    "TECH_PREFIX_MAP": "pipeline",
+    "IESO_DATA_DIR": "pipeline",
+    "HourlyEFStore": "ef_store",
+    "DEFAULT_STORE_PATH": "defaults",
+    "ParsedDataCache": "ieso_cache",
+    "DEFAULT_CACHE_DIR": "defaults",
+    "NeighborFactorSeries": "neighbor_factors",
+    "read_results": "results",
+    "write_results": "results",
+    "Instrumentation": "instrumentation",
+    "JsonLinesSink": "instrumentation",
+    "LoggingSink": "instrumentation",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Forecast the hourly consumption-based emission factor of a day ahead.
+
+The monthly generator reports hold, next to the ``Output`` rows used by the emission
+factor calculations, the ``Capability`` of every dispatchable generator and the
+``Forecast`` and ``Available Capacity`` of every wind and solar generator. The
+forecast of a day uses the rows known before it starts: the capability and
+forecast rows of the day, and the output, demand and intertie flows of the
+previous ``--history-days`` days. A day after the last report day (e.g. tomorrow, before
+its rows are published) is forecast from the capability and forecast rows of the last
+report day instead, with the last ``--history-days`` report days as its history; the
+reports must reach into that history.
+
+All generators are forecast at once from (days x 24 x generators) arrays:
+
+1. Wind and solar generators produce their forecast, capped at their available capacity.
+2. Every other generator runs at its capability times its utilization (output /
+   capability) at the same hour over the history.
+3. Demand is forecast as the mean of the same hour over the history days of the same
+   kind (weekday or weekend), and intertie flows as the mean of the same hour.
+4. The difference between the output this requires (demand plus net exports, plus the
+   usual gap between output and load) and the sum of steps 1-2 is taken up by the
+   ``FLEXIBLE_TECHNOLOGIES``: in proportion to their headroom when more output is
+   needed and to their output when less is.
+
+The forecast output, demand and flows then go through ``calculate_supply_based_ef`` and
+``calculate_consumption_based_ef`` unchanged. Once the reports are loaded, a forecast
+takes a few milliseconds, so ``DayAheadForecaster.forecast`` can be called on demand.
+
+Example:
+    python src/day_ahead.py --date 2024-12-31
+    python src/day_ahead.py --backtest 2024-06-01 2024-06-30
+"""
+
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .pipeline import (
+    OUTPUT_DIR, TECH_PREFIX_MAP, calculate_consumption_based_ef, calculate_supply_based_ef, get_emission_rates,
+    get_neighboring_emission_factors, load_demand_and_trade_flow, load_or_build, parse_and_clean_generator_month,
+    timestep_keys, year_source_files
+)
+from .ieso_cache import ParsedDataCache
+
+logger = logging.getLogger("ontario_ef")
+
+MEASUREMENTS = ("Output", "Capability", "Forecast", "Available Capacity")
+
+# Technologies whose output is adjusted to balance the forecast demand and trade
+FLEXIBLE_TECHNOLOGIES = ("Natural Gas", "Hydro")
+
+DEFAULT_HISTORY_DAYS = 28
+
+
+### 1. Inputs
+def measurement_arrays(raw_df, measurements=MEASUREMENTS):
+    """
+    Arrange parsed generator rows as one (days x 24 x generators) array per measurement.
+
+    Args:
+        raw_df (pd.DataFrame): Output of ``parse_and_clean_generator_month`` with the
+            ``measurements`` rows kept.
+        measurements (tuple): Measurements to arrange.
+
+    Returns:
+        np.ndarray: Delivery date of each day, as ``YYYY-MM-DD`` strings.
+        list: Fuel-Generator name of each generator, sorted.
+        dict: Maps each measurement to its float32 array, NaN where no row was reported.
+    """
+    dates, day_index = np.unique(raw_df["Delivery Date"].astype(str).to_numpy(), return_inverse=True)
+    labels = (raw_df["Fuel Type"].astype(str) + " - " + raw_df["Generator"].astype(str)).to_numpy()
+    columns, gen_index = np.unique(labels, return_inverse=True)
+    hours = raw_df[[f"Hour {hour}" for hour in range(1, 25)]].to_numpy(dtype=np.float32)
+    row_measurements = raw_df["Measurement"].astype(str).to_numpy()
+
+    arrays = {}
+    for measurement in measurements:
+        rows = row_measurements == measurement
+        values = np.full((len(dates), 24, len(columns)), np.nan, dtype=np.float32)
+        values[day_index[rows], :, gen_index[rows]] = hours[rows]
+        arrays[measurement] = values
+    return dates, list(columns), arrays
+
+def hourly_matrix(df, dates, columns):
+    """Return the ``columns`` of an hourly ``Date``/``Hour`` frame as a (days x 24 x columns) array, NaN where missing."""
+    keys = timestep_keys(df, "Date")
+    index = pd.MultiIndex.from_product([dates, range(1, 25)], names=["Date", "Hour"])
+    values = df[columns].apply(pd.to_numeric, errors="coerce").set_axis(keys)
+    values = values[~values.index.duplicated()].reindex(index)
+    return values.to_numpy(dtype=np.float64).reshape(len(dates), 24, len(columns))
+
+
+### 2. Forecast
+class DayAheadForecaster:
+    """
+    Generator measurements, demand and intertie flows of a span of days, ready to forecast any of them.
+
+    Args:
+        dates (np.ndarray): Delivery date of each day, as ``YYYY-MM-DD`` strings.
+        columns (list): Fuel-Generator name of each generator.
+        measurements (dict): (days x 24 x generators) array of each of ``MEASUREMENTS``.
+        demand (np.ndarray): (days x 24) Ontario demand in MWh.
+        flow_columns (list): Intertie flow columns of the transformed trade flow.
+        flows (np.ndarray): (days x 24 x interties) flows in MWh, positive for exports.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+        neighboring_emission_factors (dict): Emission factors per region in t CO2e/MWh.
+        history_days (int): Days before the forecast day the profiles are taken from.
+    """
+
+    def __init__(self, dates, columns, measurements, demand, flow_columns, flows, emission_rates, neighboring_emission_factors,
+                 history_days=DEFAULT_HISTORY_DAYS):
+        self.dates = np.asarray(dates)
+        self.columns = list(columns)
+        self.measurements = measurements
+        self.demand = demand
+        self.flow_columns = list(flow_columns)
+        self.flows = flows
+        self.emission_rates = emission_rates
+        self.neighboring_emission_factors = neighboring_emission_factors
+        self.history_days = history_days
+
+        technologies = np.array([TECH_PREFIX_MAP.get(col[:1], "") for col in self.columns])
+        self.flexible = np.isin(technologies, FLEXIBLE_TECHNOLOGIES)
+
+    @classmethod
+    def from_reports(cls, first_date, last_date, emission_rates, neighboring_emission_factors, history_days=DEFAULT_HISTORY_DAYS,
+                     cache=None, data_dir=None):
+        """
+        Load the local reports needed to forecast every day from ``first_date`` to ``last_date``.
+
+        The months after the last local generator report are skipped, so days after it
+        can still be forecast (see ``_day``).
+
+        Raises:
+            FileNotFoundError: If the first monthly generator report of the span, or one
+                before a report that is present, is missing.
+        """
+        first = pd.Timestamp(first_date) - pd.Timedelta(days=history_days)
+        last = pd.Timestamp(last_date)
+
+        # Every measurement of the monthly generator reports of the span
+        raw_months = []
+        missing = None
+        for month in pd.period_range(first, last, freq="M"):
+            generator_files, _, _ = year_source_files(month.year, data_dir)
+            path = generator_files[month.month - 1][1]
+            if not os.path.exists(path):
+                if not raw_months:
+                    raise FileNotFoundError(f"Generator report not found at {path}; run the emission factor script for {month.year} first.")
+                missing = missing or path
+                continue
+            if missing:
+                raise FileNotFoundError(f"Generator report not found at {missing}; run the emission factor script for its year first.")
+            raw_months.append(load_or_build(cache, f"generator_measurements_{month.year}{month.month:02d}", [path],
+                                            lambda path=path: parse_and_clean_generator_month(path, MEASUREMENTS)))
+        raw_df = pd.concat(raw_months, ignore_index=True)
+        in_span = pd.to_datetime(raw_df["Delivery Date"]).between(first, last).to_numpy()
+        dates, columns, measurements = measurement_arrays(raw_df[in_span])
+        if missing:
+            logger.warning(f"Generator report not found at {missing}; days after {dates[-1]} are forecast from the rows of that day.")
+
+        # Demand and intertie flows of the same days
+        years = range(first.year, pd.Timestamp(dates[-1]).year + 1)
+        demand_frames, flow_frames = zip(*(load_demand_and_trade_flow(year, cache, data_dir=data_dir) for year in years))
+        demand_df = pd.concat(demand_frames, ignore_index=True)
+        trade_flow = pd.concat(flow_frames, ignore_index=True)
+        flow_columns = [col for col in trade_flow.columns if col not in ["Date", "Hour"]]
+        demand = hourly_matrix(demand_df, dates, ["Ontario Demand"])[:, :, 0]
+        flows = hourly_matrix(trade_flow, dates, flow_columns)
+
+        return cls(dates, columns, measurements, demand, flow_columns, flows, emission_rates, neighboring_emission_factors, history_days)
+
+    def _index(self, date):
+        """Return the index of ``date`` in the loaded days."""
+        date = pd.Timestamp(date).strftime("%Y-%m-%d")
+        matches = np.flatnonzero(self.dates == date)
+        if not len(matches):
+            raise ValueError(f"No generator rows for {date}; the reports loaded cover {self.dates[0]} to {self.dates[-1]}.")
+        return int(matches[0])
+
+    def _day(self, date):
+        """
+        Return the index of the day whose capability and forecast rows forecast ``date``,
+        and the indices of its history days.
+
+        A day after the last loaded day uses the rows of the last loaded day, and the last
+        ``history_days`` loaded days as its history.
+        """
+        if pd.Timestamp(date) > pd.Timestamp(self.dates[-1]):
+            logger.warning(f"No generator rows for {pd.Timestamp(date):%Y-%m-%d}; "
+                           f"using the capability and forecast rows of {self.dates[-1]}.")
+            day = len(self.dates) - 1
+            return day, np.arange(max(day + 1 - self.history_days, 0), day + 1)
+        day = self._index(date)
+        history = np.arange(max(day - self.history_days, 0), day)
+        if not len(history):
+            raise ValueError(f"No history before {self.dates[day]}; load the reports from at least one day earlier.")
+        return day, history
+
+    def forecast_output(self, date):
+        """
+        Forecast the output of every generator and the demand and flows of ``date``.
+
+        Returns:
+            np.ndarray: (24 x generators) output in MW.
+            np.ndarray: Demand of every hour in MWh.
+            np.ndarray: (24 x interties) flows in MWh, positive for exports.
+        """
+        day, history = self._day(date)
+        output = self.measurements["Output"][history]
+        capability = self.measurements["Capability"][day]
+        forecast = self.measurements["Forecast"][day]
+        available = self.measurements["Available Capacity"][day]
+
+        # Wind and solar: forecast output, capped at the available capacity
+        variable = ~np.isnan(forecast).all(axis=0)
+        variable_output = np.fmin(forecast, available)
+
+        # Others: capability times the utilization at the same hour over the history
+        historical_capability = np.nansum(self.measurements["Capability"][history], axis=0)
+        utilization = np.divide(np.nansum(output, axis=0), historical_capability,
+                                out=np.zeros(historical_capability.shape, dtype=np.float32), where=historical_capability > 0)
+        base_output = np.nan_to_num(np.where(variable, variable_output, capability * np.minimum(utilization, 1))).astype(np.float64)
+
+        # Demand profile of the same kind of day, flows and the gap between output and load at each hour
+        weekend = pd.to_datetime(self.dates[history]).dayofweek.to_numpy() >= 5
+        same_kind = weekend == (pd.Timestamp(date).dayofweek >= 5)
+        demand = np.nanmean(self.demand[history[same_kind] if same_kind.any() else history], axis=0)
+        flows = np.nan_to_num(np.nanmean(self.flows[history], axis=0))
+        gap = np.nanmean(np.nansum(output, axis=2) - self.demand[history] - np.nansum(self.flows[history], axis=2), axis=0)
+        required = demand + flows.sum(axis=1) + np.nan_to_num(gap)
+
+        # Flexible generators take up the difference, within their capability
+        shortfall = required - base_output.sum(axis=1)
+        flexible_output = np.where(self.flexible, base_output, 0)
+        headroom = np.where(self.flexible, np.maximum(np.nan_to_num(capability) - base_output, 0), 0)
+        increase = np.minimum(np.maximum(shortfall, 0), headroom.sum(axis=1))
+        decrease = np.minimum(np.maximum(-shortfall, 0), flexible_output.sum(axis=1))
+        base_output += headroom * np.divide(increase, headroom.sum(axis=1), out=np.zeros(24), where=headroom.sum(axis=1) > 0)[:, None]
+        base_output -= flexible_output * np.divide(decrease, flexible_output.sum(axis=1), out=np.zeros(24),
+                                                   where=flexible_output.sum(axis=1) > 0)[:, None]
+        return base_output, demand, flows
+
+    def emission_factors(self, date, output, demand, flows):
+        """
+        Calculate the hourly EFs of ``date`` from output, demand and flows.
+
+        Returns:
+            pd.DataFrame: ``Delivery Date``, ``Hour``, supply- and consumption-based EF in
+            g CO2e/kWh, total output and Ontario demand.
+        """
+        date = pd.Timestamp(date).strftime("%Y-%m-%d")
+        timesteps = pd.DataFrame({"Delivery Date": [date] * 24, "Hour": np.arange(1, 25)})
+        keys = {"Date": [date] * 24, "Hour": np.arange(1, 25)}
+        transformed_gen_data = pd.concat([timesteps, pd.DataFrame(output, columns=self.columns)], axis=1)
+        demand_df = pd.DataFrame({**keys, "Ontario Demand": demand})
+        transformed_trade_flow = pd.concat([pd.DataFrame(keys), pd.DataFrame(flows, columns=self.flow_columns)], axis=1)
+
+        supplybased_ef, total_output_df = calculate_supply_based_ef(transformed_gen_data, self.emission_rates)
+        consumption_based_ef, _ = calculate_consumption_based_ef(
+            supplybased_ef, demand_df, transformed_trade_flow, self.neighboring_emission_factors, total_output_df
+        )
+        return timesteps.assign(**{
+            "Supply-based EF (g CO2e/kWh)": supplybased_ef["Supply-based EF (g CO2e/kWh)"].to_numpy(),
+            "Consumption-based EF (g CO2e/kWh)": consumption_based_ef["Consumption-based EF (g CO2e/kWh)"].to_numpy(),
+            "Total Output": total_output_df["Total Output"].to_numpy(),
+            "Ontario Demand": demand,
+        })
+
+    def forecast(self, date):
+        """Forecast the hourly EFs of ``date`` (see ``emission_factors``)."""
+        return self.emission_factors(date, *self.forecast_output(date))
+
+    def actual(self, date):
+        """Calculate the hourly EFs of ``date`` from its reported output, demand and flows, to score forecasts."""
+        day = self._index(date)
+        return self.emission_factors(date, np.nan_to_num(self.measurements["Output"][day]), self.demand[day], np.nan_to_num(self.flows[day]))
+
+
+### 3. Backtest
+def backtest(forecaster, first_date, last_date):
+    """
+    Forecast every day from ``first_date`` to ``last_date`` and compare with the reported EFs.
+
+    Returns:
+        pd.DataFrame: Mean absolute error of the consumption-based EF per day, of the
+        forecast and of a persistence forecast (the previous day's EFs), in g CO2e/kWh.
+    """
+    column = "Consumption-based EF (g CO2e/kWh)"
+    rows = []
+    previous = None
+    for date in pd.date_range(first_date - pd.Timedelta(days=1), last_date, freq="D"):
+        actual = forecaster.actual(date)[column].to_numpy()
+        if date >= first_date:
+            forecast = forecaster.forecast(date)[column].to_numpy()
+            rows.append({
+                "Delivery Date": date.strftime("%Y-%m-%d"),
+                "Forecast MAE (g CO2e/kWh)": np.abs(forecast - actual).mean(),
+                "Persistence MAE (g CO2e/kWh)": np.abs(previous - actual).mean(),
+                "Mean EF (g CO2e/kWh)": actual.mean(),
+            })
+        previous = actual
+    return pd.DataFrame(rows)
+
+
+### 4. Command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast the hourly consumption-based EF of a day from the capability and forecast rows of the IESO reports.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--date", help="Day to forecast (YYYY-MM-DD). A day after the last report day is "
+                        "forecast from the capability and forecast rows of the last report day.")
+    target.add_argument("--backtest", nargs=2, metavar=("FIRST", "LAST"), help="Forecast every day of a span and score it against the reported EFs.")
+    parser.add_argument("--history-days", type=int, default=DEFAULT_HISTORY_DAYS, help="Days of history the profiles are taken from.")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the IESO files without reading or writing the parsed data cache.")
+    parser.add_argument("--out", default=os.path.join(OUTPUT_DIR, "forecast"), help="Output directory.")
+    args = parser.parse_args(argv)
+
+    emission_rates = get_emission_rates(False)
+    neighboring_emission_factors = get_neighboring_emission_factors(False)
+    cache = ParsedDataCache(enabled=not args.no_cache)
+    first_date, last_date = (pd.Timestamp(day) for day in (args.backtest or [args.date, args.date]))
+    if args.backtest:
+        # The persistence forecast of the first day needs the day before
+        first_load = first_date - pd.Timedelta(days=1)
+    else:
+        first_load = first_date
+
+    start_time = time.time()
+    forecaster = DayAheadForecaster.from_reports(first_load, last_date, emission_rates, neighboring_emission_factors, args.history_days, cache)
+    print(f"Loaded {len(forecaster.dates)} days of reports in {time.time() - start_time:.2f} s.")
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.backtest:
+        scores = backtest(forecaster, first_date, last_date)
+        print(scores.drop(columns="Delivery Date").mean().to_string())
+        output_path = os.path.join(args.out, f"Day-ahead_EF_backtest_{first_date:%Y-%m-%d}_{last_date:%Y-%m-%d}.csv")
+        scores.to_csv(output_path, index=False)
+    else:
+        start_time = time.perf_counter()
+        forecast = forecaster.forecast(first_date)
+        print(f"Forecast {first_date:%Y-%m-%d} in {(time.perf_counter() - start_time) * 1000:.1f} ms.")
+        output_path = os.path.join(args.out, f"Day-ahead_EF_{first_date:%Y-%m-%d}.csv")
+        forecast.to_csv(output_path, index=False)
+    print(f"Day-ahead EF data saved to: {output_path}")
+    return 0
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Default locations and settings shared by the pipeline, its stores and the command line.
+
+This module imports nothing beyond the standard library, so ``pipeline`` can use these
+values as argument defaults without loading ``ef_store``, ``ieso_cache`` or ``results``
+(and their pandas/numpy imports) until a run needs them.
+"""
+
+import os
+
+# Consumption-based EF and hourly result files of every computed year
+DEFAULT_OUTPUT_DIR = os.path.join("data", "output")
+
+# Memory-mapped hourly EF store (ef_store.HourlyEFStore)
+DEFAULT_STORE_PATH = os.path.join("data", "output", "hourly_ef.efstore")
+
+# Parsed data cache (ieso_cache.ParsedDataCache)
+DEFAULT_CACHE_DIR = os.path.join("data", "cache")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Columnar result files (results.write_results)
+RESULT_FORMATS = ("csv", "parquet", "feather", "npz")
+DEFAULT_RESULT_FORMATS = ("npz",)
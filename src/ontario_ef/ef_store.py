@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Memory-mapped store of hourly emission factors for all computed years.
+
+The store is a single binary file: a small JSON header followed by one row of float64
+values per hour, where row ``i`` is the hour starting ``i`` hours after the epoch
+(midnight EST on the epoch date; IESO reports every hour in EST). Hours that were
+never written hold NaN. Lookups, range slices and aggregates read only the rows they
+need through ``np.memmap``, and new years can be written at any time.
+
+``load_consumption_ef`` reads the consumption-based EF of every computed year as one
+hourly array, for the Scope 2 calculator and the lookup service.
+"""
+
+import calendar
+import contextlib
+import glob
+import json
+import os
+import warnings
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .defaults import DEFAULT_OUTPUT_DIR, DEFAULT_STORE_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized
+    fcntl = None
+
+
+MAGIC = b"ONTEFST1"
+HEADER_SIZE = 4096
+
+DEFAULT_EPOCH = date(2020, 1, 1)
+
+# Store column -> column of the frames produced by the emission factor calculations
+STORE_COLUMNS = {
+    "supply_ef": "Supply-based EF (g CO2e/kWh)",
+    "consumption_ef": "Consumption-based EF (g CO2e/kWh)",
+    "total_output": "Total Output",
+    "imports": "Total Imports (MWh)",
+    "exports": "Total Exports (MWh)",
+}
+
+# IESO timestamps are in Eastern Standard Time all year round
+EST_TIMEZONE = "Etc/GMT+5"
+
+
+def year_frame(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df):
+    """Combine the frames computed for a year into the layout written by ``HourlyEFStore.write``."""
+    frame = supplybased_ef[["Delivery Date", "Hour"]].reset_index(drop=True)
+    for frame_part in (supplybased_ef, consumption_based_ef, total_output_df, spot_check_df):
+        for name, column in STORE_COLUMNS.items():
+            if column in frame_part.columns:
+                frame[name] = frame_part[column].to_numpy()
+    return frame
+
+
+class HourlyEFStore:
+    """
+    Memory-mapped hourly emission factor store.
+
+    Args:
+        path (str): Store file. It is created when ``writable`` is True and it does not exist.
+        writable (bool): Open the store for writing.
+        epoch (datetime.date): First day of the store, used only when creating it.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, writable=False, epoch=DEFAULT_EPOCH):
+        self.path = path
+        self.writable = writable
+        if not os.path.exists(path):
+            if not writable:
+                raise FileNotFoundError(f"Emission factor store not found at {path}.")
+            self._create(epoch)
+
+        with open(path, "rb") as f:
+            magic = f.read(len(MAGIC))
+            header = f.read(HEADER_SIZE - len(MAGIC)).rstrip(b"\0 ")
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an emission factor store.")
+
+        header = json.loads(header)
+        self.epoch = date.fromisoformat(header["epoch"])
+        self.columns = header["columns"]
+        self._mmap = None
+        self._mmap_rows = -1
+
+    def _create(self, epoch):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        header = json.dumps({"epoch": epoch.isoformat(), "columns": list(STORE_COLUMNS)}).encode()
+        with open(self.path, "wb") as f:
+            f.write(MAGIC + header.ljust(HEADER_SIZE - len(MAGIC), b" "))
+
+    @property
+    def _row_bytes(self):
+        return 8 * len(self.columns)
+
+    def __len__(self):
+        """Number of hours held by the store, from the epoch to the last written hour."""
+        return (os.path.getsize(self.path) - HEADER_SIZE) // self._row_bytes
+
+    @property
+    def data(self):
+        """(hours x columns) float64 memory map of the store; remapped when the file grows."""
+        rows = len(self)
+        if self._mmap is None or self._mmap_rows != rows:
+            if rows == 0:
+                return np.empty((0, len(self.columns)))
+            self._mmap = np.memmap(self.path, dtype=np.float64, mode="r+" if self.writable else "r",
+                                   offset=HEADER_SIZE, shape=(rows, len(self.columns)))
+            self._mmap_rows = rows
+        return self._mmap
+
+    # Hour offsets
+    def offset(self, timestamp):
+        """
+        Return the hour offset of ``timestamp`` from the epoch.
+
+        Naive timestamps are taken as EST; timezone-aware ones are converted to EST.
+        """
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert(EST_TIMEZONE).tz_localize(None)
+        return int((timestamp - pd.Timestamp(self.epoch)) // pd.Timedelta(hours=1))
+
+    def offsets(self, timestamps):
+        """Vectorized ``offset`` for an array of timestamps."""
+        timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps))
+        if timestamps.tz is not None:
+            timestamps = timestamps.tz_convert(EST_TIMEZONE).tz_localize(None)
+        return ((timestamps - pd.Timestamp(self.epoch)) // pd.Timedelta(hours=1)).to_numpy()
+
+    def delivery_offsets(self, delivery_dates, hours):
+        """Return the offsets of IESO ``(Delivery Date, Hour)`` pairs (hour 1 starts at midnight)."""
+        days = (pd.to_datetime(pd.Series(delivery_dates).astype(str)) - pd.Timestamp(self.epoch)).dt.days.to_numpy()
+        return days * 24 + np.asarray(hours, dtype=np.int64) - 1
+
+    def timestamp(self, offset):
+        """Return the EST start of the hour at ``offset``."""
+        return datetime.combine(self.epoch, datetime.min.time()) + timedelta(hours=int(offset))
+
+    # Writing
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(self.path, "rb+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def write(self, frame):
+        """
+        Write hourly values, growing the store when they extend past its end.
+
+        Args:
+            frame (pd.DataFrame): ``Delivery Date``, ``Hour`` and any of the store columns
+                (see ``year_frame``). Existing values of those hours are overwritten.
+        """
+        if not self.writable:
+            raise PermissionError(f"Emission factor store {self.path} is opened read-only.")
+
+        offsets = self.delivery_offsets(frame["Delivery Date"], frame["Hour"])
+        if len(offsets) and offsets.min() < 0:
+            raise ValueError(f"Cannot write hours before the store epoch {self.epoch}.")
+
+        with self._locked() as f:
+            # Grow the file with NaN rows up to the last hour written
+            rows = len(self)
+            needed = int(offsets.max()) + 1 if len(offsets) else 0
+            if needed > rows:
+                f.seek(HEADER_SIZE + rows * self._row_bytes)
+                f.write(np.full((needed - rows, len(self.columns)), np.nan).tobytes())
+                f.flush()
+
+            data = self.data
+            for i, name in enumerate(self.columns):
+                if name in frame.columns:
+                    data[offsets, i] = frame[name].to_numpy(dtype=np.float64)
+            data.flush()
+
+    # Reading
+    def _column_index(self, column):
+        if column not in self.columns:
+            raise KeyError(f"Unknown column {column!r}; the store holds {self.columns}.")
+        return self.columns.index(column)
+
+    def lookup(self, timestamp, column=None):
+        """
+        Return the values of the hour containing ``timestamp``.
+
+        Returns:
+            dict or float: All columns, or the value of ``column``. Unknown hours are NaN.
+        """
+        offset = self.offset(timestamp)
+        if 0 <= offset < len(self):
+            row = np.array(self.data[offset])
+        else:
+            row = np.full(len(self.columns), np.nan)
+
+        if column is not None:
+            return float(row[self._column_index(column)])
+        return dict(zip(self.columns, row.tolist()))
+
+    def range(self, start, end, columns=None):
+        """
+        Return the hours from ``start`` (included) to ``end`` (excluded).
+
+        Returns:
+            pd.DataFrame: One row per hour indexed by its EST start time. Hours outside the
+            store are NaN.
+        """
+        first, last = self.offset(start), self.offset(end)
+        columns = columns or self.columns
+        values = np.full((max(last - first, 0), len(columns)), np.nan)
+
+        lo, hi = max(first, 0), min(last, len(self))
+        if hi > lo:
+            values[lo - first:hi - first] = self.data[lo:hi, [self._column_index(c) for c in columns]]
+
+        index = pd.date_range(self.timestamp(first), periods=len(values), freq="h", name="Hour Start (EST)")
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    def _year_bounds(self):
+        """Yield ``(year, first offset, last offset)`` for every year covered by the store."""
+        end = len(self)
+        year = self.epoch.year
+        while True:
+            first = max(self.offset(datetime(year, 1, 1)), 0)
+            if first >= end:
+                return
+            yield year, first, min(self.offset(datetime(year + 1, 1, 1)), end)
+            year += 1
+
+    def aggregate(self, period, column="consumption_ef", how="mean"):
+        """
+        Aggregate a column by ``"month"``, ``"year"`` or ``"hour"`` (time of day).
+
+        The store is read one year at a time, so memory use does not grow with the number
+        of years. Hours that were never written are ignored.
+
+        Args:
+            period (str): ``"month"``, ``"year"`` or ``"hour"``.
+            column (str): Store column to aggregate.
+            how (str): ``"mean"``, ``"sum"``, ``"min"`` or ``"max"``.
+
+        Returns:
+            pd.Series: Aggregated values indexed by ``(year, month)``, year or hour of day (1-24).
+        """
+        reducers = {"mean": np.nanmean, "sum": np.nansum, "min": np.nanmin, "max": np.nanmax}
+        if how not in reducers:
+            raise ValueError(f"Unknown aggregation {how!r}; use one of {list(reducers)}.")
+        if period not in ("month", "year", "hour"):
+            raise ValueError(f"Unknown period {period!r}; use 'month', 'year' or 'hour'.")
+        reduce = reducers[how]
+        col = self._column_index(column)
+
+        results = {}
+        hour_sums, hour_counts = np.zeros(24), np.zeros(24)
+        hour_extremes = np.full(24, np.nan)
+        with warnings.catch_warnings():
+            # Years, months or hours without any written value reduce to NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            for year, first, last in self._year_bounds():
+                values = np.array(self.data[first:last, col])
+                if period == "year":
+                    if np.isfinite(values).any():
+                        results[year] = reduce(values)
+                elif period == "month":
+                    for month in range(1, 13):
+                        lo = self.offset(datetime(year, month, 1)) - first
+                        hi = lo + calendar.monthrange(year, month)[1] * 24
+                        chunk = values[max(lo, 0):max(hi, 0)]
+                        if np.isfinite(chunk).any():
+                            results[(year, month)] = reduce(chunk)
+                else:
+                    # Offsets count whole days from midnight, so offset % 24 is the hour of day
+                    hours_of_day = np.arange(first, last) % 24
+                    valid = np.isfinite(values)
+                    hour_sums += np.bincount(hours_of_day[valid], values[valid], minlength=24)
+                    hour_counts += np.bincount(hours_of_day[valid], minlength=24)
+                    if how in ("min", "max"):
+                        combine = np.fmin if how == "min" else np.fmax
+                        for hour in range(24):
+                            hour_extremes[hour] = combine(hour_extremes[hour], reduce(values[hours_of_day == hour]))
+
+        if period == "hour":
+            totals = {"mean": hour_sums / np.maximum(hour_counts, 1), "sum": hour_sums}.get(how, hour_extremes)
+            results = {hour + 1: totals[hour] for hour in range(24) if hour_counts[hour]}
+
+        index_name = {"month": ("Year", "Month"), "year": "Year", "hour": "Hour"}[period]
+        if period == "month":
+            # from_arrays rather than from_tuples, which cannot build an empty index
+            index = pd.MultiIndex.from_arrays([[key[0] for key in results], [key[1] for key in results]], names=index_name)
+        else:
+            index = pd.Index(list(results), dtype=np.int64, name=index_name)
+        return pd.Series(list(results.values()), index=index, name=f"{column} ({how})", dtype=np.float64)
+
+
+def consumption_ef_files(output_dir=DEFAULT_OUTPUT_DIR):
+    """Return the ``Consumption-based_EF_<year>.csv`` files of ``output_dir``, sorted by year."""
+    return sorted(glob.glob(os.path.join(output_dir, "Consumption-based_EF_*.csv")))
+
+def load_consumption_ef(store_path=DEFAULT_STORE_PATH, output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Load the hourly consumption-based EF of every computed year as one array.
+
+    The ``Consumption-based_EF_<year>.csv`` files of ``output_dir`` are read first, and
+    the hours the memory-mapped store holds (when it exists) replace theirs. Years that
+    were only written to one of them are kept, e.g. years computed with ``--no-store``.
+
+    Returns:
+        pd.Timestamp: Start (EST) of the hour at position 0.
+        np.ndarray: Consumption-based EF in g CO2e/kWh per hour, NaN for missing hours.
+    """
+    # (epoch, hourly values) of each source, in increasing priority
+    sources = []
+    paths = consumption_ef_files(output_dir)
+    if paths:
+        ef = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+        days = pd.to_datetime(ef["Delivery Date"])
+        epoch = days.min()
+        offsets = (days - epoch).dt.days.to_numpy() * 24 + ef["Hour"].to_numpy() - 1
+        values = np.full(offsets.max() + 1, np.nan)
+        values[offsets] = ef["Consumption-based EF (g CO2e/kWh)"].to_numpy()
+        sources.append((epoch, values))
+
+    if store_path and os.path.exists(store_path):
+        store = HourlyEFStore(store_path)
+        sources.append((pd.Timestamp(store.epoch), np.array(store.data[:, store.columns.index("consumption_ef")])))
+
+    if not sources:
+        raise FileNotFoundError(
+            f"No hourly emission factors found in {store_path} or {output_dir}. "
+            "Run src/Ontario_EF_Code.py first."
+        )
+
+    epoch = min(source_epoch for source_epoch, _ in sources)
+    starts = [(source_epoch - epoch) // pd.Timedelta(hours=1) for source_epoch, _ in sources]
+    combined = np.full(max(start + len(values) for start, (_, values) in zip(starts, sources)), np.nan)
+    for start, (_, values) in zip(starts, sources):
+        known = ~np.isnan(values)
+        combined[start:start + len(values)][known] = values[known]
+    return epoch, combined
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Supply- and consumption-based emission factors at 5-minute resolution.
+
+The 5-minute reports are read in chunks and reduced on the fly to per-interval arrays
+(output per technology, Ontario demand and flow per intertie), so memory use is set by
+the chunk size rather than by the length of the reports. The emission factors are then
+computed with the same functions as the hourly pipeline.
+
+Expected report layouts (CSV, optional ``\\`` preamble rows as in the hourly reports;
+intervals 1-12 of hour-ending ``Hour`` in EST, like the hourly reports):
+
+* Generator output, ``<data_dir>/<year>/Generator/*.csv``:
+  ``Delivery Date,Hour,Generator,Fuel Type,Interval 1,...,Interval 12`` in MW. When a
+  ``Measurement`` column is present, only ``Output`` rows are used.
+* Demand, ``<data_dir>/<year>/Demand/*.csv``: ``Delivery Date,Hour,Interval,Ontario Demand``.
+* Intertie flows, ``<data_dir>/<year>/Trade/*.csv``: ``Delivery Date,Hour,Interval`` and
+  one ``<INTERTIE> Flow`` column per intertie (positive for exports). Manitoba and
+  Quebec (``PQ``) interties are summed as in ``transform_trade_flow``.
+
+Example:
+    python src/five_minute.py 2024 --data-dir data/IESO_5min --memory-mb 256
+"""
+
+import argparse
+import glob
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .pipeline import (
+    TECH_PREFIX_MAP, consumption_based_ef_from_arrays, get_emission_rates, get_neighboring_emission_factors,
+    intertie_emission_factors, supply_based_ef_from_technologies, transform_trade_flow
+)
+
+
+logger = logging.getLogger("ontario_ef")
+
+INTERVALS_PER_HOUR = 12
+INTERVAL_COLUMNS = [f"Interval {i}" for i in range(1, INTERVALS_PER_HOUR + 1)]
+DEFAULT_DATA_DIR = os.path.join("data", "IESO_5min")
+DEFAULT_MEMORY_MB = 512
+
+# Rough size of one parsed generator row (12 floats, 4 labels and pandas overhead)
+GENERATOR_ROW_BYTES = 1024
+
+
+### 1. Reading reports in chunks
+def report_files(data_dir, year, kind):
+    """Return the sorted ``.csv`` files of ``<data_dir>/<year>/<kind>``."""
+    paths = sorted(glob.glob(os.path.join(data_dir, str(year), kind, "*.csv")))
+    if not paths:
+        raise FileNotFoundError(
+            f"No 5-minute {kind.lower()} reports found in {os.path.join(data_dir, str(year), kind)}. "
+            "See the module docstring of ontario_ef.five_minute for the expected layout."
+        )
+    return paths
+
+def read_report_chunks(path, chunksize):
+    """Yield DataFrames of at most ``chunksize`` rows, skipping the ``\\`` preamble rows."""
+    preamble = 0
+    with open(path, "r") as f:
+        for line in f:
+            if not line.startswith("\\"):
+                break
+            preamble += 1
+
+    reader = pd.read_csv(path, skiprows=preamble, chunksize=chunksize, engine="c")
+    for chunk in reader:
+        chunk.columns = [str(col).strip() for col in chunk.columns]
+        if "Date" in chunk.columns and "Delivery Date" not in chunk.columns:
+            chunk = chunk.rename(columns={"Date": "Delivery Date"})
+        yield chunk
+
+def interval_offsets(chunk, start, interval=None):
+    """
+    Return the position of each row's interval from midnight EST on ``start``.
+
+    Args:
+        chunk (pd.DataFrame): Rows with ``Delivery Date`` and ``Hour`` columns.
+        start (pd.Timestamp): First day of the period.
+        interval (np.ndarray): Interval (1-12) of each row; the ``Interval`` column by default.
+    """
+    # Parse each distinct date once
+    codes, dates = pd.factorize(chunk["Delivery Date"].astype(str).str.strip())
+    days = ((pd.to_datetime(dates) - start) // pd.Timedelta(days=1)).to_numpy()[codes]
+    hours = pd.to_numeric(chunk["Hour"], errors="coerce").to_numpy()
+    if interval is None:
+        interval = pd.to_numeric(chunk["Interval"], errors="coerce").to_numpy()
+    return ((days * 24 + hours - 1) * INTERVALS_PER_HOUR + interval - 1).astype(np.int64)
+
+
+### 2. Reducing reports to per-interval arrays
+def accumulate_generator_output(paths, start, n_intervals, chunksize):
+    """
+    Sum the output of each technology per interval.
+
+    Returns:
+        list: Technologies, in the column order of the array.
+        np.ndarray: (intervals x technologies) output in MW.
+        int: Generator rows read.
+    """
+    technologies = list(TECH_PREFIX_MAP.values())
+    tech_index = {prefix: technologies.index(tech) for prefix, tech in TECH_PREFIX_MAP.items()}
+    tech_output = np.zeros(n_intervals * len(technologies))
+    rows = 0
+
+    for path in paths:
+        for chunk in read_report_chunks(path, chunksize):
+            if "Measurement" in chunk.columns:
+                chunk = chunk[chunk["Measurement"].astype(str).str.strip() == "Output"]
+            rows += len(chunk)
+
+            # Technology of each row from the first letter of its fuel type; unknown fuels are dropped
+            tech = chunk["Fuel Type"].astype(str).str.strip().str[:1].map(tech_index).to_numpy(dtype=np.float64)
+            first_interval = interval_offsets(chunk, start, interval=1)
+            keep = ~np.isnan(tech) & (first_interval >= 0) & (first_interval + INTERVALS_PER_HOUR <= n_intervals)
+
+            values = chunk[INTERVAL_COLUMNS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)[keep]
+            slots = (first_interval[keep, None] + np.arange(INTERVALS_PER_HOUR)) * len(technologies) + tech[keep, None].astype(np.int64)
+            tech_output += np.bincount(slots.ravel(), np.nan_to_num(values).ravel(), minlength=len(tech_output))
+
+    return technologies, tech_output.reshape(n_intervals, len(technologies)), rows
+
+def load_demand(paths, start, n_intervals, chunksize):
+    """Return the Ontario demand of every interval, NaN where it is not reported."""
+    demand = np.full(n_intervals, np.nan)
+    for path in paths:
+        for chunk in read_report_chunks(path, chunksize):
+            offsets = interval_offsets(chunk, start)
+            keep = (offsets >= 0) & (offsets < n_intervals)
+            demand[offsets[keep]] = pd.to_numeric(chunk["Ontario Demand"], errors="coerce").to_numpy(dtype=np.float64)[keep]
+    return demand
+
+def load_trade_flows(paths, start, n_intervals, chunksize):
+    """
+    Return the flow of every intertie per interval, positive for exports.
+
+    Returns:
+        list: Flow columns, as produced by ``transform_trade_flow``.
+        np.ndarray: (intervals x interties) flows, 0 where not reported.
+    """
+    flow_columns, flows = None, None
+    for path in paths:
+        for chunk in read_report_chunks(path, chunksize):
+            offsets = interval_offsets(chunk, start)
+            transformed = transform_trade_flow(chunk.rename(columns={"Delivery Date": "Date"}))
+            columns = [col for col in transformed.columns if col not in ["Date", "Hour"]]
+            if flow_columns is None:
+                flow_columns = columns
+                flows = np.zeros((n_intervals, len(flow_columns)))
+            elif columns != flow_columns:
+                raise ValueError(f"Intertie columns of {path} differ from the previous trade reports.")
+
+            keep = (offsets >= 0) & (offsets < n_intervals)
+            values = transformed[flow_columns].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+            flows[offsets[keep]] = values[keep]
+    return flow_columns, flows
+
+
+### 3. Emission factors
+def chunksize_for_budget(memory_mb, fixed_bytes):
+    """Rows read per chunk so that parsing stays within ``memory_mb`` next to ``fixed_bytes``."""
+    available = memory_mb * 1024 * 1024 - fixed_bytes
+    if available <= 0:
+        raise ValueError(f"A memory budget of {memory_mb} MB is too small for the per-interval arrays of a year.")
+    return max(1000, int(available // GENERATOR_ROW_BYTES))
+
+def calculate_five_minute_ef(year, emission_rates, neighboring_emission_factors, data_dir=DEFAULT_DATA_DIR, memory_mb=DEFAULT_MEMORY_MB):
+    """
+    Calculate the supply- and consumption-based EF of every 5-minute interval of ``year``.
+
+    Args:
+        year (int): Year to compute.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+        neighboring_emission_factors (dict): Emission factors per region in t CO2e/MWh.
+        data_dir (str): Directory holding ``<year>/Generator``, ``<year>/Demand`` and ``<year>/Trade``.
+        memory_mb (int): Memory budget of the per-interval arrays and the report chunks, which
+            are sized to fit; the interpreter and libraries come on top of it.
+
+    Returns:
+        pd.DataFrame: ``Delivery Date``, ``Hour``, ``Interval``, both EFs in g CO2e/kWh and
+        the total output, exports and imports of every interval with reported demand.
+    """
+    start = pd.Timestamp(year, 1, 1)
+    days = (pd.Timestamp(year + 1, 1, 1) - start).days
+    n_intervals = days * 24 * INTERVALS_PER_HOUR
+
+    # Per-interval arrays: technology output, demand, flows and results (about 16 float64 each)
+    chunksize = chunksize_for_budget(memory_mb, n_intervals * 16 * 8)
+
+    technologies, tech_output, generator_rows = accumulate_generator_output(
+        report_files(data_dir, year, "Generator"), start, n_intervals, chunksize
+    )
+    demand = load_demand(report_files(data_dir, year, "Demand"), start, n_intervals, chunksize)
+    flow_columns, flows = load_trade_flows(report_files(data_dir, year, "Trade"), start, n_intervals, chunksize)
+
+    # Keep the intervals with reported demand
+    reported = ~np.isnan(demand)
+    if not reported.any():
+        raise ValueError(f"No 5-minute demand was found for {year}.")
+    tech_output, demand, flows = tech_output[reported], demand[reported], flows[reported]
+
+    supply_ef, total_output = supply_based_ef_from_technologies(tech_output, technologies, emission_rates)
+    missing_output = int((total_output <= 0).sum())
+    if missing_output:
+        logger.warning("%s intervals have no generator output; their supply-based EF is 0.", f"{missing_output:,}")
+
+    consumption_ef, total_exports, total_imports, _ = consumption_based_ef_from_arrays(
+        supply_ef, total_output, demand, flows, intertie_emission_factors(flow_columns, neighboring_emission_factors)
+    )
+
+    # Delivery Date, hour-ending Hour and Interval of every kept interval
+    positions = np.flatnonzero(reported)
+    interval_starts = start + pd.to_timedelta(positions * 5, unit="min")
+    result = pd.DataFrame({
+        "Delivery Date": interval_starts.strftime("%Y-%m-%d"),
+        "Hour": positions // INTERVALS_PER_HOUR % 24 + 1,
+        "Interval": positions % INTERVALS_PER_HOUR + 1,
+        "Supply-based EF (g CO2e/kWh)": supply_ef,
+        "Consumption-based EF (g CO2e/kWh)": consumption_ef,
+        "Total Output": total_output,
+        "Total Exports (MWh)": total_exports,
+        "Total Imports (MWh)": total_imports,
+    })
+    result.attrs["generator_rows"] = generator_rows
+    return result
+
+
+### 4. Command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute 5-minute emission factors for Ontario from 5-minute IESO reports.")
+    parser.add_argument("year", type=int, help="Year to compute.")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help=f"Directory of the 5-minute reports (default: {DEFAULT_DATA_DIR}).")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB, help="Memory budget of the data in MB, excluding the interpreter (default: 512).")
+    parser.add_argument("--out", default=os.path.join("data", "output"), help="Output directory.")
+    args = parser.parse_args(argv)
+
+    emission_rates = get_emission_rates(interactive=False)
+    neighboring_emission_factors = get_neighboring_emission_factors(interactive=False)
+
+    start_time = time.time()
+    result = calculate_five_minute_ef(args.year, emission_rates, neighboring_emission_factors, args.data_dir, args.memory_mb)
+    elapsed = time.time() - start_time
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"Consumption-based_EF_5min_{args.year}.csv")
+    result.to_csv(path, index=False)
+    print(f"Computed {len(result):,} intervals from {result.attrs['generator_rows']:,} generator rows in {elapsed:.1f} s.")
+    print(f"5-minute EF data saved to: {path}")
+    return 0
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""On-disk cache of parsed and transformed IESO frames.
+
+Entries are stored as uncompressed ``.npz`` files, one array per column, and are
+keyed by the fingerprint (path, size, mtime and content hash) of every source file
+they were built from, the parameters used to build them (e.g. emission factors) and a
+version stamp, so editing a source file, changing a parameter or changing the parser
+makes the old entry unreachable.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .defaults import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest updates are not serialized
+    fcntl = None
+
+# Bump when the on-disk layout of an entry changes
+CACHE_FORMAT_VERSION = 1
+
+
+
+def file_fingerprint(path, known=None):
+    """
+    Fingerprint a source file by path, size, mtime and content hash.
+
+    Args:
+        path (str): Source file.
+        known (dict): Previously computed fingerprints keyed by absolute path. The content
+            hash is reused when size and mtime have not changed.
+
+    Returns:
+        dict: ``path``, ``size``, ``mtime_ns`` and ``sha256`` of the file.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    previous = (known or {}).get(path)
+    if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        return previous
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    return {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def _atomic_write(path, write):
+    """Call ``write(file)`` on a temporary file next to ``path`` and move it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_frame(path, df, meta=None):
+    """Store ``df`` column by column in an uncompressed ``.npz`` file."""
+    arrays = {}
+    columns = []
+    for i, (name, col) in enumerate(df.items()):
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            arrays[f"c{i}"] = col.cat.codes.to_numpy()
+            arrays[f"c{i}_categories"] = np.asarray(col.cat.categories.astype(str), dtype=np.str_)
+            kind = "category"
+        elif col.dtype.kind in "biufcmM":
+            arrays[f"c{i}"] = col.to_numpy()
+            kind = "numeric"
+        else:
+            arrays[f"c{i}"] = np.asarray(col.astype(str), dtype=np.str_)
+            kind = "str"
+        columns.append({"name": name, "kind": kind})
+
+    if isinstance(df.index, pd.RangeIndex):
+        index = {"start": df.index.start, "step": df.index.step}
+    else:
+        arrays["index"] = df.index.to_numpy()
+        index = None
+
+    header = {
+        "format": CACHE_FORMAT_VERSION,
+        "columns": columns,
+        "index": index,
+        "attrs": df.attrs,
+        "meta": meta or {},
+    }
+    arrays["__header__"] = np.array(json.dumps(header, default=int))
+    _atomic_write(path, lambda f: np.savez(f, **arrays))
+
+
+def load_frame(path):
+    """
+    Load a frame written by :func:`save_frame`.
+
+    Returns:
+        pd.DataFrame: The stored frame.
+        dict: The ``meta`` mapping stored with it.
+    """
+    with np.load(path, allow_pickle=False) as npz:
+        header = json.loads(str(npz["__header__"]))
+        if header.get("format") != CACHE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache format in {path}.")
+
+        data = {}
+        for i, column in enumerate(header["columns"]):
+            values = npz[f"c{i}"]
+            if column["kind"] == "category":
+                data[column["name"]] = pd.Categorical.from_codes(values, npz[f"c{i}_categories"])
+            elif column["kind"] == "str":
+                data[column["name"]] = values.astype(object)
+            else:
+                data[column["name"]] = values
+
+        if header["index"] is None:
+            index = npz["index"]
+        else:
+            length = len(next(iter(data.values()))) if data else 0
+            start, step = header["index"]["start"], header["index"]["step"]
+            index = pd.RangeIndex(start, start + length * step, step)
+
+    df = pd.DataFrame(data, index=index)
+    df.attrs.update(header["attrs"])
+
+    return df, header["meta"]
+
+
+class ParsedDataCache:
+    """
+    Size-bounded cache of frames built from IESO source files.
+
+    Args:
+        cache_dir (str): Directory holding the ``.npz`` entries.
+        max_bytes (int): Least recently used entries are evicted above this total size.
+        enabled (bool): When False, frames are always rebuilt and nothing is written.
+        rebuild (bool): When True, existing entries are ignored and overwritten.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True, rebuild=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.rebuild = rebuild
+        self._fingerprints = None
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.cache_dir, "fingerprints.json")
+
+    def _known_fingerprints(self):
+        if self._fingerprints is None:
+            try:
+                with open(self._manifest_path) as f:
+                    self._fingerprints = json.load(f)
+            except (OSError, ValueError):
+                self._fingerprints = {}
+        return self._fingerprints
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold an exclusive lock on the cache directory, so processes sharing it do not drop each other's manifest updates."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save_fingerprints(self, changed):
+        """Add ``changed`` fingerprints to the manifest on disk, keeping those other processes added since it was read."""
+        with self._locked():
+            self._fingerprints = None
+            known = self._known_fingerprints()
+            known.update((fingerprint["path"], fingerprint) for fingerprint in changed)
+            payload = json.dumps(known, indent=1).encode()
+            _atomic_write(self._manifest_path, lambda f: f.write(payload))
+
+    @property
+    def _outputs_path(self):
+        return os.path.join(self.cache_dir, "outputs.json")
+
+    def entry_key(self, name, sources, version, params=None):
+        """Return the key of the entry ``name`` built from ``sources`` and JSON-serializable ``params`` by a builder at ``version``."""
+        known = self._known_fingerprints()
+        fingerprints = [file_fingerprint(path, known) for path in sources]
+        changed = [fingerprint for fingerprint in fingerprints if known.get(fingerprint["path"]) != fingerprint]
+        if changed:
+            self._save_fingerprints(changed)
+
+        payload = json.dumps({"name": name, "version": version, "sources": fingerprints, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def load_or_build(self, name, sources, build, version=0, params=None):
+        """
+        Return the cached frame ``name`` or build and store it.
+
+        Args:
+            name (str): Entry name, e.g. ``"demand_2020"``. Older entries with the same name
+                are removed when a new one is stored.
+            sources (list): Source files the frame is built from.
+            build (callable): Returns the frame when the entry is missing or stale.
+            version (int): Version of the builder; bump it when its output changes.
+            params: JSON-serializable parameters of ``build`` that its output depends on.
+
+        Returns:
+            pd.DataFrame: The cached or freshly built frame.
+        """
+        if not self.enabled:
+            return build()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = self.entry_key(name, sources, version, params)
+        path = os.path.join(self.cache_dir, f"{name}-{key}.npz")
+
+        if not self.rebuild and os.path.exists(path):
+            try:
+                df, _ = load_frame(path)
+                os.utime(path)  # Mark the entry as recently used
+                return df
+            except (OSError, ValueError, KeyError):
+                pass  # Unreadable or outdated entry; rebuild it below
+
+        df = build()
+        self._remove_entries(name, keep=path)
+        save_frame(path, df, meta={"name": name, "version": version})
+        self.evict()
+
+        return df
+
+    def _remove_entries(self, name, keep=None):
+        prefix = f"{name}-"
+        for file_name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, file_name)
+            if file_name.startswith(prefix) and file_name.endswith(".npz") and path != keep:
+                if len(file_name) == len(prefix) + 32 + len(".npz"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:  # Removed by another process sharing the cache
+                        continue
+
+    def output_key(self, path):
+        """Return the key recorded by ``record_output`` for the output file ``path``, or None."""
+        try:
+            with open(self._outputs_path) as f:
+                return json.load(f).get(os.path.abspath(path))
+        except (OSError, ValueError):
+            return None
+
+    def record_output(self, path, key):
+        """Record that the output file ``path`` was written from the entry with ``key``."""
+        if not self.enabled:
+            return
+        with self._locked():
+            try:
+                with open(self._outputs_path) as f:
+                    outputs = json.load(f)
+            except (OSError, ValueError):
+                outputs = {}
+            outputs[os.path.abspath(path)] = key
+            payload = json.dumps(outputs, indent=1).encode()
+            _atomic_write(self._outputs_path, lambda f: f.write(payload))
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in ``max_bytes``."""
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".npz"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, file_name))
+                except FileNotFoundError:  # Removed by another process sharing the cache
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, file_name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove every entry and the fingerprint manifest."""
+        if os.path.isdir(self.cache_dir):
+            for file_name in os.listdir(self.cache_dir):
+                if file_name.endswith(".npz") or file_name in ("fingerprints.json", "outputs.json"):
+                    os.remove(os.path.join(self.cache_dir, file_name))
+        self._fingerprints = None
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Stage-level instrumentation of the emission factor pipeline.
+
+``Instrumentation.stage`` wraps one stage of a run (download, parse, transform, supply
+EF, consumption EF, write) and sends a record of its duration, memory and row counts
+to one or more sinks: a JSON lines file, a logger or any callable. Optional
+profiling adds the tracemalloc peak of each stage or writes a cProfile dump per stage.
+
+Without sinks the instrumentation is disabled and ``stage`` hands out a shared no-op
+context, so instrumented code costs one method call per stage.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS in the records
+    resource = None
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process since it started, in MB.
+
+    Returns:
+        float: The peak, or None where the ``resource`` module is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+### 1. Sinks
+class JsonLinesSink:
+    """Append each record as one JSON line to ``path``; safe to share between processes."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with open(self.path, "a") as f:
+            f.write(line)
+
+class LoggingSink:
+    """Log each record as a one-line summary on the logger ``name``."""
+
+    def __init__(self, name="ontario_ef.stages", level=logging.INFO):
+        self.name = name
+        self.level = level
+
+    def __call__(self, record):
+        details = ", ".join(
+            f"{key}={value}" for key, value in record.items()
+            if key not in ("stage", "duration_s", "started_at") and value is not None
+        )
+        logging.getLogger(self.name).log(self.level, "%s took %.3f s (%s)", record["stage"], record["duration_s"], details)
+
+
+### 2. Stage records
+class StageRecord:
+    """
+    Counts filled in by the instrumented code while a stage runs.
+
+    Attributes:
+        rows_in (int): Rows read by the stage.
+        rows_out (int): Rows produced by the stage.
+        skipped_rows (int): Malformed input rows that were dropped.
+        extra (dict): Any other values to include in the record.
+    """
+
+    def __init__(self):
+        self.rows_in = None
+        self.rows_out = None
+        self.skipped_rows = None
+        self.extra = {}
+
+class _NullStageRecord:
+    """Stage record of disabled instrumentation; every assignment is ignored."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+    @property
+    def extra(self):
+        return {}
+
+class _NullStage:
+    """Reusable no-op stage context."""
+
+    __slots__ = ()
+    record = _NullStageRecord()
+
+    def __enter__(self):
+        return self.record
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+
+### 3. Instrumentation
+class Instrumentation:
+    """
+    Record the stages of a pipeline run.
+
+    Each record holds the duration of the stage, its row counts, the peak RSS of the
+    process since it started (``process_peak_rss_mb``) and how much the stage raised
+    that peak (``peak_rss_growth_mb``). The RSS fields are None on Windows.
+
+    Args:
+        sinks (list): Callables receiving one dict per stage. The instrumentation is
+            disabled when there are none.
+        profile (str): ``"tracemalloc"`` to add the peak traced allocation of each stage,
+            or ``"cprofile"`` to profile each stage into ``profile_dir``.
+        profile_dir (str): Directory receiving the ``.prof`` files of the cProfile mode.
+        **context: Values added to every record, e.g. ``run_id``.
+
+    Example:
+        >>> instrumentation = Instrumentation([JsonLinesSink("stages.jsonl")])
+        >>> with instrumentation.stage("parse", year=2020) as stage:
+        ...     df = parse_and_clean_demand(path)
+        ...     stage.rows_out = len(df)
+    """
+
+    def __init__(self, sinks=None, profile=None, profile_dir=os.path.join("data", "profiles"), **context):
+        if profile not in (None,) + PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {profile!r}; use one of {PROFILE_MODES}.")
+        self.sinks = list(sinks or [])
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.context = context
+
+    @property
+    def enabled(self):
+        return bool(self.sinks)
+
+    def stage(self, name, **context):
+        """
+        Return a context manager timing the stage ``name``.
+
+        The context yields a ``StageRecord`` whose counts are included in the record
+        emitted when the stage ends, along with ``context``.
+        """
+        if not self.sinks:
+            return _NULL_STAGE
+        return self._run_stage(name, context)
+
+    @contextlib.contextmanager
+    def _run_stage(self, name, context):
+        record = StageRecord()
+        profiler = None
+        # The profilers are only imported by the runs that use them
+        if self.profile == "tracemalloc":
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            traced_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        elif self.profile == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # Another profiler is active, e.g. around an enclosing stage
+                profiler = None
+
+        rss_before = peak_rss_mb()
+        started_at = datetime.now().isoformat(timespec="milliseconds")
+        start_time = time.perf_counter()
+        error = None
+        try:
+            yield record
+        except BaseException as exc:
+            error = repr(exc)
+            raise
+        finally:
+            duration = time.perf_counter() - start_time
+            rss_after = peak_rss_mb()
+            result = {
+                "stage": name,
+                **self.context,
+                **context,
+                "started_at": started_at,
+                "duration_s": round(duration, 6),
+                # The process peak is never lowered, so a stage only shows by how much it raised it
+                "process_peak_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+                "peak_rss_growth_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+                "rows_in": record.rows_in,
+                "rows_out": record.rows_out,
+                "skipped_rows": record.skipped_rows,
+                **record.extra,
+                "pid": os.getpid(),
+            }
+            if error is not None:
+                result["error"] = error
+
+            if self.profile == "tracemalloc":
+                result["traced_peak_mb"] = round((tracemalloc.get_traced_memory()[1] - traced_start) / (1024 * 1024), 1)
+            elif profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                label = "-".join(str(value) for value in context.values())
+                path = os.path.join(self.profile_dir, f"{name}{'-' + label if label else ''}-{os.getpid()}-{int(time.time() * 1000)}.prof")
+                profiler.dump_stats(path)
+                result["profile"] = path
+
+            for sink in self.sinks:
+                sink(result)
+
+# Shared disabled instance used when no instrumentation is given
+DISABLED = Instrumentation()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Estimate hourly marginal emission factors alongside the average EFs.
+
+The average EFs of ``calculate_supply_based_ef`` and ``calculate_consumption_based_ef``
+divide all emissions by all output or demand. The marginal EF is the change in emissions
+per MWh of demand change instead, estimated as the slope of an ordinary least squares
+regression of hour-to-hour emission changes on demand changes:
+
+    E(t) - E(t-1) = a + MEF x (D(t) - D(t-1))
+
+where ``E`` is the emissions of Ontario generators plus imports (t CO2e) and ``D`` is
+Ontario demand (MWh). Exports are not taken out of ``E``: the generators' emissions
+include the output sent to neighboring regions, so export changes that coincide with
+demand changes are part of the estimated response. Two estimates are produced:
+
+* binned: one regression per season and hour of day over all the years given;
+* rolling: one regression per hour, over the same hour of day of the previous
+  ``--window-days`` calendar days (not including the hour's own day), so the estimate
+  follows changes in the supply mix. Days missing from the reports shorten a window.
+
+Both are computed from sums of the deltas, their squares and cross products: the bins
+with ``np.bincount`` and the rolling windows with differences of cumulative sums, so
+every regression is computed at once without a loop over groups.
+
+Example:
+    python src/marginal_ef.py --years 2020-2024 --window-days 30
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .pipeline import (
+    OUTPUT_DIR, align_on_timesteps, get_emission_rates, get_neighboring_emission_factors, intertie_emission_factors,
+    map_generator_technologies, parse_years, prepare_year_data, timestep_keys, timestep_starts
+)
+from .neighbor_factors import NeighborFactorSeries
+
+
+SEASONS = ["Winter", "Spring", "Summer", "Fall"]
+# Season of each month, January first: Dec-Feb winter, Mar-May spring, Jun-Aug summer, Sep-Nov fall
+MONTH_SEASONS = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+DEFAULT_WINDOW_DAYS = 30
+DEFAULT_MIN_OBSERVATIONS = 10
+
+
+### 1. Hourly emissions and demand
+def hourly_emissions(transformed_gen_data, demand_df, transformed_trade_flow, emission_rates, neighboring_emission_factors,
+                     neighbor_series=None):
+    """
+    Calculate the emissions and demand of every timestep.
+
+    Args:
+        transformed_gen_data (pd.DataFrame): Hourly output per Fuel-Generator column.
+        demand_df (pd.DataFrame): Ontario demand data.
+        transformed_trade_flow (pd.DataFrame): Preprocessed trade flow data.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+        neighboring_emission_factors (dict): Emission factors per region in t CO2e/MWh.
+        neighbor_series (NeighborFactorSeries): Time-varying factors of the neighboring regions.
+
+    Returns:
+        pd.DataFrame: ``Delivery Date`` and ``Hour`` of every timestep.
+        np.ndarray: ``datetime64`` EST start of every timestep.
+        np.ndarray: Emissions of Ontario generators plus imports in t CO2e.
+        np.ndarray: Ontario demand in MWh.
+
+    Raises:
+        MisalignedTimestepsError: If the inputs do not cover the same timesteps.
+    """
+    timesteps = transformed_gen_data[["Delivery Date", "Hour"]].reset_index(drop=True)
+    keys = timestep_keys(timesteps, "Delivery Date")
+    aligned = align_on_timesteps(keys, {
+        "demand_df": (demand_df, "Date"),
+        "transformed_trade_flow": (transformed_trade_flow, "Date"),
+    })
+    hour_starts = timestep_starts(keys)
+
+    # Generator emissions from the output per technology
+    generator_columns = transformed_gen_data.columns[2:]
+    technologies, membership = map_generator_technologies(generator_columns)
+    gen_output = np.nan_to_num(transformed_gen_data[generator_columns].to_numpy(dtype=np.float64))
+    generator_emissions = (gen_output @ membership) @ np.array([emission_rates[tech] for tech in technologies], dtype=np.float64)
+
+    # Import emissions at the neighboring region factors
+    trade_flow = aligned["transformed_trade_flow"]
+    flow_columns = [col for col in trade_flow.columns if col not in ["Date", "Hour"]]
+    intertie_factors = intertie_emission_factors(flow_columns, neighboring_emission_factors)
+    if neighbor_series is not None:
+        intertie_factors = neighbor_series.factor_matrix(hour_starts, flow_columns, intertie_factors)
+    flows = trade_flow[flow_columns].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    import_emissions = (np.where(flows < 0, -flows, 0) * intertie_factors).sum(axis=1)
+
+    demand = pd.to_numeric(aligned["demand_df"]["Ontario Demand"], errors="coerce").to_numpy(dtype=np.float64)
+    return timesteps, hour_starts, generator_emissions + import_emissions, demand
+
+def hourly_deltas(hour_starts, emissions, demand):
+    """
+    Calculate the change in emissions and demand from the previous hour.
+
+    Returns:
+        np.ndarray: Emission change of every timestep in t CO2e.
+        np.ndarray: Demand change of every timestep in MWh.
+        np.ndarray: Whether the change is usable: the previous timestep is the previous
+            hour and both values are finite. False for the first timestep.
+    """
+    delta_emissions = np.zeros_like(emissions)
+    delta_demand = np.zeros_like(demand)
+    delta_emissions[1:] = np.diff(emissions)
+    delta_demand[1:] = np.diff(demand)
+
+    valid = np.zeros(len(hour_starts), dtype=bool)
+    valid[1:] = np.diff(hour_starts) == np.timedelta64(1, "h")
+    valid &= np.isfinite(delta_emissions) & np.isfinite(delta_demand)
+    return np.where(valid, delta_emissions, 0), np.where(valid, delta_demand, 0), valid
+
+
+### 2. Batched regressions
+REGRESSION_SUMS = 6  # n, sum x, sum y, sum xx, sum xy, sum yy
+
+def regression_terms(delta_demand, delta_emissions, valid):
+    """Return the (timesteps x 6) terms summed by the regressions, 0 for unusable timesteps."""
+    x, y = delta_demand, delta_emissions
+    return np.column_stack([valid, x, y, x * x, x * y, y * y]) * valid[:, None]
+
+def regressions_from_sums(sums, min_observations=DEFAULT_MIN_OBSERVATIONS):
+    """
+    Solve every least squares regression from its sums.
+
+    Args:
+        sums (np.ndarray): (regressions x 6) sums of ``regression_terms``.
+        min_observations (int): Regressions with fewer observations are NaN.
+
+    Returns:
+        dict: Arrays of the ``slope`` and ``intercept`` (t CO2e/MWh and t CO2e), the
+        ``std_error`` of the slope, ``r2`` and number of ``observations``.
+    """
+    n, sx, sy, sxx, sxy, syy = sums.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Centered sums of squares and cross products
+        sxx_c = sxx - sx * sx / n
+        sxy_c = sxy - sx * sy / n
+        syy_c = syy - sy * sy / n
+        slope = sxy_c / sxx_c
+        intercept = (sy - slope * sx) / n
+        residuals = np.maximum(syy_c - slope * sxy_c, 0)
+        std_error = np.sqrt(residuals / (n - 2) / sxx_c)
+        r2 = sxy_c * sxy_c / (sxx_c * syy_c)
+
+    solvable = (n >= max(min_observations, 3)) & (sxx_c > 0)
+    return {
+        "slope": np.where(solvable, slope, np.nan),
+        "intercept": np.where(solvable, intercept, np.nan),
+        "std_error": np.where(solvable, std_error, np.nan),
+        "r2": np.where(solvable & (syy_c > 0), r2, np.nan),
+        "observations": n.astype(np.int64),
+    }
+
+def binned_regressions(groups, n_groups, terms, min_observations=DEFAULT_MIN_OBSERVATIONS):
+    """
+    Fit one regression per group.
+
+    Args:
+        groups (np.ndarray): Group of every timestep, in ``range(n_groups)``.
+        n_groups (int): Number of groups.
+        terms (np.ndarray): Output of ``regression_terms``.
+        min_observations (int): Groups with fewer observations are NaN.
+
+    Returns:
+        dict: Output of ``regressions_from_sums``, one value per group.
+    """
+    # One bincount over (group, term) pairs sums every term of every group
+    flat_ids = (groups[:, None] * REGRESSION_SUMS + np.arange(REGRESSION_SUMS)).ravel()
+    sums = np.bincount(flat_ids, weights=terms.ravel(), minlength=n_groups * REGRESSION_SUMS)
+    return regressions_from_sums(sums.reshape(n_groups, REGRESSION_SUMS), min_observations)
+
+def rolling_regressions(groups, days, terms, window, min_observations=DEFAULT_MIN_OBSERVATIONS):
+    """
+    Fit one regression per timestep over the timesteps of its group in the ``window`` days before its day.
+
+    Args:
+        groups (np.ndarray): Group of every timestep, e.g. its hour of day.
+        days (np.ndarray): Day number of every timestep, e.g. days since 1970-01-01.
+        terms (np.ndarray): Output of ``regression_terms``, in time order.
+        window (int): Calendar days in each window. A timestep on day ``d`` uses the
+            timesteps of its group on days ``d - window`` to ``d - 1``; missing days
+            leave the window with fewer timesteps.
+        min_observations (int): Windows with fewer observations are NaN.
+
+    Returns:
+        dict: Output of ``regressions_from_sums``, one value per timestep.
+    """
+    # Sort by group, keeping time order within each group, and key every timestep by (group, day)
+    order = np.argsort(groups, kind="stable")
+    offsets = days[order] - days.min()
+    keys = groups[order] * (offsets.max() + window + 1) + offsets
+    cumulative = np.zeros((len(order) + 1, REGRESSION_SUMS))
+    np.cumsum(terms[order], axis=0, out=cumulative[1:])
+
+    # Each window covers days [day - window, day) of the timestep's group
+    starts = np.searchsorted(keys, keys - window, side="left")
+    ends = np.searchsorted(keys, keys, side="left")
+    sorted_sums = cumulative[ends] - cumulative[starts]
+
+    sums = np.empty_like(sorted_sums)
+    sums[order] = sorted_sums
+    return regressions_from_sums(sums, min_observations)
+
+
+### 3. Marginal emission factors
+def estimate_marginal_ef(hour_starts, emissions, demand, window_days=DEFAULT_WINDOW_DAYS, min_observations=DEFAULT_MIN_OBSERVATIONS):
+    """
+    Estimate the binned and rolling marginal EFs of every timestep.
+
+    Args:
+        hour_starts (np.ndarray): ``datetime64`` EST start of every timestep, in time order.
+        emissions (np.ndarray): Emissions of every timestep in t CO2e.
+        demand (np.ndarray): Demand of every timestep in MWh.
+        window_days (int): Calendar days before the day of a timestep in its rolling window.
+        min_observations (int): Regressions with fewer hourly changes are NaN.
+
+    Returns:
+        pd.DataFrame: One row per season and hour of day with the marginal EF in
+        g CO2e/kWh, its standard error, R² and observations.
+        np.ndarray: Binned marginal EF of every timestep in g CO2e/kWh.
+        np.ndarray: Rolling marginal EF of every timestep in g CO2e/kWh.
+    """
+    hour_starts = np.asarray(hour_starts, dtype="datetime64[h]")
+    delta_emissions, delta_demand, valid = hourly_deltas(hour_starts, emissions, demand)
+    terms = regression_terms(delta_demand, delta_emissions, valid)
+
+    # IESO hours are hour-ending: hour 1 starts at 00:00
+    hour_of_day = (hour_starts - hour_starts.astype("datetime64[D]")).astype(np.int64)
+    months = hour_starts.astype("datetime64[M]").astype(np.int64) % 12
+    groups = MONTH_SEASONS[months] * 24 + hour_of_day
+
+    binned = binned_regressions(groups, len(SEASONS) * 24, terms, min_observations)
+    days = hour_starts.astype("datetime64[D]").astype(np.int64)
+    rolling = rolling_regressions(hour_of_day, days, terms, window_days, min_observations)
+
+    # Convert t CO2e/MWh to g CO2e/kWh for publishing
+    by_season_hour = pd.DataFrame({
+        "Season": np.repeat(SEASONS, 24),
+        "Hour": np.tile(np.arange(1, 25), len(SEASONS)),
+        "Marginal EF (g CO2e/kWh)": binned["slope"] * 1000,
+        "Standard Error (g CO2e/kWh)": binned["std_error"] * 1000,
+        "R2": binned["r2"],
+        "Observations": binned["observations"],
+    })
+    return by_season_hour, binned["slope"][groups] * 1000, rolling["slope"] * 1000
+
+
+### 4. Command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate hourly marginal emission factors by season and hour of day.")
+    parser.add_argument("--years", type=parse_years, required=True, help="Years to use, e.g. 2022 or 2020-2024.")
+    parser.add_argument("--window-days", type=int, default=DEFAULT_WINDOW_DAYS, help="Calendar days before each day in its rolling regression window.")
+    parser.add_argument("--min-observations", type=int, default=DEFAULT_MIN_OBSERVATIONS,
+                        help="Fewest hourly changes of a regression; regressions with fewer are left empty.")
+    parser.add_argument("--neighbor-series", help="CSV or Parquet file of hourly or monthly neighboring region factors.")
+    parser.add_argument("--max-gap-hours", type=float, default=None, help="Longest time a series factor is carried forward.")
+    parser.add_argument("--out", default=os.path.join(OUTPUT_DIR, "marginal"), help="Output directory.")
+    args = parser.parse_args(argv)
+    if args.window_days < 1:
+        parser.error("--window-days must be at least 1.")
+
+    emission_rates = get_emission_rates(False)
+    neighboring_emission_factors = get_neighboring_emission_factors(False)
+    neighbor_series = NeighborFactorSeries.from_file(args.neighbor_series, args.max_gap_hours) if args.neighbor_series else None
+
+    # Concatenate the years so the changes across year boundaries are kept
+    years = [hourly_emissions(*prepare_year_data(year), emission_rates, neighboring_emission_factors, neighbor_series)
+             for year in args.years]
+    timesteps = pd.concat([year[0] for year in years], ignore_index=True)
+    hour_starts, emissions, demand = (np.concatenate([year[i] for year in years]) for i in (1, 2, 3))
+
+    start_time = time.time()
+    by_season_hour, binned_mef, rolling_mef = estimate_marginal_ef(hour_starts, emissions, demand, args.window_days,
+                                                                   args.min_observations)
+    print(f"Estimated marginal EFs for {len(timesteps):,} hours in {time.time() - start_time:.2f} s.")
+
+    os.makedirs(args.out, exist_ok=True)
+    span = f"{args.years[0]}" if len(args.years) == 1 else f"{args.years[0]}-{args.years[-1]}"
+    by_season_hour.to_csv(os.path.join(args.out, f"Marginal_EF_by_Season_Hour_{span}.csv"), index=False)
+
+    hourly = timesteps.assign(**{
+        "Binned Marginal EF (g CO2e/kWh)": binned_mef,
+        "Rolling Marginal EF (g CO2e/kWh)": rolling_mef,
+    })
+    year_of_hour = hour_starts.astype("datetime64[Y]").astype(np.int64) + 1970
+    for year in args.years:
+        hourly[year_of_hour == year].to_csv(os.path.join(args.out, f"Marginal_EF_{year}.csv"), index=False)
+    print(f"Marginal EF data saved to: {args.out}")
+    return 0
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Time-varying emission factors of the neighboring regions.
+
+A factor series file holds one row per region and period start, at any resolution
+(hourly, daily, monthly...), in CSV or Parquet format:
+
+    Region,Timestamp,Emission Factor (t CO2e/GWh)
+    Michigan,2022-01-01,498
+    Michigan,2022-02-01,505
+    New York,2022-01-01 00:00,230
+
+Timestamps are the EST start of the period a factor applies to; timezone-aware values
+are converted to EST. Each factor is carried forward until the next one of its region,
+for at most ``max_gap_hours`` when given. Hours before the first factor of a region,
+beyond the gap limit, or of regions without a series use the scalar factors of
+``data/neighboring_emission_factors.csv``.
+"""
+
+import hashlib
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from .ef_store import EST_TIMEZONE
+
+
+logger = logging.getLogger("ontario_ef")
+
+FACTOR_COLUMN = "Emission Factor (t CO2e/GWh)"
+
+
+def region_key(name):
+    """Key matching a region to its interties: the first 3 letters, upper case."""
+    return str(name).upper()[:3]
+
+
+class NeighborFactorSeries:
+    """
+    Factor series of the neighboring regions, aligned to timesteps with a vectorized as-of join.
+
+    Args:
+        series (dict): Maps a region key (see ``region_key``) to a ``(times, factors)`` pair
+            of sorted ``datetime64[ns]`` period starts (EST) and factors in t CO2e/MWh.
+        max_gap_hours (float): Longest time a factor is carried forward; unlimited when None.
+    """
+
+    def __init__(self, series, max_gap_hours=None):
+        self.series = series
+        self.max_gap_hours = max_gap_hours
+
+    @classmethod
+    def from_file(cls, path, max_gap_hours=None):
+        """Load a CSV or Parquet factor series file (see the module docstring for its layout)."""
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Neighboring emission factor series not found at {path}.")
+
+        if path.lower().endswith((".parquet", ".pq")):
+            try:
+                df = pd.read_parquet(path)
+            except ImportError:
+                raise ImportError("Reading Parquet factor series requires pyarrow (pip install pyarrow).")
+        else:
+            df = pd.read_csv(path)
+
+        expected_cols = {"Region", "Timestamp", FACTOR_COLUMN}
+        if not expected_cols.issubset(df.columns):
+            raise ValueError(f"Neighboring emission factor series must contain columns {expected_cols}.")
+
+        times = pd.to_datetime(df["Timestamp"], utc=False)
+        if getattr(times.dt, "tz", None) is not None:
+            times = times.dt.tz_convert(EST_TIMEZONE).dt.tz_localize(None)
+        df = pd.DataFrame({
+            "region": df["Region"].map(region_key),
+            "time": times.to_numpy(dtype="datetime64[ns]"),
+            # Convert to t CO2e/MWh for calculations
+            "factor": pd.to_numeric(df[FACTOR_COLUMN], errors="coerce").to_numpy(dtype=np.float64) / 1000,
+        }).dropna().sort_values(["region", "time"], kind="stable")
+
+        series = {}
+        for region, group in df.groupby("region", sort=True):
+            # Keep the last factor given for a repeated timestamp
+            group = group.drop_duplicates("time", keep="last")
+            series[region] = (group["time"].to_numpy(), group["factor"].to_numpy())
+
+        return cls(series, max_gap_hours)
+
+    def fingerprint(self):
+        """Return a hash of the factors and gap limit, identifying the series in cache keys."""
+        digest = hashlib.sha256(repr(self.max_gap_hours).encode())
+        for region in sorted(self.series):
+            times, values = self.series[region]
+            digest.update(region.encode())
+            digest.update(np.ascontiguousarray(times).tobytes())
+            digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()
+
+    def factors(self, region, hour_starts, fallback):
+        """
+        Return the factor of ``region`` for every hour.
+
+        Args:
+            region (str): Region key.
+            hour_starts (np.ndarray): ``datetime64[ns]`` EST start of every hour.
+            fallback (float): Factor used where the series has no value.
+
+        Returns:
+            np.ndarray: Factor of every hour in t CO2e/MWh.
+            int: Number of hours that used ``fallback``.
+        """
+        if region not in self.series:
+            return np.full(len(hour_starts), fallback, dtype=np.float64), len(hour_starts)
+
+        times, values = self.series[region]
+        position = np.searchsorted(times, hour_starts, side="right") - 1
+        covered = position >= 0
+        if self.max_gap_hours is not None:
+            gap = (hour_starts - times[np.maximum(position, 0)]) / np.timedelta64(1, "h")
+            covered &= gap <= self.max_gap_hours
+
+        factors = np.where(covered, values[np.maximum(position, 0)], fallback)
+        return factors, int((~covered).sum())
+
+    def factor_matrix(self, hour_starts, flow_columns, fallback_factors):
+        """
+        Build the (hours x interties) factor matrix of the consumption-based EF.
+
+        Args:
+            hour_starts (np.ndarray): ``datetime64[ns]`` EST start of every hour.
+            flow_columns (list): Intertie flow columns, e.g. ``"NEW-YORK Flow"``.
+            fallback_factors (np.ndarray): Scalar factor of each intertie in t CO2e/MWh.
+
+        Returns:
+            np.ndarray: Factor of every hour and intertie in t CO2e/MWh.
+        """
+        hour_starts = np.asarray(hour_starts, dtype="datetime64[ns]")
+        matrix = np.empty((len(hour_starts), len(flow_columns)))
+        for i, col in enumerate(flow_columns):
+            region = region_key(col.split(" ")[0])
+            matrix[:, i], fallback_hours = self.factors(region, hour_starts, fallback_factors[i])
+            if fallback_hours and region in self.series:
+                logger.info("%d hours of region '%s' use the scalar emission factor.", fallback_hours, region)
+        return matrix
@@ -0,0 +1,1594 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+
+
+## 1. Import Necessary Libraries
+import pandas as pd
+import numpy as np
+import argparse
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+# Only the standard-library modules are imported up front. The stores, the parsed data cache,
+# the result writers and the worker pools are imported by the functions that use them, so
+# ``from ontario_ef import compute_year`` loads pandas and numpy and little else.
+from .defaults import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, DEFAULT_OUTPUT_DIR, DEFAULT_RESULT_FORMATS, DEFAULT_STORE_PATH, RESULT_FORMATS
+from .instrumentation import DISABLED, PROFILE_MODES
+
+# Progress messages; main() prints them to the console
+logger = logging.getLogger("ontario_ef")
+
+# Names re-exported by ``from ontario_ef.pipeline import *`` (e.g. by the Ontario_EF_Code script)
+__all__ = [
+    # 2. Download, parse and transform the IESO reports
+    "DOWNLOAD_WORKERS", "DOWNLOAD_RETRIES", "DOWNLOAD_BACKOFF", "create_session", "report_is_complete", "download_file",
+    "download_files", "GENERATOR_COLUMNS", "HOUR_COLUMNS", "parse_and_clean_generator_month", "parse_generator_rows",
+    "parse_generator_month", "transform_generator_month", "map_generator_months", "aggregate_generator_data",
+    "aggregate_transformed_generator_data", "concat_generator_months", "GeneratorOutput", "transform_generator_data",
+    "get_emission_rates", "get_neighboring_emission_factors", "parse_and_clean_demand", "parse_demand_lines",
+    "parse_and_clean_trade_flow", "parse_trade_flow_lines", "transform_trade_flow",
+    # 3. Emission factors
+    "TECH_PREFIX_MAP", "map_generator_technologies", "calculate_supply_based_ef", "technology_output", "supply_based_ef_frames",
+    "supply_based_ef_from_technologies", "MisalignedTimestepsError", "timestep_keys", "timestep_starts", "align_on_timesteps",
+    "calculate_consumption_based_ef", "intertie_emission_factors", "consumption_based_ef_from_arrays",
+    # 4. Years, stages and the command line
+    "IESO_REPORTS_URL", "IESO_DATA_DIR", "OUTPUT_DIR", "PARSER_VERSION", "STAGE_VERSION", "consumption_ef_path",
+    "year_source_files", "download_year_files", "load_or_build", "setup_year_data", "prepare_year_data",
+    "load_transformed_generator_data", "load_demand_and_trade_flow", "instrumented_parse", "YearStages", "compute_year",
+    "run_year", "parse_years", "run_years", "print_timing_summary", "parse_args", "create_instrumentation", "main",
+]
+
+
+
+## 2. Helper Functions
+### 2.1 Fetch data from URLs
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF = 1.0  # Seconds before the first retry, doubled after each failed attempt
+
+def create_session(pool_size=DOWNLOAD_WORKERS):
+    """Create a ``requests.Session`` whose connection pool serves ``pool_size`` concurrent downloads."""
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def report_is_complete(file_path):
+    """
+    Tell whether a downloaded IESO report was created after the end of the period it covers.
+
+    IESO reports open with ``\\Created at <timestamp>`` and ``\\For <month> <year>`` (or
+    ``\\For <year>``) rows. Reports of a period that was over when they were created are no
+    longer updated upstream, so they do not need to be revalidated.
+    """
+    if not os.path.exists(file_path):
+        return False
+
+    with open(file_path, 'r') as file:
+        preamble = "".join(file.readline() for _ in range(3))
+
+    created = re.search(r"Created at (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})", preamble)
+    period = re.search(r"For (?:([A-Za-z]+) )?(\d{4})", preamble)
+    if not created or not period:
+        return False
+
+    year = int(period.group(2))
+    if period.group(1):
+        month = datetime.strptime(period.group(1), "%B").month
+        period_end = datetime(year + month // 12, month % 12 + 1, 1)
+    else:
+        period_end = datetime(year + 1, 1, 1)
+
+    return datetime.strptime(created.group(1), "%Y-%m-%d %H:%M:%S") >= period_end
+
+def _is_retryable(error):
+    """Retry connection problems, timeouts, throttling and server errors, but not other HTTP errors."""
+    import requests
+
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return True
+
+def download_file(url, save_path, session=None, refresh=True, retries=DOWNLOAD_RETRIES, backoff=DOWNLOAD_BACKOFF):
+    """
+    Download ``url`` to ``save_path``, refreshing an existing copy only when it changed upstream.
+
+    The directory of ``save_path`` is created when the file is written.
+
+    An existing file is revalidated with a conditional GET (``If-None-Match`` with the ETag of
+    the previous download and ``If-Modified-Since`` with the file mtime). New content is
+    streamed to a temporary file that replaces ``save_path`` once complete. Failed attempts
+    are retried with exponential backoff; if all of them fail, an existing copy is kept.
+
+    Args:
+        url (str): File to download.
+        save_path (str): Local destination.
+        session (requests.Session): Session to reuse; a one-off request is made without one.
+        refresh (bool): When False, an existing file is used without contacting the server.
+        retries (int): Number of retries after the first attempt.
+        backoff (float): Seconds before the first retry.
+
+    Returns:
+        str: ``save_path``.
+    """
+    exists = os.path.exists(save_path)
+    if exists and not refresh:
+        logger.info("File already exists: %s", save_path)
+        return save_path
+
+    # Imported here so that runs on local files do not pay for it
+    import tempfile
+    from email.utils import formatdate, parsedate_to_datetime
+
+    import requests
+
+    etag_path = save_path + ".etag"
+    headers = {}
+    if exists:
+        headers["If-Modified-Since"] = formatdate(os.path.getmtime(save_path), usegmt=True)
+        if os.path.exists(etag_path):
+            with open(etag_path, 'r') as f:
+                headers["If-None-Match"] = f.read().strip()
+
+    for attempt in range(retries + 1):
+        try:
+            with (session or requests).get(url, headers=headers, stream=True, timeout=30) as response:
+                if response.status_code == 304:
+                    logger.info("File is up to date: %s", save_path)
+                    return save_path
+                response.raise_for_status()
+
+                # Stream the body to a temporary file and move it into place once complete
+                os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(save_path) or ".", prefix=".download-")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            f.write(chunk)
+                    os.replace(tmp_path, save_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+                # Remember the validators of this version for the next conditional GET
+                last_modified = response.headers.get("Last-Modified")
+                if last_modified:
+                    timestamp = parsedate_to_datetime(last_modified).timestamp()
+                    os.utime(save_path, (timestamp, timestamp))
+                etag = response.headers.get("ETag")
+                if etag:
+                    with open(etag_path, 'w') as f:
+                        f.write(etag)
+                elif os.path.exists(etag_path):
+                    os.remove(etag_path)
+            break
+        except requests.RequestException as error:
+            if attempt == retries or not _is_retryable(error):
+                if exists:
+                    logger.warning("Could not refresh %s (%s); using the local copy.", save_path, error)
+                    return save_path
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+    logger.info("Downloaded: %s", save_path)
+
+    return save_path
+
+def download_files(files, session=None, max_workers=DOWNLOAD_WORKERS, refresh_complete=False):
+    """
+    Download ``(url, local path)`` pairs concurrently over one pooled session.
+
+    Local copies of reports that are already complete (see ``report_is_complete``) are used
+    as they are unless ``refresh_complete`` is True; all other files are revalidated.
+
+    Returns:
+        list: Local paths, in the order of ``files``.
+    """
+    refresh = [refresh_complete or not report_is_complete(local_path) for _, local_path in files]
+    if not any(refresh):
+        return [download_file(url, local_path, refresh=False) for url, local_path in files]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    own_session = session is None
+    session = session or create_session(max_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(download_file, url, local_path, session, refresh_file)
+                for (url, local_path), refresh_file in zip(files, refresh)
+            ]
+            return [future.result() for future in futures]
+    finally:
+        if own_session:
+            session.close()
+
+### 2.2 Parse and Clean Generator Data
+GENERATOR_COLUMNS = [
+    'Delivery Date', 'Generator', 'Fuel Type', 'Measurement',
+    'Hour 1', 'Hour 2', 'Hour 3', 'Hour 4', 'Hour 5', 'Hour 6',
+    'Hour 7', 'Hour 8', 'Hour 9', 'Hour 10', 'Hour 11', 'Hour 12',
+    'Hour 13', 'Hour 14', 'Hour 15', 'Hour 16', 'Hour 17', 'Hour 18',
+    'Hour 19', 'Hour 20', 'Hour 21', 'Hour 22', 'Hour 23', 'Hour 24'
+]
+HOUR_COLUMNS = GENERATOR_COLUMNS[4:]
+
+def parse_and_clean_generator_month(file_path, measurements=("Output",)):
+    """
+    Parse a ``PUB_GenOutputCapabilityMonth`` file with the C CSV engine.
+
+    Rows must hold exactly 28 fields once trailing commas are removed; other rows are
+    dropped and their count is reported and stored in ``raw_df.attrs["skipped_rows"]``.
+
+    Args:
+        file_path (str): Path to the monthly generator file.
+        measurements (tuple): Measurement rows to keep, e.g. ``("Output",)``.
+
+    Returns:
+        pd.DataFrame: One row per generator, day and measurement with float32 hour columns
+        and categorical ``Generator``, ``Fuel Type`` and ``Measurement`` columns.
+    """
+    with open(file_path, 'rb') as file:
+        content = file.read()
+
+    # Skip the preamble rows starting with "\\" and the column header row
+    data_start = 0
+    while data_start < len(content):
+        is_preamble = content.startswith(b'\\', data_start)
+        line_end = content.find(b'\n', data_start)
+        data_start = len(content) if line_end == -1 else line_end + 1
+        if not is_preamble:
+            break
+    return parse_generator_rows(content[data_start:], measurements, file_path)
+
+def parse_generator_rows(data, measurements=("Output",), source="generator data"):
+    """
+    Parse the data rows of a ``PUB_GenOutputCapabilityMonth`` file, without preamble or header.
+
+    Args:
+        data (bytes): Data rows, e.g. the rows appended to a file since it was last read.
+        measurements (tuple): Measurement rows to keep.
+        source (str): Name of the rows in warnings.
+
+    Returns:
+        pd.DataFrame: Same layout as ``parse_and_clean_generator_month``.
+    """
+    lines = data.split(b'\n')
+    total_rows = len(lines) - lines.count(b'') - lines.count(b'\r')
+
+    # Data rows end with a trailing comma, so a well-formed row has 29 fields. Hours 1-23 are parsed
+    # straight to float32, with blank cells and the hour labels of repeated header rows as NaN. Hour 24
+    # is read as text, so that a missing field can be told from a blank one
+    read_options = dict(
+        header=None,
+        names=GENERATOR_COLUMNS + ['Trailing'],
+        on_bad_lines='skip',
+        engine='c'
+    )
+    label_dtypes = {
+        'Delivery Date': str, 'Generator': 'category', 'Fuel Type': 'category', 'Measurement': 'category', 'Hour 24': str, 'Trailing': str
+    }
+    try:
+        raw_df = pd.read_csv(
+            io.BytesIO(data),
+            dtype={**{col: np.float32 for col in HOUR_COLUMNS[:-1]}, **label_dtypes},
+            na_values={col: [' ', col] for col in HOUR_COLUMNS[:-1]},
+            **read_options
+        )
+    except ValueError:
+        # Some other non-numeric hour cell: read the hours as text and convert them column by column
+        raw_df = pd.read_csv(io.BytesIO(data), dtype=label_dtypes, **read_options)
+        raw_df[HOUR_COLUMNS[:-1]] = raw_df[HOUR_COLUMNS[:-1]].apply(lambda col: pd.to_numeric(col, errors='coerce')).astype(np.float32)
+
+    # Drop rows with missing trailing hours or extra fields, as well as repeated header rows
+    malformed = raw_df['Hour 24'].isna() | raw_df['Trailing'].notna()
+    skipped_rows = total_rows - len(raw_df) + int(malformed.sum())
+    raw_df = raw_df[~malformed & raw_df['Measurement'].isin(measurements)]
+    if skipped_rows:
+        logger.warning("Skipped %d malformed rows in %s", skipped_rows, source)
+
+    # Keep only the labels of the remaining rows as categories
+    raw_df = pd.concat([
+        raw_df[['Delivery Date']],
+        raw_df[['Generator', 'Fuel Type', 'Measurement']].apply(lambda col: col.cat.remove_unused_categories()),
+        raw_df[HOUR_COLUMNS[:-1]],
+        pd.to_numeric(raw_df['Hour 24'], errors='coerce').astype(np.float32)
+    ], axis=1).reset_index(drop=True)
+    raw_df.attrs["skipped_rows"] = skipped_rows
+
+    return raw_df
+
+### 2.3 Aggregate Generator Data for a Year
+def parse_generator_month(local_path, cache=None):
+    """Parse one monthly generator file, going through ``cache`` when one is given."""
+    month_name = os.path.splitext(os.path.basename(local_path))[0]
+    return load_or_build(cache, month_name, [local_path], lambda: parse_and_clean_generator_month(local_path))
+
+def transform_generator_month(local_path, cache=None):
+    """Parse one monthly generator file into a compact ``GeneratorOutput`` block."""
+    return GeneratorOutput.from_raw(parse_generator_month(local_path, cache))
+
+def map_generator_months(func, local_paths, cache=None, jobs=None):
+    """
+    Apply ``func(local_path, cache)`` to every monthly file.
+
+    Months are independent, so they are spread over a process pool of ``jobs`` workers
+    (one per CPU by default). ``jobs=1`` runs them one after another in this process.
+    """
+    jobs = min(jobs or os.cpu_count() or 1, len(local_paths))
+    if jobs <= 1:
+        return [func(local_path, cache) for local_path in local_paths]
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(func, local_paths, [cache] * len(local_paths)))
+
+def aggregate_generator_data(year, cache=None, download=True, jobs=None, data_dir=None):
+    # Download the files
+    generator_files, _, _ = year_source_files(year, data_dir)
+    if download:
+        download_files(generator_files)
+
+    # Parse and clean the monthly data
+    monthly_data = map_generator_months(parse_generator_month, [local_path for _, local_path in generator_files], cache, jobs)
+
+    # Concatenate all monthly data into a single yearly DataFrame
+    yearly_data = concat_generator_months(monthly_data)
+
+    return yearly_data
+
+def aggregate_transformed_generator_data(year, cache=None, download=True, jobs=None, instrumentation=DISABLED, data_dir=None):
+    """
+    Parse and reshape the 12 monthly generator files of ``year`` in parallel.
+
+    Returns:
+        pd.DataFrame: Same layout as ``transform_generator_data`` applied to the whole year.
+    """
+    generator_files, _, _ = year_source_files(year, data_dir)
+    if download:
+        download_files(generator_files)
+
+    with instrumentation.stage("parse", year=year, source="generator") as stage:
+        monthly_blocks = map_generator_months(transform_generator_month, [local_path for _, local_path in generator_files], cache, jobs)
+        stage.rows_out = sum(block.source_rows for block in monthly_blocks)
+        stage.skipped_rows = sum(block.skipped_rows for block in monthly_blocks)
+
+    # Generators that are commissioned or retired mid-year get NaN for the months they are missing from
+    with instrumentation.stage("transform", year=year, source="generator") as stage:
+        yearly_data = GeneratorOutput.concat(monthly_blocks).to_frame()
+        stage.rows_in = sum(block.source_rows for block in monthly_blocks)
+        stage.rows_out = len(yearly_data)
+
+    return yearly_data
+
+def concat_generator_months(monthly_data):
+    """Concatenate parsed monthly generator frames, keeping the label columns categorical."""
+    from pandas.api.types import union_categoricals
+
+    yearly_data = pd.concat(monthly_data, ignore_index=True)
+    for col in ['Generator', 'Fuel Type', 'Measurement']:
+        yearly_data[col] = union_categoricals([month_data[col] for month_data in monthly_data])
+    yearly_data.attrs["skipped_rows"] = sum(month_data.attrs.get("skipped_rows", 0) for month_data in monthly_data)
+
+    return yearly_data
+
+### 2.4 Transform Generator Data to Match Demand/Trade Flow Format
+class GeneratorOutput:
+    """
+    Generator output stored as a dense ``(days, 24, generators)`` float32 array.
+
+    Attributes:
+        dates (np.ndarray): Delivery date of each day, as ``YYYY-MM-DD`` strings.
+        generators (pd.DataFrame): ``Fuel Type`` and ``Generator`` of each generator, in the
+            order of the last axis of ``values``, sorted by Fuel-Generator name.
+        values (np.ndarray): Output in MW, NaN where a generator reported nothing.
+        source_rows (int): Parsed report rows the block was built from.
+        skipped_rows (int): Malformed report rows dropped while parsing.
+    """
+
+    def __init__(self, dates, generators, values, source_rows=0, skipped_rows=0):
+        if values.shape != (len(dates), 24, len(generators)):
+            raise ValueError(f"Output array of shape {values.shape} does not match {len(dates)} days and {len(generators)} generators.")
+        self.dates = np.asarray(dates, dtype=object)
+        self.generators = generators.reset_index(drop=True)
+        self.values = values
+        self.source_rows = source_rows
+        self.skipped_rows = skipped_rows
+
+    @classmethod
+    def from_raw(cls, gen_output_df):
+        """Build from parsed ``GenOutputCapabilityMonth`` rows, keeping the ``Output`` measurement."""
+        source_rows = len(gen_output_df)
+        skipped_rows = gen_output_df.attrs.get("skipped_rows", 0)
+        gen_output_df = gen_output_df[gen_output_df['Measurement'] == 'Output']
+
+        # Check if there are any rows left after filtering
+        if gen_output_df.empty:
+            raise ValueError("No rows with 'Output' in the 'Measurement' column.")
+
+        # Number days and generators, with generators sorted by their Fuel-Generator name
+        dates, day_index = np.unique(gen_output_df['Delivery Date'].astype(str).to_numpy(), return_inverse=True)
+        labels = (gen_output_df['Fuel Type'].astype(str) + ' - ' + gen_output_df['Generator'].astype(str)).to_numpy()
+        columns, gen_index = np.unique(labels, return_inverse=True)
+        first_rows = np.unique(gen_index, return_index=True)[1]
+        generators = pd.DataFrame({
+            'Fuel Type': gen_output_df['Fuel Type'].astype(str).to_numpy()[first_rows],
+            'Generator': gen_output_df['Generator'].astype(str).to_numpy()[first_rows]
+        })
+
+        # Scatter each row's 24 hourly values into its (day, generator) slot
+        values = np.full((len(dates), 24, len(columns)), np.nan, dtype=np.float32)
+        values[day_index, :, gen_index] = gen_output_df[HOUR_COLUMNS].to_numpy(dtype=np.float32)
+
+        return cls(dates, generators, values, source_rows, skipped_rows)
+
+    @classmethod
+    def from_frame(cls, transformed_gen_data):
+        """Build from a frame laid out like the output of ``transform_generator_data``."""
+        hours = transformed_gen_data['Hour'].to_numpy()
+        if len(hours) % 24 or not (hours.reshape(-1, 24) == np.arange(1, 25)).all():
+            raise ValueError("Generator data must hold hours 1-24 of every day, in order.")
+
+        columns = list(transformed_gen_data.columns[2:])
+        generators = pd.DataFrame([str(col).split(' - ', 1) for col in columns], columns=['Fuel Type', 'Generator'])
+        values = transformed_gen_data[columns].to_numpy(dtype=np.float32).reshape(-1, 24, len(columns))
+
+        return cls(transformed_gen_data['Delivery Date'].to_numpy()[::24], generators, values)
+
+    @classmethod
+    def concat(cls, blocks):
+        """Stack blocks covering consecutive periods, taking the union of their generators."""
+        columns = sorted(set().union(*(block.columns for block in blocks)))
+        position = {col: i for i, col in enumerate(columns)}
+        generators = pd.DataFrame([col.split(' - ', 1) for col in columns], columns=['Fuel Type', 'Generator'])
+
+        values = np.full((sum(len(block.dates) for block in blocks), 24, len(columns)), np.nan, dtype=np.float32)
+        day = 0
+        for block in blocks:
+            values[day:day + len(block.dates), :, [position[col] for col in block.columns]] = block.values
+            day += len(block.dates)
+
+        return cls(
+            np.concatenate([block.dates for block in blocks]), generators, values,
+            sum(block.source_rows for block in blocks), sum(block.skipped_rows for block in blocks)
+        )
+
+    @property
+    def columns(self):
+        """Fuel-Generator name of each generator, e.g. ``"GAS - BRIGHTON BEACH"``."""
+        return list(self.generators['Fuel Type'] + ' - ' + self.generators['Generator'])
+
+    @property
+    def hourly_values(self):
+        """View of ``values`` as an (hours x generators) matrix."""
+        return self.values.reshape(-1, self.values.shape[2])
+
+    def timesteps(self):
+        """Return the ``Delivery Date`` and ``Hour`` of every row of ``hourly_values``."""
+        return pd.DataFrame({
+            'Delivery Date': np.repeat(self.dates, 24),
+            'Hour': np.tile(np.arange(1, 25, dtype=np.int64), len(self.dates))
+        })
+
+    def technology_sums(self):
+        """
+        Sum the output of each technology.
+
+        Returns:
+            pd.DataFrame: ``Delivery Date``, ``Hour`` and one column per technology of
+            ``TECH_PREFIX_MAP``, in MW with missing values counted as 0.
+        """
+        technologies, membership = map_generator_technologies(self.columns)
+        tech_output = np.nan_to_num(self.hourly_values.astype(np.float64)) @ membership
+        return pd.concat([self.timesteps(), pd.DataFrame(tech_output, columns=technologies)], axis=1)
+
+    def generator_series(self, name):
+        """
+        Return the hourly output of one generator.
+
+        Args:
+            name (str): Fuel-Generator name (``"GAS - BRIGHTON BEACH"``) or generator name.
+
+        Returns:
+            pd.Series: Output in MW indexed by ``(Delivery Date, Hour)``.
+        """
+        matches = np.flatnonzero((self.generators['Generator'] == name).to_numpy() | (np.array(self.columns) == name))
+        if len(matches) != 1:
+            raise KeyError(f"Expected exactly one generator named {name!r}, found {len(matches)}.")
+
+        index = pd.MultiIndex.from_frame(self.timesteps())
+        return pd.Series(self.values[:, :, matches[0]].ravel(), index=index, name=self.columns[matches[0]])
+
+    def to_frame(self):
+        """Return the wide layout of ``transform_generator_data``: one column per Fuel-Generator."""
+        return pd.concat([self.timesteps(), pd.DataFrame(self.hourly_values, columns=self.columns)], axis=1)
+
+def transform_generator_data(gen_output_df):
+    """
+    Reshape parsed generator rows to have hours as rows and Fuel-Generators as columns.
+
+    Args:
+        gen_output_df (pd.DataFrame): Output of ``parse_and_clean_generator_month``.
+
+    Returns:
+        pd.DataFrame: ``Delivery Date``, ``Hour`` and one float32 column per Fuel-Generator.
+    """
+    return GeneratorOutput.from_raw(gen_output_df).to_frame()
+
+
+### 2.5 Load Emission Rates from File
+def get_emission_rates(interactive=True, path=os.path.join("data", "emission_rates.csv")):
+    """
+    Load generator emission rates from ``data/emission_rates.csv`` (or ``path``).
+
+    When ``interactive`` is True, wait for the user to confirm the values before continuing.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(
+            f"Required emission rate file not found at {path}. "
+            "Create this CSV with columns 'Technology' and 'Emission Rate (t CO2e/GWh)'."
+        )
+
+    df = pd.read_csv(path)
+    expected_cols = {"Technology", "Emission Rate (t CO2e/GWh)"}
+    if not expected_cols.issubset(df.columns):
+        raise ValueError(
+            f"Emission rate file must contain columns {expected_cols}."
+        )
+
+    print("\nLoaded emission rates from:", path)
+    print(df.to_string(index=False))
+    if interactive:
+        input("\nIf you wish to change these values, edit the file above and then press Enter to continue...")
+
+    # Convert to t CO2e/MWh for calculations
+    return {row['Technology']: row['Emission Rate (t CO2e/GWh)'] / 1000 for _, row in df.iterrows()}
+
+### 2.6 Load Emission Factors of Neighboring Regions from File
+def get_neighboring_emission_factors(interactive=True, path=os.path.join("data", "neighboring_emission_factors.csv")):
+    """
+    Load neighboring region emission factors from ``data/neighboring_emission_factors.csv`` (or ``path``).
+
+    When ``interactive`` is True, wait for the user to confirm the values before continuing.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(
+            f"Required neighboring emission factors file not found at {path}. "
+            "Create this CSV with columns 'Region' and 'Emission Factor (t CO2e/GWh)'."
+        )
+
+    df = pd.read_csv(path)
+    expected_cols = {"Region", "Emission Factor (t CO2e/GWh)"}
+    if not expected_cols.issubset(df.columns):
+        raise ValueError(
+            f"Neighboring emission factor file must contain columns {expected_cols}."
+        )
+
+    print("\nLoaded emission factors for neighboring regions from:", path)
+    print(df.to_string(index=False))
+    if interactive:
+        input("\nIf you wish to change these values, edit the file above and then press Enter to continue...")
+
+    # Convert to t CO2e/MWh for calculations
+    return {row['Region']: row['Emission Factor (t CO2e/GWh)'] / 1000 for _, row in df.iterrows()}
+
+### 2.7 Parse and Clean Demand Data
+def parse_and_clean_demand(file_path):
+    with open(file_path, 'r') as file:
+        return parse_demand_lines(file.readlines())
+
+def parse_demand_lines(lines):
+    """Parse the lines of a ``PUB_Demand`` file: the column header row and any data rows."""
+    # Skip the preamble rows, which contain double backslashes
+    raw_df = pd.read_csv(io.StringIO("".join(line for line in lines if '\\' not in line)))
+
+    # Reset column headers if necessary
+    raw_df.columns = [str(col).strip() for col in raw_df.columns]
+
+    return raw_df
+
+### 2.8 Parse and Clean Trade Flow Data
+def parse_and_clean_trade_flow(file_path):
+    with open(file_path, 'r') as file:
+        return parse_trade_flow_lines(file.readlines())
+
+def parse_trade_flow_lines(lines):
+    """Parse the lines of a ``PUB_IntertieScheduleFlowYear`` file: the two header rows and any data rows."""
+    # Skip the preamble rows, which contain backslashes
+    raw_df = pd.read_csv(io.StringIO("".join(line for line in lines if '\\' not in line)), header=None)
+
+    # Combine first two rows to form column names
+    raw_headers = raw_df.iloc[:2].fillna('')
+    headers = [f"{str(raw_headers.iloc[0, i]).strip()} {str(raw_headers.iloc[1, i]).strip()}" for i in range(len(raw_df.columns))]
+    headers[0] = "Date"  # Rename the first column to Date
+    headers[1] = "Hour"  # Rename the second column to Hour
+
+    # Ensure the number of headers matches the number of columns
+    if len(headers) != len(raw_df.columns):
+        raise ValueError("Header length mismatch with columns in the data.")
+
+    raw_df.columns = headers
+    raw_df = raw_df[2:]  # Drop the first two rows used for headers
+
+    return raw_df
+
+### 2.9 Transform Trade Flow Data
+def transform_trade_flow(trade_flow_df):
+    """
+    Transforms the trade flow DataFrame by keeping relevant columns:
+    - Retains "Date" and "Hour" columns.
+    - Removes columns starting with "Total".
+    - Removes columns ending with "Imp" or "Exp".
+    - Keeps only columns ending with "Flow".
+    - Sums columns starting with "MANITOBA" into "MANITOBA Total Flow".
+    - Sums columns starting with "PQ" into "QUEBEC Total Flow".
+
+    Args:
+        trade_flow_df (pd.DataFrame): The original trade flow DataFrame.
+
+    Returns:
+        pd.DataFrame: The transformed trade flow DataFrame.
+    """
+    # Step 1: Keep only "Date" and "Hour" columns
+    transformed_df = trade_flow_df[["Date", "Hour"]].copy()
+
+    # Step 2: Filter columns ending with "Flow", excluding those starting with "Total"
+    flow_columns = [
+        col for col in trade_flow_df.columns
+        if col.endswith("Flow") and not col.startswith("Total")
+    ]
+
+    # Append the filtered flow columns to the result
+    filtered_df = trade_flow_df[flow_columns].copy()
+
+    # Step 3: Sum values of columns starting with "MANITOBA" into "MANITOBA Total Flow"
+    manitoba_columns = [col for col in filtered_df.columns if col.startswith("MANITOBA")]
+    transformed_df.loc[:, "MANITOBA Total Flow"] = filtered_df[manitoba_columns].astype(float).sum(axis=1)
+
+    # Remove the added up MANITOBA columns
+    filtered_df = filtered_df.drop(columns=manitoba_columns, errors="ignore")
+
+    # Step 4: Sum values of columns starting with "PQ" into "QUEBEC Total Flow"
+    quebec_columns = [col for col in filtered_df.columns if col.startswith("PQ")]
+    transformed_df.loc[:, "QUEBEC Total Flow"] = filtered_df[quebec_columns].astype(float).sum(axis=1)
+
+    # Remove the added up PQ columns
+    filtered_df = filtered_df.drop(columns=quebec_columns, errors="ignore")
+
+    # Append the remaining flow columns
+    transformed_df = pd.concat([transformed_df, filtered_df], axis=1)
+
+    return transformed_df
+
+### 2.10 Calculate supply-based emission factors for each timestep
+# Technology of each generator column, keyed by the first letter of its fuel type
+TECH_PREFIX_MAP = {
+    "B": "Biofuel",
+    "H": "Hydro",
+    "G": "Natural Gas",
+    "N": "Nuclear",
+    "S": "Solar",
+    "W": "Wind"
+}
+
+def map_generator_technologies(generator_columns):
+    """
+    Build the generator-to-technology membership matrix for ``Fuel-Generator`` columns.
+
+    Args:
+        generator_columns (list): Column names such as ``"GAS - BRIGHTON BEACH"``.
+
+    Returns:
+        list: Technology names, in the column order of the matrix.
+        np.ndarray: (generators x technologies) matrix holding 1 where a generator
+        belongs to a technology. Columns with an unknown prefix map to no technology.
+    """
+    technologies = list(TECH_PREFIX_MAP.values())
+    membership = np.zeros((len(generator_columns), len(technologies)))
+    for i, col in enumerate(generator_columns):
+        tech = TECH_PREFIX_MAP.get(str(col)[:1])
+        if tech is not None:
+            membership[i, technologies.index(tech)] = 1.0
+
+    return technologies, membership
+
+def calculate_supply_based_ef(transformed_gen_data, emission_rates):
+    """
+    Calculate the supply-based emission factor and total output of every timestep.
+
+    Args:
+        transformed_gen_data (pd.DataFrame or GeneratorOutput): Hourly output per Fuel-Generator.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+
+    Returns:
+        pd.DataFrame: Supply-based emission factors.
+        pd.DataFrame: Total output of all generators.
+    """
+    # Steps 1-2: Output of each technology
+    timesteps, technologies, tech_output = technology_output(transformed_gen_data)
+
+    # Step 3: Calculate total emissions, total output and EF for every timestep
+    return supply_based_ef_frames(timesteps, technologies, tech_output, emission_rates)
+
+def technology_output(transformed_gen_data):
+    """
+    Sum the hourly output of the generators of each technology.
+
+    Args:
+        transformed_gen_data (pd.DataFrame or GeneratorOutput): Hourly output per Fuel-Generator.
+
+    Returns:
+        pd.DataFrame: ``Delivery Date`` and ``Hour`` of every timestep.
+        list: Technologies of the columns of the output matrix, as in ``TECH_PREFIX_MAP``.
+        np.ndarray: (timesteps x technologies) output in MW, missing values counted as 0.
+    """
+    # Step 1: Map each generator column to its technology once
+    if isinstance(transformed_gen_data, GeneratorOutput):
+        generator_columns = transformed_gen_data.columns
+        gen_output = transformed_gen_data.hourly_values
+        timesteps = transformed_gen_data.timesteps()
+    else:
+        generator_columns = transformed_gen_data.columns[2:]
+        gen_output = transformed_gen_data[generator_columns].to_numpy()
+        timesteps = transformed_gen_data[["Delivery Date", "Hour"]].reset_index(drop=True)
+    technologies, membership = map_generator_technologies(generator_columns)
+
+    # Step 2: Reduce the hours x generators matrix to an hours x technology matrix
+    gen_output = np.nan_to_num(gen_output.astype(np.float64))
+    return timesteps, technologies, gen_output @ membership
+
+def supply_based_ef_frames(timesteps, technologies, tech_output, emission_rates):
+    """Return the supply-based EF and total output frames of ``calculate_supply_based_ef`` from per-technology output."""
+    ef_g_co2e_kwh, total_output = supply_based_ef_from_technologies(tech_output, technologies, emission_rates)
+
+    # Convert the results to DataFrames
+    supplybased_ef = timesteps.assign(**{"Supply-based EF (g CO2e/kWh)": ef_g_co2e_kwh})
+    total_output_df = timesteps.assign(**{"Total Output": total_output})
+
+    return supplybased_ef, total_output_df
+
+def supply_based_ef_from_technologies(tech_output, technologies, emission_rates):
+    """
+    Calculate the supply-based EF from per-technology output.
+
+    Args:
+        tech_output (np.ndarray): (timesteps x technologies) output in MW.
+        technologies (list): Technology of each column of ``tech_output``.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+
+    Returns:
+        np.ndarray: Supply-based EF in g CO2e/kWh, 0 for timesteps without output.
+        np.ndarray: Total output of every timestep.
+    """
+    rates = np.array([emission_rates[tech] for tech in technologies], dtype=np.float64)
+    total_emissions = tech_output @ rates
+    total_output = tech_output.sum(axis=1)
+
+    # Calculate EF in t CO2e/MWh, leaving timesteps without output at 0
+    ef_t_co2e_mwh = np.divide(
+        total_emissions, total_output,
+        out=np.zeros_like(total_emissions), where=total_output > 0
+    )
+
+    # Convert EF to g CO2e/kWh for publishing
+    return ef_t_co2e_mwh * 1000, total_output
+
+### 2.11 Calculate consumption-based emission factors for each timestep.
+class MisalignedTimestepsError(ValueError):
+    """
+    Raised when the inputs of the consumption-based EF do not cover the same timesteps.
+
+    Attributes:
+        missing (dict): Maps each input name to the set of ``(Date, Hour)`` keys of the
+            supply-based EF that it is missing.
+        extra (dict): Maps each input name to the set of ``(Date, Hour)`` keys it holds
+            that the supply-based EF does not, including duplicated keys.
+    """
+
+    def __init__(self, missing, extra):
+        self.missing = missing
+        self.extra = extra
+        details = []
+        for label, keys_by_input in (("missing", missing), ("unexpected", extra)):
+            for name, keys in keys_by_input.items():
+                if keys:
+                    preview = ", ".join(f"{date} H{hour}" for date, hour in sorted(keys)[:5])
+                    details.append(f"{name} has {len(keys)} {label} timesteps ({preview}{', ...' if len(keys) > 5 else ''})")
+        super().__init__("Input DataFrames are not aligned on (Date, Hour): " + "; ".join(details))
+
+def timestep_keys(df, date_col):
+    """Return the ``(Date, Hour)`` keys of ``df`` as a MultiIndex with string dates and integer hours."""
+    dates = df[date_col].astype(str).str.strip()
+    hours = pd.to_numeric(df["Hour"], errors="coerce").fillna(0).astype(int)
+    return pd.MultiIndex.from_arrays([dates.to_numpy(), hours.to_numpy()], names=["Date", "Hour"])
+
+def timestep_starts(keys):
+    """Return the EST start of every ``(Date, Hour)`` key as ``datetime64[ns]`` (hour 1 starts at midnight)."""
+    codes, dates = pd.factorize(keys.get_level_values("Date"))
+    days = pd.to_datetime(dates).to_numpy(dtype="datetime64[ns]")[codes]
+    return days + (keys.get_level_values("Hour").to_numpy() - 1) * np.timedelta64(1, "h")
+
+def align_on_timesteps(keys, frames):
+    """
+    Reorder each frame so that its rows follow ``keys``.
+
+    Args:
+        keys (pd.MultiIndex): Reference ``(Date, Hour)`` keys.
+        frames (dict): Maps an input name to a ``(DataFrame, date column)`` pair.
+
+    Returns:
+        dict: Maps each input name to its DataFrame reindexed on ``keys``.
+
+    Raises:
+        MisalignedTimestepsError: If a frame is missing timesteps, holds extra ones
+            or repeats a timestep.
+    """
+    reference = set(keys)
+    missing, extra, aligned = {}, {}, {}
+    for name, (df, date_col) in frames.items():
+        frame_keys = timestep_keys(df, date_col)
+        missing[name] = reference - set(frame_keys)
+        extra[name] = (set(frame_keys) - reference) | set(frame_keys[frame_keys.duplicated()])
+        if not missing[name] and not extra[name]:
+            aligned[name] = df.set_axis(frame_keys).reindex(keys)
+
+    if any(missing.values()) or any(extra.values()):
+        raise MisalignedTimestepsError(missing, extra)
+
+    return aligned
+
+def calculate_consumption_based_ef(supplybased_ef, demand_df, transformed_trade_flow, neighboring_emission_factors, total_output_df,
+                                   neighbor_series=None):
+    """
+    Calculate the consumption-based emission factors for each timestep.
+
+    Supply, demand and trade data are matched on their ``(Date, Hour)`` keys rather
+    than on row position, and all timesteps are computed at once.
+
+    Args:
+        supplybased_ef (pd.DataFrame): Supply-based emission factors.
+        demand_df (pd.DataFrame): Demand data.
+        transformed_trade_flow (pd.DataFrame): Preprocessed trade flow data.
+        neighboring_emission_factors (dict): Emission factors for neighboring regions.
+        total_output_df (pd.DataFrame): Total output data.
+        neighbor_series (NeighborFactorSeries): Hourly or monthly factors of the neighboring
+            regions; ``neighboring_emission_factors`` fills the hours they do not cover.
+
+    Returns:
+        pd.DataFrame: Consumption-based emission factors.
+        pd.DataFrame: Spot-check data for debugging.
+
+    Raises:
+        MisalignedTimestepsError: If the inputs do not cover the same timesteps.
+    """
+    # Align all inputs on the timesteps of the supply-based EF
+    keys = timestep_keys(supplybased_ef, "Delivery Date")
+    aligned = align_on_timesteps(keys, {
+        "demand_df": (demand_df, "Date"),
+        "transformed_trade_flow": (transformed_trade_flow, "Date"),
+        "total_output_df": (total_output_df, "Delivery Date"),
+    })
+    demand = aligned["demand_df"]
+    trade_flow = aligned["transformed_trade_flow"]
+
+    # Supply-based EF in g CO2e/kWh
+    supply_based_ef_g_co2e_kwh = supplybased_ef["Supply-based EF (g CO2e/kWh)"].to_numpy(dtype=np.float64)
+
+    # Ontario demand and total output
+    ontario_demand_mwh = demand["Ontario Demand"].to_numpy(dtype=np.float64)
+    total_output_mwh = aligned["total_output_df"]["Total Output"].to_numpy(dtype=np.float64)
+
+    # Look up the emission factor of each intertie once
+    flow_columns = [col for col in trade_flow.columns if col not in ["Date", "Hour"]]
+    intertie_factors = intertie_emission_factors(flow_columns, neighboring_emission_factors)
+    if neighbor_series is not None:
+        intertie_factors = neighbor_series.factor_matrix(timestep_starts(keys), flow_columns, intertie_factors)
+
+    # Handle NaN flows gracefully
+    flows_mwh = trade_flow[flow_columns].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+    consumption_ef_g_co2e_kwh, total_exports_mwh, total_imports_mwh, total_imports_emissions_t_co2e = consumption_based_ef_from_arrays(
+        supply_based_ef_g_co2e_kwh, total_output_mwh, ontario_demand_mwh, flows_mwh, intertie_factors
+    )
+
+    # Create DataFrames for results and spot-check data
+    timesteps = supplybased_ef[["Delivery Date", "Hour"]].reset_index(drop=True)
+    consumption_based_ef = timesteps.assign(**{"Consumption-based EF (g CO2e/kWh)": consumption_ef_g_co2e_kwh})
+    spot_check_df = timesteps.assign(**{
+        "Total Exports (MWh)": total_exports_mwh,
+        "Total Imports (MWh)": total_imports_mwh,
+        "Total Import Emissions (t CO2e)": total_imports_emissions_t_co2e
+    })
+
+    return consumption_based_ef, spot_check_df
+
+def intertie_emission_factors(flow_columns, neighboring_emission_factors):
+    """
+    Look up the emission factor of each intertie flow column.
+
+    Columns are matched to regions on the first 3 characters of their first word
+    (``"NEW-YORK Flow"`` -> ``"NEW"``); interties without a factor default to 0.
+
+    Returns:
+        np.ndarray: Emission factor of each column in t CO2e/MWh.
+    """
+    # Normalize neighboring_emission_factors keys
+    neighboring_emission_factors = {key.upper()[:3]: value for key, value in neighboring_emission_factors.items()}
+
+    intertie_factors = np.zeros(len(flow_columns))
+    for i, col in enumerate(flow_columns):
+        region = col.split(" ")[0].upper()[:3]
+        intertie_factors[i] = neighboring_emission_factors.get(region, 0)
+        if intertie_factors[i] == 0:
+            logger.warning("Warning: No emission factor found for region '%s'. Defaulting to 0.", region)
+
+    return intertie_factors
+
+def consumption_based_ef_from_arrays(supply_based_ef_g_co2e_kwh, total_output_mwh, ontario_demand_mwh, flows_mwh, intertie_factors):
+    """
+    Calculate the consumption-based EF from aligned per-timestep arrays.
+
+    Args:
+        supply_based_ef_g_co2e_kwh (np.ndarray): Supply-based EF of every timestep.
+        total_output_mwh (np.ndarray): Total generator output of every timestep.
+        ontario_demand_mwh (np.ndarray): Ontario demand of every timestep.
+        flows_mwh (np.ndarray): (timesteps x interties) flows, positive for exports.
+        intertie_factors (np.ndarray): Emission factor of each intertie in t CO2e/MWh, or a
+            (timesteps x interties) matrix of factors that vary over time.
+
+    Returns:
+        np.ndarray: Consumption-based EF in g CO2e/kWh, 0 for timesteps without demand.
+        np.ndarray: Total exports.
+        np.ndarray: Total imports.
+        np.ndarray: Emissions of the imports in t CO2e.
+    """
+    supply_based_ef_t_co2e_mwh = supply_based_ef_g_co2e_kwh / 1000
+
+    # Split the flows into exports (positive) and imports (negative)
+    exports_mwh = np.where(flows_mwh > 0, flows_mwh, 0)
+    imports_mwh = np.where(flows_mwh < 0, -flows_mwh, 0)
+
+    total_exports_mwh = exports_mwh.sum(axis=1)
+    total_imports_mwh = imports_mwh.sum(axis=1)
+    if intertie_factors.ndim == 2:
+        total_imports_emissions_t_co2e = np.einsum("ij,ij->i", imports_mwh, intertie_factors)
+    else:
+        total_imports_emissions_t_co2e = imports_mwh @ intertie_factors
+
+    # Calculate balance difference
+    net_balance = total_output_mwh - total_exports_mwh + total_imports_mwh
+    balance_difference_mwh = net_balance - ontario_demand_mwh
+
+    # Remove emissions associated with the balance difference
+    adjusted_emissions_t_co2e = np.where(balance_difference_mwh > 0, balance_difference_mwh * supply_based_ef_t_co2e_mwh, 0)
+
+    # Calculate consumption-based EF
+    consumption_emissions_t_co2e = (
+        (supply_based_ef_t_co2e_mwh * total_output_mwh) -
+        (supply_based_ef_t_co2e_mwh * total_exports_mwh) +
+        total_imports_emissions_t_co2e -
+        adjusted_emissions_t_co2e
+    )
+    consumption_ef_t_co2e_mwh = np.divide(
+        consumption_emissions_t_co2e, ontario_demand_mwh,
+        out=np.zeros_like(consumption_emissions_t_co2e), where=ontario_demand_mwh > 0
+    )
+
+    # Convert EF to g CO2e/kWh for publishing
+    return consumption_ef_t_co2e_mwh * 1000, total_exports_mwh, total_imports_mwh, total_imports_emissions_t_co2e
+
+
+
+
+
+## 3. Setup Data for a Specific Year
+### 3.1 Source files and cached parsing
+# Set the IESO_REPORTS_URL environment variable to download from a mirror instead
+IESO_REPORTS_URL = os.environ.get("IESO_REPORTS_URL", "https://reports-public.ieso.ca/public/")
+
+# Local copies of the reports, in <year>/Generator, <year>/Demand and <year>/Trade sub-directories
+IESO_DATA_DIR = os.path.join("data", "IESO")
+OUTPUT_DIR = DEFAULT_OUTPUT_DIR
+
+# Bump when the output of the parse or transform functions changes so cached frames are rebuilt
+PARSER_VERSION = 1
+
+def consumption_ef_path(output_dir, year):
+    """Return the path of the consumption-based EF CSV of ``year``."""
+    return os.path.join(output_dir, f"Consumption-based_EF_{year}.csv")
+
+def year_source_files(year, data_dir=None):
+    """
+    List the IESO reports used for ``year`` and where they are stored locally.
+
+    Args:
+        year (int): Year of the reports.
+        data_dir (str): Directory of the local copies, ``IESO_DATA_DIR`` by default.
+
+    Returns:
+        list: (url, local path) pairs of the 12 monthly generator files.
+        tuple: (url, local path) of the demand file.
+        tuple: (url, local path) of the trade flow file.
+    """
+    year_dir = os.path.join(data_dir or IESO_DATA_DIR, str(year))
+
+    generator_files = []
+    for month in range(1, 13):
+        file_name = f"PUB_GenOutputCapabilityMonth_{year}{month:02d}.csv"
+        generator_files.append((
+            f"{IESO_REPORTS_URL}GenOutputCapabilityMonth/{file_name}",
+            os.path.join(year_dir, "Generator", file_name)
+        ))
+
+    demand_name = f"PUB_Demand_{year}.csv"
+    demand_file = (f"{IESO_REPORTS_URL}Demand/{demand_name}", os.path.join(year_dir, "Demand", demand_name))
+
+    trade_flow_name = f"PUB_IntertieScheduleFlowYear_{year}.csv"
+    trade_flow_file = (f"{IESO_REPORTS_URL}IntertieScheduleFlowYear/{trade_flow_name}", os.path.join(year_dir, "Trade", trade_flow_name))
+
+    return generator_files, demand_file, trade_flow_file
+
+def download_year_files(year, session=None, max_workers=DOWNLOAD_WORKERS, refresh_complete=False, data_dir=None):
+    """Download the generator, demand and trade flow files of ``year`` concurrently."""
+    generator_files, demand_file, trade_flow_file = year_source_files(year, data_dir)
+    return download_files(generator_files + [demand_file, trade_flow_file], session, max_workers, refresh_complete)
+
+def load_or_build(cache, name, sources, build, version=PARSER_VERSION, params=None):
+    """Return ``build()``, going through ``cache`` (a ``ParsedDataCache``) when one is given."""
+    if cache is None:
+        return build()
+    return cache.load_or_build(name, sources, build, version=version, params=params)
+
+### 3.2 Example setup for a single year (2020)
+def setup_year_data(year, cache=None, data_dir=None):
+    if year < 2020 or year > 2024:
+        raise ValueError("Valid years for generator data are 2020-2024.")
+
+    _, (_, demand_path), (_, trade_flow_path) = year_source_files(year, data_dir)
+    download_year_files(year, data_dir=data_dir)
+
+    # Aggregate generator data
+    gen_output_df = aggregate_generator_data(year, cache, download=False, data_dir=data_dir)
+
+    # Parse and clean demand data
+    demand_df = load_or_build(cache, f"demand_{year}", [demand_path], lambda: parse_and_clean_demand(demand_path))
+
+    # Parse and clean trade flow data
+    trade_flow_df = load_or_build(cache, f"trade_flow_{year}", [trade_flow_path], lambda: parse_and_clean_trade_flow(trade_flow_path))
+
+    return gen_output_df, demand_df, trade_flow_df
+
+### 3.3 Transformed inputs of the emission factor calculations
+def prepare_year_data(year, cache=None, jobs=None, instrumentation=DISABLED, data_dir=None, download=True):
+    """
+    Load the transformed generator, demand and trade flow frames of ``year``.
+
+    With a cache, a year whose source files have not changed is loaded straight from
+    the cached transformed frames without parsing any IESO file, so only the download
+    stage is recorded by ``instrumentation``. Otherwise the generator months are parsed
+    and reshaped by ``jobs`` worker processes.
+
+    The reports are read from ``data_dir`` (``IESO_DATA_DIR`` by default). Missing or
+    incomplete reports are downloaded first unless ``download`` is False.
+
+    Returns:
+        pd.DataFrame: Generator output with one column per Fuel-Generator, empty cells as 0.
+        pd.DataFrame: Demand data.
+        pd.DataFrame: Transformed trade flow data.
+    """
+    if year < 2020 or year > 2024:
+        raise ValueError("Valid years for generator data are 2020-2024.")
+
+    if download:
+        with instrumentation.stage("download", year=year) as stage:
+            stage.rows_out = len(download_year_files(year, data_dir=data_dir))
+
+    transformed_gen_data = load_transformed_generator_data(year, cache, jobs, instrumentation, data_dir)
+    demand_df, transformed_trade_flow = load_demand_and_trade_flow(year, cache, instrumentation, data_dir)
+
+    return transformed_gen_data, demand_df, transformed_trade_flow
+
+def load_transformed_generator_data(year, cache=None, jobs=None, instrumentation=DISABLED, data_dir=None):
+    """Load the generator output of ``year`` from local reports, with one column per Fuel-Generator and empty cells as 0."""
+    generator_files, _, _ = year_source_files(year, data_dir)
+
+    # Transform generator data to match new format, with empty cells filled with 0
+    return load_or_build(
+        cache, f"transformed_generator_{year}", [path for _, path in generator_files],
+        lambda: aggregate_transformed_generator_data(year, cache, False, jobs, instrumentation, data_dir).fillna(0)
+    )
+
+def load_demand_and_trade_flow(year, cache=None, instrumentation=DISABLED, data_dir=None):
+    """
+    Load the demand and transformed trade flow frames of ``year`` from local reports.
+
+    Returns:
+        pd.DataFrame: Demand data.
+        pd.DataFrame: Transformed trade flow data.
+    """
+    _, (_, demand_path), (_, trade_flow_path) = year_source_files(year, data_dir)
+    demand_df = load_or_build(cache, f"demand_{year}", [demand_path], lambda: instrumented_parse(instrumentation, year, "demand", parse_and_clean_demand, demand_path))
+
+    # Transform the trade flow DataFrame
+    def build_transformed_trade_flow():
+        trade_flow_df = load_or_build(
+            cache, f"trade_flow_{year}", [trade_flow_path],
+            lambda: instrumented_parse(instrumentation, year, "trade_flow", parse_and_clean_trade_flow, trade_flow_path)
+        )
+        with instrumentation.stage("transform", year=year, source="trade_flow") as stage:
+            transformed_trade_flow = transform_trade_flow(trade_flow_df)
+            stage.rows_in, stage.rows_out = len(trade_flow_df), len(transformed_trade_flow)
+        return transformed_trade_flow
+
+    transformed_trade_flow = load_or_build(cache, f"transformed_trade_flow_{year}", [trade_flow_path], build_transformed_trade_flow)
+
+    return demand_df, transformed_trade_flow
+
+def instrumented_parse(instrumentation, year, source, parse, path):
+    """Run ``parse(path)`` as the parse stage of ``source``."""
+    with instrumentation.stage("parse", year=year, source=source) as stage:
+        df = parse(path)
+        stage.rows_out = len(df)
+    return df
+
+### 3.4 Memoized stages of a year
+# Bump when the output of a YearStages stage changes so cached results are recomputed
+STAGE_VERSION = 1
+
+class YearStages:
+    """
+    Memoized stages of the emission factor calculation of one year.
+
+    The stages form a chain: IESO reports -> parsed frames -> hourly output per
+    technology, demand and flows per intertie -> supply-based EF -> consumption-based
+    EF. Each stage is stored in ``cache`` under a key made of the fingerprints of the
+    reports it is built from and the parameters it uses, so a stage is only recomputed
+    when one of its inputs changed. Editing ``data/emission_rates.csv`` recomputes the
+    two EF stages from the cached technology output, and editing
+    ``data/neighboring_emission_factors.csv`` only the consumption-based EF; no report
+    is parsed or reshaped again. Without a cache every stage is computed.
+
+    Args:
+        year (int): Year to compute.
+        cache (ParsedDataCache): Cache holding the stages, or None.
+        jobs (int): Worker processes used to parse the generator months.
+        instrumentation (Instrumentation): Records the parse and transform stages.
+        data_dir (str): Directory of the IESO reports, ``IESO_DATA_DIR`` by default.
+    """
+
+    def __init__(self, year, cache=None, jobs=None, instrumentation=DISABLED, data_dir=None):
+        if year < 2020 or year > 2024:
+            raise ValueError("Valid years for generator data are 2020-2024.")
+        self.year = year
+        self.cache = cache
+        self.jobs = jobs
+        self.instrumentation = instrumentation
+        self.data_dir = data_dir
+
+        generator_files, (_, demand_path), (_, trade_flow_path) = year_source_files(year, data_dir)
+        self.generator_paths = [path for _, path in generator_files]
+        self.all_paths = self.generator_paths + [demand_path, trade_flow_path]
+        self._demand_and_trade_flow = None
+        self._frames = {}
+
+    def _stage(self, name, sources, build, params):
+        """Return the frame of stage ``name``, computed once per instance and memoized in the cache."""
+        memo_key = (name, json.dumps(params, sort_keys=True, default=str))
+        if memo_key not in self._frames:
+            self._frames[memo_key] = load_or_build(self.cache, f"{name}_{self.year}", sources, build, STAGE_VERSION, params)
+        return self._frames[memo_key]
+
+    # Parameters of the EF stages, as part of their cache keys
+    @staticmethod
+    def _supply_params(emission_rates):
+        return {"technologies": TECH_PREFIX_MAP, "emission_rates": emission_rates}
+
+    def _consumption_params(self, emission_rates, neighboring_emission_factors, neighbor_series):
+        return {
+            **self._supply_params(emission_rates),
+            "neighboring_emission_factors": neighboring_emission_factors,
+            "neighbor_series": neighbor_series.fingerprint() if neighbor_series is not None else None,
+        }
+
+    def technology_output(self):
+        """
+        Return the hourly output of each technology.
+
+        Returns:
+            pd.DataFrame: ``Delivery Date`` and ``Hour`` of every timestep.
+            list: Technologies, as in ``TECH_PREFIX_MAP``.
+            np.ndarray: (timesteps x technologies) output in MW.
+        """
+        def build():
+            transformed_gen_data = load_transformed_generator_data(self.year, self.cache, self.jobs, self.instrumentation, self.data_dir)
+            with self.instrumentation.stage("transform", year=self.year, source="technology") as stage:
+                timesteps, technologies, tech_output = technology_output(transformed_gen_data)
+                stage.rows_in, stage.rows_out = len(transformed_gen_data), len(timesteps)
+            return pd.concat([timesteps, pd.DataFrame(tech_output, columns=technologies)], axis=1)
+
+        frame = self._stage("technology_output", self.generator_paths, build, {"technologies": TECH_PREFIX_MAP})
+        technologies = list(frame.columns[2:])
+        # Row-major like the product computed by technology_output, so the EF sums are identical
+        return frame[["Delivery Date", "Hour"]], technologies, np.ascontiguousarray(frame[technologies].to_numpy(dtype=np.float64))
+
+    def demand_and_trade_flow(self):
+        """Return the demand and transformed trade flow frames (see ``load_demand_and_trade_flow``)."""
+        if self._demand_and_trade_flow is None:
+            self._demand_and_trade_flow = load_demand_and_trade_flow(self.year, self.cache, self.instrumentation, self.data_dir)
+        return self._demand_and_trade_flow
+
+    def supply_ef(self, emission_rates):
+        """
+        Return the supply-based EF and total output of every timestep.
+
+        Returns:
+            pd.DataFrame: Supply-based emission factors.
+            pd.DataFrame: Total output of all generators.
+        """
+        def build():
+            supplybased_ef, total_output_df = supply_based_ef_frames(*self.technology_output(), emission_rates)
+            return supplybased_ef.assign(**{"Total Output": total_output_df["Total Output"].to_numpy()})
+
+        frame = self._stage("supply_ef", self.generator_paths, build, self._supply_params(emission_rates))
+        timesteps = frame[["Delivery Date", "Hour"]]
+        return (timesteps.assign(**{"Supply-based EF (g CO2e/kWh)": frame["Supply-based EF (g CO2e/kWh)"].to_numpy()}),
+                timesteps.assign(**{"Total Output": frame["Total Output"].to_numpy()}))
+
+    def consumption_ef(self, emission_rates, neighboring_emission_factors, neighbor_series=None):
+        """
+        Return the supply- and consumption-based EF of every timestep.
+
+        Returns:
+            tuple: ``(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df)``,
+            as returned by ``calculate_supply_based_ef`` and ``calculate_consumption_based_ef``.
+
+        Raises:
+            MisalignedTimestepsError: If the inputs do not cover the same timesteps.
+        """
+        supplybased_ef, total_output_df = self.supply_ef(emission_rates)
+
+        def build():
+            demand_df, transformed_trade_flow = self.demand_and_trade_flow()
+            consumption_based_ef, spot_check_df = calculate_consumption_based_ef(
+                supplybased_ef, demand_df, transformed_trade_flow, neighboring_emission_factors, total_output_df, neighbor_series
+            )
+            return pd.concat([consumption_based_ef, spot_check_df.iloc[:, 2:]], axis=1)
+
+        frame = self._stage("consumption_ef", self.all_paths, build,
+                            self._consumption_params(emission_rates, neighboring_emission_factors, neighbor_series))
+        timesteps = frame[["Delivery Date", "Hour"]]
+        consumption_based_ef = timesteps.assign(**{"Consumption-based EF (g CO2e/kWh)": frame["Consumption-based EF (g CO2e/kWh)"].to_numpy()})
+        spot_check_df = pd.concat([timesteps, frame.iloc[:, 3:]], axis=1)
+        return supplybased_ef, consumption_based_ef, total_output_df, spot_check_df
+
+    def output_key(self, emission_rates, neighboring_emission_factors, neighbor_series=None):
+        """
+        Return the cache key of the consumption-based EF stage, identifying every input of the outputs.
+
+        Returns:
+            str: The key, or None without an enabled cache or when a report is missing.
+        """
+        if self.cache is None or not self.cache.enabled or not all(os.path.exists(path) for path in self.all_paths):
+            return None
+        return self.cache.entry_key(f"consumption_ef_{self.year}", self.all_paths, STAGE_VERSION,
+                                    self._consumption_params(emission_rates, neighboring_emission_factors, neighbor_series))
+
+    def output_is_current(self, consumption_path, emission_rates, neighboring_emission_factors, neighbor_series=None):
+        """
+        Tell whether the output at ``consumption_path`` can be kept instead of recomputed.
+
+        Returns:
+            bool: True if the output exists and was computed from the same factors and
+            reports, or if the cache holds no record of what it was computed from.
+        """
+        if not os.path.exists(consumption_path):
+            return False
+        recorded_key = self.cache.output_key(consumption_path) if self.cache is not None else None
+        if recorded_key is None or recorded_key == self.output_key(emission_rates, neighboring_emission_factors, neighbor_series):
+            return True
+        print(f"The factors or IESO reports of {self.year} changed since {consumption_path} was written; recomputing it.")
+        return False
+
+    def record_output(self, consumption_path, emission_rates, neighboring_emission_factors, neighbor_series=None):
+        """Record in the cache what the output at ``consumption_path`` was computed from, so it is recomputed when that changes."""
+        if self.cache is not None:
+            self.cache.record_output(consumption_path, self.output_key(emission_rates, neighboring_emission_factors, neighbor_series))
+
+
+
+
+## 4. Main Execution
+### 4.1 Compute the emission factors of a single year
+def compute_year(year, rates, neighbors, data_dir=None, cache=None, jobs=None, download=True, neighbor_series=None):
+    """
+    Compute the hourly emission factors of ``year`` without prompting or writing output files.
+
+    Args:
+        year (int): Year to compute (2020-2024).
+        rates (dict): Emission rates per technology in t CO2e/MWh, e.g. from ``get_emission_rates``.
+        neighbors (dict): Emission factors per neighboring region in t CO2e/MWh.
+        data_dir (str): Directory of the IESO reports, ``IESO_DATA_DIR`` by default.
+        cache (ParsedDataCache): Cache of parsed IESO files, if any.
+        jobs (int): Worker processes used to parse the generator months.
+        download (bool): Fetch missing or incomplete reports first; when False only local
+            files are read and nothing is imported for downloading.
+        neighbor_series (NeighborFactorSeries): Time-varying factors of the neighboring regions.
+
+    Returns:
+        pd.DataFrame: ``Hour Start (EST)``, ``Delivery Date``, ``Hour``, the supply- and
+        consumption-based EF in g CO2e/kWh, and the total output, exports, imports and
+        import emissions of every hour (see ``results_frame``).
+    """
+    from .results import results_frame
+
+    stages = YearStages(year, cache, jobs, DISABLED, data_dir)
+    if download:
+        download_year_files(year, data_dir=data_dir)
+    return results_frame(*stages.consumption_ef(rates, neighbors, neighbor_series))
+
+### Notes: Downloaded generator data, demand data and flow data is all in MW
+
+def run_year(year, emission_rates, neighboring_emission_factors, cache=None, force=False, jobs=None, store_path=DEFAULT_STORE_PATH,
+             instrumentation=DISABLED, neighbor_series=None, result_formats=DEFAULT_RESULT_FORMATS, output_dir=OUTPUT_DIR, data_dir=None,
+             download=True):
+    """
+    Compute the consumption-based EF of ``year`` and save it to ``output_dir``.
+
+    Args:
+        year (int): Year to compute.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+        neighboring_emission_factors (dict): Emission factors per region in t CO2e/MWh.
+        cache (ParsedDataCache): Cache of parsed IESO files, if any.
+        force (bool): Recompute and overwrite an existing output file.
+        jobs (int): Worker processes used to parse the generator months.
+        store_path (str): Hourly EF store to add the year to, or None to skip it.
+        instrumentation (Instrumentation): Records the duration, memory and row counts of
+            each stage.
+        neighbor_series (NeighborFactorSeries): Time-varying factors of the neighboring regions.
+        result_formats (tuple): Formats of the ``Hourly_Results_<year>`` files holding every
+            hourly output (see ``ontario_ef.results``).
+        output_dir (str): Directory of the outputs.
+        data_dir (str): Directory of the IESO reports, ``IESO_DATA_DIR`` by default.
+        download (bool): Fetch missing or incomplete reports before reading them.
+
+    Returns:
+        str: Path of the saved file, or None if it already existed, was computed from the same
+        factors and reports (when ``cache`` records them), and ``force`` is False.
+    """
+    from .ef_store import HourlyEFStore, year_frame
+    from .results import results_frame, write_results
+
+    os.makedirs(output_dir, exist_ok=True)
+    consumption_path = consumption_ef_path(output_dir, year)
+
+    # An existing output is kept unless the factors or reports it was computed from changed since
+    stages = YearStages(year, cache, jobs, instrumentation, data_dir)
+    if not force and stages.output_is_current(consumption_path, emission_rates, neighboring_emission_factors, neighbor_series):
+        print(f"Consumption-based EF for {year} already exists at {consumption_path}.")
+        print("Skipping analysis.")
+        return None
+
+    # Download missing or incomplete reports; parsing and transforming happen in the stages that need them
+    if download:
+        with instrumentation.stage("download", year=year) as stage:
+            stage.rows_out = len(download_year_files(year, data_dir=data_dir))
+
+    # Load the inputs before the EF stages, so their parse and transform stages are recorded on their own
+    stages.technology_output()
+    stages.demand_and_trade_flow()
+
+    # Calculate supply-based EF and total output, from the cached technology output when the reports did not change
+    with instrumentation.stage("supply_ef", year=year) as stage:
+        supplybased_ef, total_output_df = stages.supply_ef(emission_rates)
+        stage.rows_out = len(supplybased_ef)
+
+
+    # Calculate consumption-based EF and retrieve spot-check data
+    with instrumentation.stage("consumption_ef", year=year) as stage:
+        supplybased_ef, consumption_based_ef, total_output_df, spot_check_df = stages.consumption_ef(
+          emission_rates, neighboring_emission_factors, neighbor_series
+          )
+        stage.rows_in, stage.rows_out = len(supplybased_ef), len(consumption_based_ef)
+
+    with instrumentation.stage("write", year=year) as stage:
+        # Save the consumption-based EF to CSV
+        consumption_based_ef.to_csv(consumption_path, index=False)
+        print(f"Consumption-based EF data saved to: {consumption_path}")
+
+        # Add the hourly results to the memory-mapped store
+        if store_path:
+            HourlyEFStore(store_path, writable=True).write(
+                year_frame(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df)
+            )
+            print(f"Hourly results added to: {store_path}")
+
+        # Keep the supply-based EF, total output and spot-check data with the consumption-based EF
+        for path in write_results(results_frame(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df),
+                                  year, output_dir, result_formats):
+            print(f"Hourly results saved to: {path}")
+        stage.rows_out = len(consumption_based_ef)
+
+    # Remember what the output was computed from, so it is recomputed when that changes
+    stages.record_output(consumption_path, emission_rates, neighboring_emission_factors, neighbor_series)
+
+    return consumption_path
+
+### 4.2 Batch mode for several years
+def parse_years(spec):
+    """Parse a year selection such as ``"2020-2024"`` or ``"2020,2022-2023"`` into a sorted list."""
+    years = set()
+    for part in spec.split(","):
+        start, _, end = part.strip().partition("-")
+        try:
+            years.update(range(int(start), int(end or start) + 1))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid year selection: {spec!r}")
+    if not years:
+        raise argparse.ArgumentTypeError(f"The year selection {spec!r} is empty.")
+    return sorted(years)
+
+def _timed_run_year(year, emission_rates, neighboring_emission_factors, cache, force, jobs, store_path, instrumentation=DISABLED,
+                    neighbor_series=None, result_formats=DEFAULT_RESULT_FORMATS, stream=False, output_dir=OUTPUT_DIR, data_dir=None):
+    """Run ``run_year`` (or ``run_year_streaming``) and return ``(status, elapsed seconds)`` instead of raising."""
+    start_time = time.time()
+    try:
+        if stream:
+            # Imported here since the streaming path builds on this module
+            from .streaming import run_year_streaming
+            path = run_year_streaming(year, emission_rates, neighboring_emission_factors, cache, force, store_path, instrumentation,
+                                      neighbor_series, result_formats, output_dir, data_dir)
+        else:
+            path = run_year(year, emission_rates, neighboring_emission_factors, cache, force, jobs, store_path, instrumentation,
+                            neighbor_series, result_formats, output_dir, data_dir)
+        status = "written" if path else "skipped"
+    except Exception as error:
+        logger.exception("Computing %s failed.", year)
+        status = f"failed: {error}"
+    return status, time.time() - start_time
+
+def run_years(years, emission_rates, neighboring_emission_factors, cache=None, force=False, jobs=None, store_path=DEFAULT_STORE_PATH,
+              instrumentation=DISABLED, neighbor_series=None, result_formats=DEFAULT_RESULT_FORMATS, stream=False, output_dir=OUTPUT_DIR,
+              data_dir=None):
+    """
+    Compute several years, one worker process per year.
+
+    With more than one worker, each year parses its generator months serially so that
+    the total number of processes stays at ``jobs``. With ``stream``, each year is
+    computed month by month (see ``ontario_ef.streaming``), so every worker holds about
+    one month of generator data. The reports are read from ``data_dir`` and the outputs
+    written to ``output_dir``, in both modes.
+
+    Returns:
+        dict: Maps each year to its ``(status, elapsed seconds)``.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    year_jobs = min(jobs, len(years))
+    if year_jobs <= 1:
+        return {
+            year: _timed_run_year(year, emission_rates, neighboring_emission_factors, cache, force, jobs, store_path, instrumentation, neighbor_series,
+                                  result_formats, stream, output_dir, data_dir)
+            for year in years
+        }
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=year_jobs) as pool:
+        futures = {
+            year: pool.submit(_timed_run_year, year, emission_rates, neighboring_emission_factors, cache, force, 1, store_path, instrumentation,
+                              neighbor_series, result_formats, stream, output_dir, data_dir)
+            for year in years
+        }
+        return {year: future.result() for year, future in futures.items()}
+
+def print_timing_summary(results, elapsed):
+    """Print the status and wall time of each year."""
+    print("\nYear  Time (s)  Status")
+    for year, (status, year_elapsed) in results.items():
+        print(f"{year}  {year_elapsed:8.2f}  {status}")
+    print(f"Total {elapsed:8.2f}")
+
+### 4.3 Main entry point
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compute hourly emission factors for Ontario from IESO data.")
+    parser.add_argument("--years", type=parse_years, help="Years to compute without prompting, e.g. 2020-2024 or 2020,2022. Factor files are used without confirmation.")
+    parser.add_argument("--force", action="store_true", help="Recompute years whose output file already exists.")
+    parser.add_argument("--jobs", type=int, default=None, help="Number of worker processes (default: one per CPU).")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help=f"Memory-mapped hourly EF store that computed years are added to (default: {DEFAULT_STORE_PATH}).")
+    parser.add_argument("--no-store", action="store_true", help="Do not add computed years to the hourly EF store.")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the IESO files without reading or writing the parsed data cache.")
+    parser.add_argument("--rebuild-cache", action="store_true", help="Ignore cached parsed data and rebuild it from the IESO files.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Directory of the parsed data cache (default: {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Size above which least recently used cache entries are evicted.")
+    parser.add_argument("--metrics", help="Append the duration, memory and row counts of every stage to this JSON lines file.")
+    parser.add_argument("--log-stages", action="store_true", help="Log a summary line at the end of every stage.")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="Also record the tracemalloc peak of every stage, or write a cProfile dump per stage.")
+    parser.add_argument("--profile-dir", default=os.path.join("data", "profiles"), help="Directory receiving the cProfile dumps.")
+    parser.add_argument("--neighbor-series", help="CSV or Parquet file of hourly or monthly neighboring region factors (Region, Timestamp, Emission Factor (t CO2e/GWh)).")
+    parser.add_argument("--max-gap-hours", type=float, default=None, help="Longest time a series factor is carried forward before the scalar factor is used (default: unlimited).")
+    parser.add_argument("--results-formats", nargs="*", choices=RESULT_FORMATS, default=list(DEFAULT_RESULT_FORMATS),
+                        help="Formats of the Hourly_Results_<year> files holding every hourly output (default: npz; none when given without a value).")
+    parser.add_argument("--stream", action="store_true", help="Compute each year month by month, appending to the outputs as months are done, so memory stays at about one month of generator data.")
+    parser.add_argument("--watch", type=int, metavar="YEAR", help="Keep appending the hours of YEAR as its IESO reports in data/IESO are updated.")
+    parser.add_argument("--poll-seconds", type=float, default=300, help="Seconds between checks of the reports in --watch mode (default: 300).")
+    parser.add_argument("--download-updates", action="store_true", help="In --watch mode, fetch updated reports from IESO before each check.")
+    parser.add_argument("--quiet", action="store_true", help="Only print warnings and results, not per-file progress.")
+    return parser.parse_args(argv)
+
+def create_instrumentation(args):
+    """Build the ``Instrumentation`` selected on the command line; disabled without a sink."""
+    from .instrumentation import Instrumentation, JsonLinesSink, LoggingSink
+
+    sinks = []
+    if args.metrics:
+        sinks.append(JsonLinesSink(args.metrics))
+    if args.log_stages or (args.profile and not sinks):
+        sinks.append(LoggingSink())
+    return Instrumentation(sinks, profile=args.profile, profile_dir=args.profile_dir)
+
+def main(argv=None):
+    from .ieso_cache import ParsedDataCache
+    from .neighbor_factors import NeighborFactorSeries
+
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
+    instrumentation = create_instrumentation(args)
+    cache = ParsedDataCache(
+        args.cache_dir,
+        max_bytes=args.cache_max_mb * 1024 * 1024,
+        enabled=not args.no_cache,
+        rebuild=args.rebuild_cache
+    )
+    interactive = args.years is None and args.watch is None
+    store_path = None if args.no_store else args.store
+
+    # Get emission rates
+    emission_rates = get_emission_rates(interactive)
+
+    # Get emission factors for neighboring regions
+    neighboring_emission_factors = get_neighboring_emission_factors(interactive)
+    neighbor_series = None
+    if args.neighbor_series:
+        neighbor_series = NeighborFactorSeries.from_file(args.neighbor_series, args.max_gap_hours)
+        print(f"\nLoaded time-varying factors of {', '.join(neighbor_series.series)} from: {args.neighbor_series}")
+
+    if args.watch is not None:
+        # Imported here since the watcher builds on this module
+        from .watch import YearWatcher
+        watcher = YearWatcher(args.watch, emission_rates, neighboring_emission_factors, store_path=store_path,
+                              result_formats=args.results_formats, neighbor_series=neighbor_series)
+        try:
+            watcher.run(args.poll_seconds, args.download_updates)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if interactive:
+        # Download Data
+        year = int(input("Enter the year for analysis (valid years are 2020-2024): ") or 2020)
+        if args.stream:
+            from .streaming import run_year_streaming
+            run_year_streaming(year, emission_rates, neighboring_emission_factors, cache, args.force, store_path, instrumentation, neighbor_series,
+                               args.results_formats)
+        else:
+            run_year(year, emission_rates, neighboring_emission_factors, cache, args.force, args.jobs, store_path, instrumentation, neighbor_series,
+                     args.results_formats)
+        return 0
+
+    start_time = time.time()
+    results = run_years(args.years, emission_rates, neighboring_emission_factors, cache, args.force, args.jobs, store_path, instrumentation,
+                        neighbor_series, args.results_formats, args.stream)
+    print_timing_summary(results, time.time() - start_time)
+
+    return 1 if any(status.startswith("failed") for status, _ in results.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Columnar result files holding every hourly output of a year.
+
+``data/output/Consumption-based_EF_<year>.csv`` keeps only the consumption-based EF. The
+files written here also keep the supply-based EF, total output and the spot-check
+columns (exports, imports and import emissions), with a typed ``Hour Start (EST)``
+timestamp, one file per year and format:
+
+    csv      Hourly_Results_<year>.csv      text, full float64 precision
+    parquet  Hourly_Results_<year>.parquet  float64 columns (requires pyarrow)
+    feather  Hourly_Results_<year>.feather  Arrow IPC, float64 columns (requires pyarrow)
+    npz      Hourly_Results_<year>.npz      uncompressed NumPy arrays, float32 values and
+                                            datetime64 hour starts; no extra dependency
+
+``read_results`` loads any of them back into the same DataFrame layout.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .defaults import DEFAULT_RESULT_FORMATS, RESULT_FORMATS
+from .ef_store import EST_TIMEZONE
+
+
+TIME_COLUMN = "Hour Start (EST)"
+
+# npz array name -> column of the frames produced by the emission factor calculations
+RESULT_COLUMNS = {
+    "supply_ef": "Supply-based EF (g CO2e/kWh)",
+    "consumption_ef": "Consumption-based EF (g CO2e/kWh)",
+    "total_output": "Total Output",
+    "exports": "Total Exports (MWh)",
+    "imports": "Total Imports (MWh)",
+    "import_emissions": "Total Import Emissions (t CO2e)",
+}
+
+
+def results_frame(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df):
+    """
+    Combine the frames computed for a year into one frame.
+
+    Returns:
+        pd.DataFrame: ``Hour Start (EST)`` (timezone-aware), ``Delivery Date``, ``Hour``
+        and the ``RESULT_COLUMNS`` in float64.
+    """
+    timesteps = supplybased_ef[["Delivery Date", "Hour"]].reset_index(drop=True)
+    hour_starts = pd.to_datetime(timesteps["Delivery Date"].astype(str)) + pd.to_timedelta(timesteps["Hour"].to_numpy() - 1, unit="h")
+    frame = pd.concat([hour_starts.dt.tz_localize(EST_TIMEZONE).rename(TIME_COLUMN), timesteps], axis=1)
+    for frame_part in (supplybased_ef, consumption_based_ef, total_output_df, spot_check_df):
+        for column in RESULT_COLUMNS.values():
+            if column in frame_part.columns:
+                frame[column] = frame_part[column].to_numpy(dtype=np.float64)
+    return frame
+
+def results_path(output_dir, year, fmt):
+    """Return the path of the ``fmt`` result file of ``year``."""
+    if fmt not in RESULT_FORMATS:
+        raise ValueError(f"Unknown result format {fmt!r}; use one of {list(RESULT_FORMATS)}.")
+    return os.path.join(output_dir, f"Hourly_Results_{year}.{fmt}")
+
+def _require_pyarrow(fmt):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"{fmt.capitalize()} result files require pyarrow (pip install pyarrow).")
+
+
+### Writing
+def write_results(frame, year, output_dir, formats=DEFAULT_RESULT_FORMATS):
+    """
+    Write a frame from ``results_frame`` in each of ``formats``.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for fmt in formats:
+        path = results_path(output_dir, year, fmt)
+        if fmt == "csv":
+            frame.to_csv(path, index=False)
+        elif fmt in ("parquet", "feather"):
+            _require_pyarrow(fmt)
+            columnar = frame.assign(**{"Delivery Date": pd.to_datetime(frame["Delivery Date"].astype(str)).dt.date})
+            if fmt == "parquet":
+                columnar.to_parquet(path, index=False)
+            else:
+                columnar.to_feather(path)
+        else:
+            arrays = {name: frame[column].to_numpy(dtype=np.float32) for name, column in RESULT_COLUMNS.items() if column in frame.columns}
+            hour_starts = frame[TIME_COLUMN].dt.tz_convert(EST_TIMEZONE).dt.tz_localize(None)
+            np.savez(path, hour_start=hour_starts.to_numpy(dtype="datetime64[s]"), **arrays)
+        paths.append(path)
+    return paths
+
+
+### Reading
+def read_results(path, columns=None):
+    """
+    Read a result file written by ``write_results``.
+
+    Args:
+        path (str): ``.csv``, ``.parquet``, ``.feather`` or ``.npz`` result file.
+        columns (list): Value columns to load, e.g. ``["Consumption-based EF (g CO2e/kWh)"]``;
+            all ``RESULT_COLUMNS`` by default.
+
+    Returns:
+        pd.DataFrame: Same layout as ``results_frame``. Values of ``.npz`` files are float32.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Result file not found at {path}.")
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    wanted = [TIME_COLUMN, "Delivery Date", "Hour"] + (list(columns) if columns else list(RESULT_COLUMNS.values()))
+
+    if fmt == "npz":
+        with np.load(path) as npz:
+            hour_starts = npz["hour_start"]
+            days = hour_starts.astype("datetime64[D]")
+            frame = pd.DataFrame({
+                TIME_COLUMN: pd.DatetimeIndex(hour_starts).tz_localize(EST_TIMEZONE),
+                "Delivery Date": np.datetime_as_string(days),
+                "Hour": (hour_starts - days) // np.timedelta64(1, "h") + 1,
+            })
+            for name, column in RESULT_COLUMNS.items():
+                if name in npz.files and column in wanted:
+                    frame[column] = npz[name]
+        return frame
+
+    if fmt == "csv":
+        frame = pd.read_csv(path, usecols=lambda column: column in wanted, float_precision="round_trip")
+        frame[TIME_COLUMN] = pd.to_datetime(frame[TIME_COLUMN], utc=True).dt.tz_convert(EST_TIMEZONE)
+        return frame
+
+    if fmt in ("parquet", "feather"):
+        _require_pyarrow(fmt)
+        reader = pd.read_parquet if fmt == "parquet" else pd.read_feather
+        frame = reader(path, columns=wanted)
+        return frame.assign(**{"Delivery Date": frame["Delivery Date"].astype(str)})
+
+    raise ValueError(f"Unknown result file type {path}; use one of {list(RESULT_FORMATS)}.")
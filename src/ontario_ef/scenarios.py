@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Evaluate thousands of emission rate / neighboring factor scenarios at once.
+
+For fixed generation, demand and trade data, the consumption-based EF of every hour is
+linear in the technology emission rates and the neighboring region factors:
+
+    EF = (rates @ tech_output * k + factors @ region_imports) / demand
+
+where ``k = (total output - exports - max(balance difference, 0)) / total output`` is
+the share of the supply-based emissions kept in Ontario (see
+``calculate_consumption_based_ef``). ``ScenarioBasis`` precomputes the per-hour
+technology and region terms once, so N scenarios reduce to two matrix products.
+
+Example:
+    python src/scenarios.py 2022 --sample 10000 --spread 0.25 --out data/output/scenarios
+"""
+
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .pipeline import (
+    TECH_PREFIX_MAP, align_on_timesteps, get_emission_rates, get_neighboring_emission_factors,
+    map_generator_technologies, prepare_year_data, timestep_keys
+)
+from .neighbor_factors import region_key
+
+
+logger = logging.getLogger("ontario_ef")
+
+DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+### 1. Precomputed per-hour terms
+class ScenarioBasis:
+    """
+    Per-hour terms of the consumption-based EF for one set of generation and trade data.
+
+    Attributes:
+        timesteps (pd.DataFrame): ``Delivery Date`` and ``Hour`` of every hour.
+        technologies (list): Technologies of ``tech_terms``, as in ``TECH_PREFIX_MAP``.
+        regions (list): Region keys (see ``region_key``) of ``region_terms``.
+        tech_terms (np.ndarray): (hours x technologies) output kept in Ontario per MWh of
+            demand, so that ``tech_terms @ rates`` is the EF in t CO2e/MWh.
+        region_terms (np.ndarray): (hours x regions) imports per MWh of demand.
+        demand (np.ndarray): Ontario demand of every hour in MWh.
+    """
+
+    def __init__(self, timesteps, technologies, regions, tech_terms, region_terms, demand):
+        self.timesteps = timesteps.reset_index(drop=True)
+        self.technologies = list(technologies)
+        self.regions = list(regions)
+        self.tech_terms = tech_terms
+        self.region_terms = region_terms
+        self.demand = demand
+
+    @classmethod
+    def from_year_data(cls, transformed_gen_data, demand_df, transformed_trade_flow):
+        """
+        Build the basis from the outputs of ``prepare_year_data``.
+
+        Raises:
+            MisalignedTimestepsError: If the inputs do not cover the same timesteps.
+        """
+        timesteps = transformed_gen_data[["Delivery Date", "Hour"]].reset_index(drop=True)
+        keys = timestep_keys(timesteps, "Delivery Date")
+        aligned = align_on_timesteps(keys, {
+            "demand_df": (demand_df, "Date"),
+            "transformed_trade_flow": (transformed_trade_flow, "Date"),
+        })
+
+        # Output per technology and in total
+        generator_columns = transformed_gen_data.columns[2:]
+        technologies, membership = map_generator_technologies(generator_columns)
+        gen_output = np.nan_to_num(transformed_gen_data[generator_columns].to_numpy(dtype=np.float64))
+        tech_output = gen_output @ membership
+        total_output = tech_output.sum(axis=1)
+
+        # Imports and exports, with imports summed per region
+        trade_flow = aligned["transformed_trade_flow"]
+        flow_columns = [col for col in trade_flow.columns if col not in ["Date", "Hour"]]
+        flows = trade_flow[flow_columns].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        exports = np.where(flows > 0, flows, 0).sum(axis=1)
+        imports = np.where(flows < 0, -flows, 0)
+        regions = sorted({region_key(col.split(" ")[0]) for col in flow_columns})
+        region_membership = np.array([[region_key(col.split(" ")[0]) == region for region in regions] for col in flow_columns], dtype=np.float64)
+        region_imports = imports @ region_membership.reshape(len(flow_columns), len(regions))
+
+        # Share of the supply-based emissions kept in Ontario
+        demand = aligned["demand_df"]["Ontario Demand"].to_numpy(dtype=np.float64)
+        balance_difference = total_output - exports + imports.sum(axis=1) - demand
+        kept_output = total_output - exports - np.maximum(balance_difference, 0)
+        kept_share = np.divide(kept_output, total_output, out=np.zeros_like(total_output), where=total_output > 0)
+
+        # Divide by demand once, leaving hours without demand at 0
+        per_demand = np.divide(1.0, demand, out=np.zeros_like(demand), where=demand > 0)
+        tech_terms = tech_output * (kept_share * per_demand)[:, None]
+        region_terms = region_imports * per_demand[:, None]
+
+        return cls(timesteps, technologies, regions, tech_terms, region_terms, demand)
+
+    def rate_matrix(self, scenarios):
+        """Return the (N x technologies) emission rates of ``scenarios`` in t CO2e/MWh."""
+        missing = [tech for tech in self.technologies if tech not in scenarios.columns]
+        if missing:
+            raise ValueError(f"Scenarios are missing emission rates for {missing}.")
+        return scenarios[self.technologies].to_numpy(dtype=np.float64)
+
+    def factor_matrix(self, scenarios):
+        """
+        Return the (N x regions) neighboring factors of ``scenarios`` in t CO2e/MWh.
+
+        Regions without a scenario column default to 0, as in ``calculate_consumption_based_ef``.
+        """
+        columns = {region_key(col): col for col in scenarios.columns if col not in self.technologies}
+        factors = np.zeros((len(scenarios), len(self.regions)))
+        for i, region in enumerate(self.regions):
+            if region in columns:
+                factors[:, i] = scenarios[columns[region]].to_numpy(dtype=np.float64)
+            else:
+                logger.warning("Warning: No emission factor found for region '%s'. Defaulting to 0.", region)
+        return factors
+
+    def evaluate(self, scenarios, chunk_size=DEFAULT_CHUNK_SIZE, dtype=np.float32):
+        """
+        Compute the hourly consumption-based EF of every scenario.
+
+        Args:
+            scenarios (pd.DataFrame): One row per scenario with an emission rate column per
+                technology and a factor column per region, in t CO2e/MWh.
+            chunk_size (int): Scenarios computed per matrix product, bounding the float64
+                intermediate to ``chunk_size x hours``.
+            dtype: Type of the returned array.
+
+        Returns:
+            np.ndarray: (scenarios x hours) consumption-based EF in g CO2e/kWh.
+        """
+        rates = self.rate_matrix(scenarios)
+        factors = self.factor_matrix(scenarios)
+
+        # g CO2e/kWh = 1000 x t CO2e/MWh
+        tech_terms = (self.tech_terms * 1000).T
+        region_terms = (self.region_terms * 1000).T
+
+        ef = np.empty((len(scenarios), len(self.timesteps)), dtype=dtype)
+        for start in range(0, len(scenarios), chunk_size):
+            stop = start + chunk_size
+            ef[start:stop] = rates[start:stop] @ tech_terms + factors[start:stop] @ region_terms
+        return ef
+
+
+### 2. Scenario matrices
+def scenarios_from_factors(emission_rates, neighboring_emission_factors):
+    """Return the single scenario made of the factors loaded from the ``data`` CSV files."""
+    return pd.DataFrame([{**emission_rates, **neighboring_emission_factors}])
+
+def load_scenarios(path):
+    """
+    Load a scenario matrix CSV.
+
+    The file holds one row per scenario, an optional ``Scenario`` name column, one column
+    per technology of ``TECH_PREFIX_MAP`` and one column per neighboring region, in
+    t CO2e/GWh like ``data/emission_rates.csv``.
+
+    Returns:
+        pd.DataFrame: Factors in t CO2e/MWh, indexed by scenario name.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Scenario file not found at {path}.")
+
+    df = pd.read_csv(path)
+    if "Scenario" in df.columns:
+        df = df.set_index("Scenario")
+    missing = set(TECH_PREFIX_MAP.values()) - set(df.columns)
+    if missing:
+        raise ValueError(f"Scenario file must contain a column per technology; missing {sorted(missing)}.")
+
+    # Convert to t CO2e/MWh for calculations
+    return df.astype(np.float64) / 1000
+
+def sample_scenarios(base, n, spread=0.2, seed=None):
+    """
+    Draw ``n`` scenarios by scaling every factor of ``base`` uniformly within ``±spread``.
+
+    Args:
+        base (pd.DataFrame): Single-row scenario, e.g. from ``scenarios_from_factors``.
+        n (int): Number of scenarios.
+        spread (float): Relative half-width of the uniform distribution.
+        seed (int): Seed of the random generator.
+    """
+    rng = np.random.default_rng(seed)
+    scale = rng.uniform(1 - spread, 1 + spread, size=(n, base.shape[1]))
+    return pd.DataFrame(base.to_numpy(dtype=np.float64) * scale, columns=base.columns)
+
+
+### 3. Summaries
+def summarize_hours(basis, ef, percentiles=DEFAULT_PERCENTILES):
+    """
+    Return the percentiles of the scenario EFs of every hour.
+
+    Returns:
+        pd.DataFrame: ``Delivery Date``, ``Hour`` and a ``P<q> EF (g CO2e/kWh)`` column per percentile.
+    """
+    values = np.percentile(ef, percentiles, axis=0)
+    return basis.timesteps.assign(**{f"P{q:g} EF (g CO2e/kWh)": values[i] for i, q in enumerate(percentiles)})
+
+def summarize_scenarios(basis, ef, scenarios):
+    """
+    Return the annual consumption-based EF of every scenario.
+
+    Returns:
+        pd.DataFrame: Mean hourly EF and demand-weighted EF per scenario, with the
+        scenario factors.
+    """
+    weights = basis.demand / basis.demand.sum()
+    summary = pd.DataFrame({
+        "Mean Hourly EF (g CO2e/kWh)": ef.mean(axis=1, dtype=np.float64),
+        "Demand-weighted EF (g CO2e/kWh)": ef.astype(np.float64) @ weights if len(ef) else np.array([]),
+    }, index=scenarios.index)
+    return pd.concat([summary, scenarios * 1000], axis=1)
+
+
+### 4. Command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the hourly consumption-based EF of many factor scenarios at once.")
+    parser.add_argument("year", type=int, help="Year to evaluate (2020-2024).")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--scenarios", help="Scenario matrix CSV (one row per scenario, factors in t CO2e/GWh).")
+    source.add_argument("--sample", type=int, help="Draw this many scenarios around the factors in data/.")
+    parser.add_argument("--spread", type=float, default=0.2, help="Relative spread of the sampled factors (default: 0.2).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the sampled scenarios.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Scenarios computed per matrix product.")
+    parser.add_argument("--out", default=os.path.join("data", "output", "scenarios"), help="Output directory.")
+    args = parser.parse_args(argv)
+
+    if args.scenarios:
+        scenarios = load_scenarios(args.scenarios)
+    else:
+        base = scenarios_from_factors(get_emission_rates(False), get_neighboring_emission_factors(False))
+        scenarios = sample_scenarios(base, args.sample, args.spread, args.seed)
+
+    basis = ScenarioBasis.from_year_data(*prepare_year_data(args.year))
+
+    start_time = time.time()
+    ef = basis.evaluate(scenarios, args.chunk_size)
+    hourly = summarize_hours(basis, ef)
+    annual = summarize_scenarios(basis, ef, scenarios)
+    print(f"Evaluated {len(scenarios):,} scenarios x {ef.shape[1]:,} hours in {time.time() - start_time:.2f} s.")
+
+    os.makedirs(args.out, exist_ok=True)
+    np.save(os.path.join(args.out, f"scenario_ef_{args.year}.npy"), ef)
+    hourly.to_csv(os.path.join(args.out, f"scenario_hourly_percentiles_{args.year}.csv"), index=False)
+    annual.to_csv(os.path.join(args.out, f"scenario_annual_ef_{args.year}.csv"), index_label="Scenario")
+    print(f"Results saved to: {args.out}")
+    return 0
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Apply hourly consumption-based emission factors to building meter load profiles.
+
+Load profiles are streamed in chunks from CSV or Parquet files, in long format (one row
+per meter and interval) or wide format (one column per meter). Interval data is summed
+to hourly energy, joined to the hourly consumption-based EF by hour offset, and written
+as per-meter hourly, monthly and annual tCO2e totals. Memory use is bounded by the chunk
+size and the number of meters, not by the length of the profiles.
+
+Example:
+    python src/scope2_calculator.py meters.csv --format long --meter-col meter_id \
+        --time-col timestamp --value-col kwh --out data/output/scope2
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .defaults import DEFAULT_OUTPUT_DIR, DEFAULT_STORE_PATH
+from .ef_store import EST_TIMEZONE, load_consumption_ef
+
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+
+### 1. Reading load profiles in chunks
+def read_load_profile_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrames of at most ``chunksize`` rows from a CSV or Parquet file."""
+    if path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet load profiles requires pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+def to_long_format(chunk, layout, meter_col, time_col, value_col):
+    """Return a chunk as ``meter``, ``timestamp`` and ``kwh`` columns."""
+    if layout == "wide":
+        chunk = chunk.melt(id_vars=[time_col], var_name=meter_col, value_name=value_col)
+
+    return pd.DataFrame({
+        "meter": chunk[meter_col].astype(str).to_numpy(),
+        "timestamp": chunk[time_col].to_numpy(),
+        "kwh": pd.to_numeric(chunk[value_col], errors="coerce").to_numpy(dtype=np.float64),
+    })
+
+def hour_starts(timestamps, timezone=None, interval_end=False):
+    """
+    Return the EST start of the hour each interval falls in.
+
+    Args:
+        timestamps (array-like): Interval timestamps.
+        timezone (str): Timezone of naive timestamps, e.g. ``"America/Toronto"``. Naive
+            timestamps are taken as EST when omitted. Ambiguous fall-back times are read
+            as standard time.
+        interval_end (bool): Timestamps mark the end of their interval rather than its start.
+    """
+    timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    if timestamps.tz is None and timezone:
+        timestamps = timestamps.tz_localize(timezone, ambiguous=False, nonexistent="shift_forward")
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_convert(EST_TIMEZONE).tz_localize(None)
+    if interval_end:
+        timestamps = timestamps - pd.Timedelta(seconds=1)
+    return timestamps.floor("h")
+
+
+### 2. Streaming calculator
+class _CsvAppender:
+    """Append DataFrames to a CSV file, writing the header once."""
+
+    def __init__(self, path):
+        self.path = path
+        self.started = False
+
+    def write(self, df):
+        df.to_csv(self.path, mode="a" if self.started else "w", header=not self.started, index=False)
+        self.started = True
+
+def calculate_scope2_emissions(path, layout="long", meter_col="meter_id", time_col="timestamp", value_col="kwh",
+                               out_dir=DEFAULT_OUTPUT_DIR, chunksize=DEFAULT_CHUNKSIZE, timezone=None,
+                               interval_end=False, store_path=DEFAULT_STORE_PATH, ef_output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Stream a load profile and write per-meter hourly, monthly and annual Scope 2 emissions.
+
+    Intervals shorter than an hour (e.g. 15-minute data) are summed into their hour. Each
+    meter's profile is expected in chronological order, so the last hour of each meter in
+    a chunk is held back and completed with the next chunk.
+
+    Args:
+        path (str): CSV or Parquet load profile.
+        layout (str): ``"long"`` (meter, timestamp, kWh columns) or ``"wide"`` (timestamp
+            column plus one kWh column per meter).
+        meter_col, time_col, value_col (str): Column names of the long layout; only
+            ``time_col`` is used for the wide layout.
+        out_dir (str): Directory receiving ``scope2_hourly.csv``, ``scope2_monthly.csv``
+            and ``scope2_annual.csv``.
+        chunksize (int): Rows read at a time.
+        timezone (str): Timezone of naive timestamps (EST when omitted).
+        interval_end (bool): Timestamps mark the end of their interval.
+        store_path (str): Hourly EF store; the output CSVs are used when it does not exist.
+        ef_output_dir (str): Directory of the ``Consumption-based_EF_<year>.csv`` files.
+
+    Returns:
+        dict: ``rows``, ``seconds``, ``rows_per_second``, ``meters`` and ``unmatched_hours``
+        (hours without an emission factor, whose emissions are left empty). The monthly
+        and annual files also count the unmatched hours of each meter; the emissions of a
+        month without any matched hour are left empty.
+    """
+    if layout not in ("long", "wide"):
+        raise ValueError("layout must be 'long' or 'wide'.")
+
+    start_time = time.time()
+    epoch, ef_values = load_consumption_ef(store_path, ef_output_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    hourly_writer = _CsvAppender(os.path.join(out_dir, "scope2_hourly.csv"))
+
+    pending = None
+    monthly = None
+    rows = unmatched = 0
+
+    def emit(hourly):
+        """Join complete hours to the EF, write them and add them to the monthly totals."""
+        nonlocal monthly, unmatched
+        offsets = ((hourly["hour_start"] - epoch) // pd.Timedelta(hours=1)).to_numpy()
+        in_range = (offsets >= 0) & (offsets < len(ef_values))
+        ef = np.full(len(offsets), np.nan)
+        ef[in_range] = ef_values[offsets[in_range]]
+        unmatched += int(np.isnan(ef).sum())
+
+        hourly = hourly.assign(**{
+            "Consumption-based EF (g CO2e/kWh)": ef,
+            "Emissions (t CO2e)": hourly["kwh"].to_numpy() * ef / 1e6,
+        })
+        hourly_writer.write(hourly.rename(columns={"meter": "Meter", "hour_start": "Hour Start (EST)", "kwh": "Energy (kWh)"}))
+
+        months = hourly.assign(Year=hourly["hour_start"].dt.year, Month=hourly["hour_start"].dt.month,
+                               hours=1, unmatched_hours=np.isnan(ef).astype(np.int64))
+        totals = months.groupby(["meter", "Year", "Month"])[["kwh", "Emissions (t CO2e)", "hours", "unmatched_hours"]].sum(min_count=1)
+        monthly = totals if monthly is None else monthly.add(totals, fill_value=0)
+
+    for chunk in read_load_profile_chunks(path, chunksize):
+        rows += len(chunk)
+        long = to_long_format(chunk, layout, meter_col, time_col, value_col)
+        long["hour_start"] = hour_starts(long["timestamp"], timezone, interval_end)
+
+        # Sum intervals into hours, including the hours held back from the previous chunk
+        hourly = long.groupby(["meter", "hour_start"], sort=True, as_index=False)["kwh"].sum(min_count=1)
+        if pending is not None:
+            hourly = pd.concat([pending, hourly]).groupby(["meter", "hour_start"], sort=True, as_index=False)["kwh"].sum(min_count=1)
+
+        # Hold back the last hour of each meter, which may continue in the next chunk
+        last_hour = hourly.groupby("meter")["hour_start"].transform("max")
+        held_back = (hourly["hour_start"] == last_hour).to_numpy()
+        pending = hourly[held_back]
+        if not held_back.all():
+            emit(hourly[~held_back])
+
+    if pending is not None and len(pending):
+        emit(pending)
+
+    # Monthly and annual totals per meter; months without any matched hour have no emissions rather than 0 t
+    columns = {"kwh": "Energy (kWh)", "Emissions (t CO2e)": "Emissions (t CO2e)", "unmatched_hours": "Unmatched Hours"}
+    if monthly is None:
+        monthly = pd.DataFrame(columns=["meter", "Year", "Month", "kwh", "Emissions (t CO2e)", "hours", "unmatched_hours"]).set_index(["meter", "Year", "Month"])
+    monthly = monthly.sort_index()
+    monthly.loc[monthly["unmatched_hours"] == monthly["hours"], "Emissions (t CO2e)"] = np.nan
+    monthly = monthly.drop(columns="hours").astype({"unmatched_hours": np.int64})
+    monthly.rename(columns=columns).rename_axis(["Meter", "Year", "Month"]).reset_index().to_csv(
+        os.path.join(out_dir, "scope2_monthly.csv"), index=False)
+    annual = monthly.groupby(level=["meter", "Year"]).sum(min_count=1)
+    annual.rename(columns=columns).rename_axis(["Meter", "Year"]).reset_index().to_csv(
+        os.path.join(out_dir, "scope2_annual.csv"), index=False)
+
+    elapsed = time.time() - start_time
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed > 0 else float("inf"),
+        "meters": int(annual.index.get_level_values(0).nunique()),
+        "unmatched_hours": unmatched,
+    }
+
+
+### 3. Command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate per-meter Scope 2 emissions from hourly consumption-based EFs.")
+    parser.add_argument("path", help="Load profile (CSV or Parquet).")
+    parser.add_argument("--format", dest="layout", choices=["long", "wide"], default="long", help="Long (meter, timestamp, kWh) or wide (one column per meter) layout.")
+    parser.add_argument("--meter-col", default="meter_id", help="Meter column of the long layout.")
+    parser.add_argument("--time-col", default="timestamp", help="Timestamp column.")
+    parser.add_argument("--value-col", default="kwh", help="Energy (kWh) column of the long layout.")
+    parser.add_argument("--timezone", default=None, help="Timezone of naive timestamps, e.g. America/Toronto (default: EST).")
+    parser.add_argument("--interval-end", action="store_true", help="Timestamps mark the end of each interval.")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows read at a time.")
+    parser.add_argument("--out", default=DEFAULT_OUTPUT_DIR, help="Directory receiving the scope2_*.csv results.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Hourly EF store (falls back to the output CSVs).")
+    args = parser.parse_args(argv)
+
+    summary = calculate_scope2_emissions(
+        args.path, args.layout, args.meter_col, args.time_col, args.value_col, args.out,
+        args.chunksize, args.timezone, args.interval_end, args.store
+    )
+    print(f"Processed {summary['rows']:,} rows for {summary['meters']:,} meters in {summary['seconds']:.2f} s "
+          f"({summary['rows_per_second']:,.0f} rows/s).")
+    if summary["unmatched_hours"]:
+        print(f"Warning: {summary['unmatched_hours']:,} meter-hours have no emission factor; their emissions are left empty.")
+    print(f"Results saved to: {args.out}")
+    return 0
+
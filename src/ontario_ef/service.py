@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Serve hourly consumption-based emission factors over HTTP on localhost.
+
+All computed years are loaded at startup into one array indexed by the hour offset from
+the first hour (see ``ontario_ef.ef_store.load_consumption_ef``), so a lookup is an index
+computation. The output files are polled and reloaded in the background when they
+change; requests keep using the previous data until the new array is ready.
+
+Endpoints (JSON responses, EF in g CO2e/kWh, timestamps in ISO 8601; naive timestamps
+are EST, aware ones are converted to EST; missing hours are ``null``):
+
+    GET  /ef?time=2022-03-05T13:30                    EF of the hour containing ``time``
+    GET  /range?start=2022-01-01&end=2022-01-02       EF of every hour in [start, end)
+    GET  /aggregate?period=month&how=mean             by ``month``, ``year`` or ``hour``
+         [&start=...&end=...]                         (time of day, 1-24); ``mean``,
+                                                      ``sum``, ``min`` or ``max``
+    POST /batch  {"times": ["2022-01-01T00:30", ...]}  EF of every timestamp, in order
+    GET  /health                                      loaded hours, sources and cache stats
+
+Aggregates are cached in an LRU keyed by their parameters and cleared on reload.
+
+Example:
+    python src/ef_service.py --port 8080
+    curl "http://127.0.0.1:8080/ef?time=2022-03-05T13:30"
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .defaults import DEFAULT_OUTPUT_DIR, DEFAULT_STORE_PATH
+from .ef_store import EST_TIMEZONE, consumption_ef_files, load_consumption_ef
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_RELOAD_INTERVAL = 2.0  # Seconds between checks of the output files
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+EST = timezone(timedelta(hours=-5))
+HOUR = timedelta(hours=1)
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+logger = logging.getLogger("ontario_ef.service")
+
+
+### 1. In-memory index
+def source_signature(store_path=DEFAULT_STORE_PATH, output_dir=DEFAULT_OUTPUT_DIR):
+    """Return ``{path: (mtime_ns, size)}`` of the output CSVs and the store the emission factors are loaded from."""
+    paths = consumption_ef_files(output_dir)
+    if store_path:
+        paths.append(store_path)
+
+    signature = {}
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature[path] = (stat.st_mtime_ns, stat.st_size)
+    return signature
+
+def _null_nan(values):
+    """Return ``values`` as a list with NaN replaced by None (JSON ``null``)."""
+    values = np.asarray(values, dtype=np.float64)
+    return [None if v != v else v for v in values.tolist()]
+
+
+class EFIndex:
+    """
+    Hourly consumption-based EF of all computed years, indexed by hour offset.
+
+    Attributes:
+        epoch (datetime): EST start of the hour at offset 0.
+        values (np.ndarray): EF in g CO2e/kWh per hour, NaN for missing hours.
+        signature (dict): ``source_signature`` of the files the index was loaded from.
+    """
+
+    def __init__(self, epoch, values, signature=None):
+        self.epoch = pd.Timestamp(epoch).to_pydatetime()
+        self.values = values
+        self.signature = signature or {}
+        hour_starts = pd.date_range(self.epoch, periods=len(values), freq="h")
+        self._groups = {
+            "year": hour_starts.year.to_numpy(),
+            "month": (hour_starts.year * 100 + hour_starts.month).to_numpy(),
+            "hour": hour_starts.hour.to_numpy() + 1,
+        }
+
+    @classmethod
+    def load(cls, store_path=DEFAULT_STORE_PATH, output_dir=DEFAULT_OUTPUT_DIR):
+        """Load the output CSVs, with the hours of the EF store replacing theirs (see ``load_consumption_ef``)."""
+        signature = source_signature(store_path, output_dir)
+        epoch, values = load_consumption_ef(store_path, output_dir)
+        return cls(epoch, values, signature)
+
+    def __len__(self):
+        return len(self.values)
+
+    # Timestamps
+    def offset(self, timestamp):
+        """Return the hour offset of an ISO 8601 timestamp."""
+        moment = datetime.fromisoformat(timestamp)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(EST).replace(tzinfo=None)
+        return (moment - self.epoch) // HOUR
+
+    def offsets(self, timestamps):
+        """
+        Vectorized ``offset``; timestamps may mix naive and timezone-aware values.
+
+        Raises:
+            ValueError: If an entry is not an ISO 8601 timestamp, naming its position.
+        """
+        for i, timestamp in enumerate(timestamps):
+            if not isinstance(timestamp, str):
+                raise ValueError(f"times[{i}] is not an ISO 8601 timestamp: {json.dumps(timestamp)}.")
+        try:
+            moments = pd.DatetimeIndex(pd.to_datetime(timestamps, format="ISO8601"))
+        except (ValueError, TypeError):
+            # Mixed UTC offsets, or a bad entry: convert one at a time to find it
+            return np.array([self._entry_offset(i, timestamp) for i, timestamp in enumerate(timestamps)], dtype=np.int64)
+        if moments.hasnans:
+            # Strings such as "NaT" parse to a missing time
+            raise ValueError(f"times[{int(np.flatnonzero(moments.isna())[0])}] is not an ISO 8601 timestamp.")
+        if moments.tz is not None:
+            moments = moments.tz_convert(EST_TIMEZONE).tz_localize(None)
+        return ((moments - pd.Timestamp(self.epoch)) // pd.Timedelta(hours=1)).to_numpy()
+
+    def _entry_offset(self, i, timestamp):
+        try:
+            return self.offset(timestamp)
+        except ValueError:
+            raise ValueError(f"times[{i}] is not an ISO 8601 timestamp: {json.dumps(timestamp)}.") from None
+
+    def hour_start(self, offset):
+        return (self.epoch + int(offset) * HOUR).isoformat()
+
+    # Queries
+    def lookup(self, timestamp):
+        offset = self.offset(timestamp)
+        value = self.values[offset] if 0 <= offset < len(self.values) else np.nan
+        return {"hour_start": self.hour_start(offset), "consumption_ef": None if np.isnan(value) else float(value)}
+
+    def batch(self, timestamps):
+        offsets = self.offsets(timestamps)
+        values = np.full(len(offsets), np.nan)
+        in_range = (offsets >= 0) & (offsets < len(self.values))
+        values[in_range] = self.values[offsets[in_range]]
+        return {"consumption_ef": _null_nan(values)}
+
+    def range(self, start, end):
+        first, last = self.offset(start), self.offset(end)
+        if last - first > 10 * 366 * 24:
+            raise ValueError("Ranges are limited to 10 years.")
+        values = np.full(max(last - first, 0), np.nan)
+        lo, hi = max(first, 0), min(last, len(self.values))
+        if hi > lo:
+            values[lo - first:hi - first] = self.values[lo:hi]
+        return {"start": self.hour_start(first), "consumption_ef": _null_nan(values)}
+
+    def aggregate(self, period, how="mean", start=None, end=None):
+        if period not in self._groups:
+            raise ValueError(f"Unknown period {period!r}; use 'month', 'year' or 'hour'.")
+        if how not in ("mean", "sum", "min", "max"):
+            raise ValueError(f"Unknown aggregation {how!r}; use 'mean', 'sum', 'min' or 'max'.")
+
+        lo = max(self.offset(start), 0) if start else 0
+        hi = min(self.offset(end), len(self.values)) if end else len(self.values)
+        values = pd.Series(self.values[lo:hi]).dropna()
+        keys = self._groups[period][lo:hi][values.index.to_numpy()]
+        result = values.groupby(keys).agg(how)
+
+        if period == "month":
+            labels = [{"year": int(key) // 100, "month": int(key) % 100} for key in result.index]
+        else:
+            labels = [{period: int(key)} for key in result.index]
+        return {"period": period, "how": how,
+                "results": [{**label, "consumption_ef": value} for label, value in zip(labels, result.tolist())]}
+
+
+### 2. Aggregate cache
+class LRUCache:
+    """Least-recently-used cache of at most ``maxsize`` entries."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+
+    def get_or_compute(self, key, compute):
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        value = compute()
+        if self.maxsize > 0:
+            self._entries[key] = value
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+### 3. HTTP service
+class EFService:
+    """
+    asyncio HTTP/1.1 server answering emission factor queries from an ``EFIndex``.
+
+    Args:
+        store_path (str): Hourly EF store, whose hours replace those of the output CSVs; optional.
+        output_dir (str): Directory of the ``Consumption-based_EF_<year>.csv`` files.
+        cache_size (int): Aggregate results kept in the LRU cache.
+        reload_interval (float): Seconds between checks of the output files; 0 disables reloading.
+    """
+
+    def __init__(self, store_path=DEFAULT_STORE_PATH, output_dir=DEFAULT_OUTPUT_DIR,
+                 cache_size=DEFAULT_CACHE_SIZE, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.store_path = store_path
+        self.output_dir = output_dir
+        self.reload_interval = reload_interval
+        self.cache = LRUCache(cache_size)
+        self.index = EFIndex.load(store_path, output_dir)
+        self.loaded_at = time.time()
+        self.reloads = 0
+        self.requests = 0
+
+    # Hot reload
+    async def reload_if_changed(self):
+        """Reload the index when an output file was added, removed or modified."""
+        if source_signature(self.store_path, self.output_dir) == self.index.signature:
+            return False
+        try:
+            index = await asyncio.to_thread(EFIndex.load, self.store_path, self.output_dir)
+        except (OSError, ValueError, KeyError, pd.errors.ParserError) as error:
+            # Files may be half written; keep serving the current data and retry later
+            logger.warning("Reload failed, keeping the current emission factors: %s", error)
+            return False
+
+        self.index = index
+        self.cache.clear()
+        self.loaded_at = time.time()
+        self.reloads += 1
+        logger.info("Reloaded %d hours of emission factors.", len(index))
+        return True
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload_if_changed()
+
+    # Routing
+    def health(self):
+        finite = np.flatnonzero(np.isfinite(self.index.values))
+        return {
+            "hours": int(len(finite)),
+            "first_hour": self.index.hour_start(finite[0]) if len(finite) else None,
+            "last_hour": self.index.hour_start(finite[-1]) if len(finite) else None,
+            "sources": list(self.index.signature),
+            "loaded_at": datetime.fromtimestamp(self.loaded_at).isoformat(timespec="seconds"),
+            "reloads": self.reloads,
+            "requests": self.requests,
+            "cache": self.cache.stats(),
+        }
+
+    def dispatch(self, method, target, body):
+        """Return ``(status, payload)`` for one request."""
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        routes = {"/ef": "GET", "/range": "GET", "/aggregate": "GET", "/health": "GET", "/batch": "POST"}
+        if url.path not in routes:
+            return 404, {"error": f"Unknown path {url.path}."}
+        if method != routes[url.path]:
+            return 405, {"error": f"{url.path} expects {routes[url.path]}."}
+
+        index = self.index
+        try:
+            if url.path == "/ef":
+                return 200, index.lookup(_required(params, "time"))
+            if url.path == "/range":
+                return 200, index.range(_required(params, "start"), _required(params, "end"))
+            if url.path == "/aggregate":
+                key = (params.get("period", "month"), params.get("how", "mean"), params.get("start"), params.get("end"))
+                return 200, self.cache.get_or_compute(key, lambda: index.aggregate(*key))
+            if url.path == "/batch":
+                request = json.loads(body or b"{}")
+                times = request.get("times") if isinstance(request, dict) else request
+                if not isinstance(times, list):
+                    raise ValueError('Expected a JSON list of timestamps or {"times": [...]}.')
+                return 200, index.batch(times)
+            return 200, self.health()
+        except (ValueError, TypeError, OverflowError) as error:
+            return 400, {"error": str(error)}
+
+    # Connections
+    async def handle(self, reader, writer):
+        """Serve the requests of one keep-alive connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Malformed request line."}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {"error": "Malformed Content-Length header."}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {"error": f"Request bodies are limited to {MAX_BODY_BYTES:,} bytes."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                self.requests += 1
+                try:
+                    status, payload = self.dispatch(method, target, body)
+                except Exception:
+                    logger.exception("Request %s %s failed.", method, target)
+                    status, payload = 500, {"error": "Internal server error."}
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, allow_nan=False).encode()
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        address = server.sockets[0].getsockname()
+        logger.info("Serving %d hours of emission factors on http://%s:%d", len(self.index), address[0], address[1])
+
+        watcher = asyncio.create_task(self.watch()) if self.reload_interval > 0 else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+def _required(params, name):
+    if name not in params:
+        raise ValueError(f"Missing query parameter {name!r}.")
+    return params[name]
+
+
+### 4. Command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve hourly consumption-based emission factors over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST}).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT}).")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Hourly EF store, whose hours replace those of the output CSVs.")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory of the Consumption-based_EF_<year>.csv files.")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Aggregate results kept in the LRU cache.")
+    parser.add_argument("--reload-interval", type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help="Seconds between checks of the output files (0 disables hot reload).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    service = EFService(args.store, args.output_dir, args.cache_size, args.reload_interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
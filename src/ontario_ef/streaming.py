@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Compute years month by month with bounded memory.
+
+``run_year`` holds the generator output of a whole year, and the frames derived from
+it, until its outputs are written. ``iter_year_months`` instead parses one monthly
+generator report at a time, runs it through the transform, supply-based EF and
+consumption-based EF steps and yields the hourly results of that month.
+``run_year_streaming`` appends each month to a temporary copy of the outputs of
+``run_year`` as soon as it is computed, and moves them into place once the year is
+complete. Peak memory is then about one month of generator data, plus the hourly
+demand, trade flows and results of the year (a few MB), however many years are run.
+
+Every EF is computed hour by hour, so the outputs are identical to those of the batch
+path.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from .ef_store import DEFAULT_STORE_PATH, HourlyEFStore, year_frame
+from .instrumentation import DISABLED
+from .pipeline import (
+    OUTPUT_DIR, YearStages, calculate_consumption_based_ef, calculate_supply_based_ef, consumption_ef_path, download_files,
+    load_demand_and_trade_flow, timestep_keys, transform_generator_month, year_source_files
+)
+from .results import DEFAULT_RESULT_FORMATS, read_results, results_frame, results_path, write_results
+
+
+### 1. Monthly results
+def iter_year_months(year, emission_rates, neighboring_emission_factors, cache=None, data_dir=None, download=True,
+                     neighbor_series=None, instrumentation=DISABLED):
+    """
+    Compute ``year`` one monthly generator report at a time.
+
+    Args:
+        year (int): Year to compute (2020-2024).
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+        neighboring_emission_factors (dict): Emission factors per region in t CO2e/MWh.
+        cache (ParsedDataCache): Cache of parsed IESO files, if any.
+        data_dir (str): Directory of the IESO reports, ``IESO_DATA_DIR`` by default.
+        download (bool): Fetch missing or incomplete reports before reading them.
+        neighbor_series (NeighborFactorSeries): Time-varying factors of the neighboring regions.
+        instrumentation (Instrumentation): Records the stages of every month.
+
+    Yields:
+        tuple: ``(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df)`` of
+        each month, as returned by ``calculate_supply_based_ef`` and
+        ``calculate_consumption_based_ef``.
+
+    Raises:
+        MisalignedTimestepsError: If the demand or trade flows do not cover the hours of a
+            generator report.
+    """
+    if year < 2020 or year > 2024:
+        raise ValueError("Valid years for generator data are 2020-2024.")
+
+    generator_files, demand_file, trade_flow_file = year_source_files(year, data_dir)
+    if download:
+        with instrumentation.stage("download", year=year, source="demand_trade_flow") as stage:
+            stage.rows_out = len(download_files([demand_file, trade_flow_file]))
+
+    # The hourly demand and trade flows of the year are small; slice them per month
+    demand_df, transformed_trade_flow = load_demand_and_trade_flow(year, cache, instrumentation, data_dir)
+    demand_keys = timestep_keys(demand_df, "Date")
+    trade_flow_keys = timestep_keys(transformed_trade_flow, "Date")
+
+    for month, generator_file in enumerate(generator_files, start=1):
+        if download:
+            download_files([generator_file])
+
+        with instrumentation.stage("parse", year=year, month=month, source="generator") as stage:
+            block = transform_generator_month(generator_file[1], cache)
+            stage.rows_out, stage.skipped_rows = block.source_rows, block.skipped_rows
+
+        # Same layout as the yearly frame of prepare_year_data, for this month's generators only
+        with instrumentation.stage("transform", year=year, month=month, source="generator") as stage:
+            transformed_gen_data = block.to_frame().fillna(0)
+            stage.rows_in, stage.rows_out = block.source_rows, len(transformed_gen_data)
+        del block
+
+        with instrumentation.stage("supply_ef", year=year, month=month) as stage:
+            supplybased_ef, total_output_df = calculate_supply_based_ef(transformed_gen_data, emission_rates)
+            stage.rows_in, stage.rows_out = len(transformed_gen_data), len(supplybased_ef)
+        del transformed_gen_data
+
+        with instrumentation.stage("consumption_ef", year=year, month=month) as stage:
+            month_keys = timestep_keys(supplybased_ef, "Delivery Date")
+            consumption_based_ef, spot_check_df = calculate_consumption_based_ef(
+                supplybased_ef, demand_df[demand_keys.isin(month_keys)],
+                transformed_trade_flow[trade_flow_keys.isin(month_keys)], neighboring_emission_factors, total_output_df,
+                neighbor_series
+            )
+            stage.rows_in, stage.rows_out = len(supplybased_ef), len(consumption_based_ef)
+
+        yield supplybased_ef, consumption_based_ef, total_output_df, spot_check_df
+
+
+### 2. Incremental outputs
+def append_outputs(year, supplybased_ef, consumption_based_ef, total_output_df, spot_check_df, output_dir=OUTPUT_DIR,
+                   store_path=DEFAULT_STORE_PATH, result_formats=DEFAULT_RESULT_FORMATS):
+    """
+    Append hours following those already written to every output of ``year``.
+
+    The consumption-based EF CSV and ``csv`` result file are appended to, the hours are
+    written to the store, and the other result files are rewritten with the new hours
+    replacing any from the same hour on.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    consumption_path = consumption_ef_path(output_dir, year)
+    exists = os.path.exists(consumption_path)
+    consumption_based_ef.to_csv(consumption_path, mode="a" if exists else "w", header=not exists, index=False)
+
+    if store_path:
+        HourlyEFStore(store_path, writable=True).write(year_frame(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df))
+
+    frame = results_frame(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df)
+    for fmt in result_formats:
+        path = results_path(output_dir, year, fmt)
+        if fmt == "csv" and os.path.exists(path):
+            frame.to_csv(path, mode="a", header=False, index=False)
+            continue
+        if os.path.exists(path):
+            previous = read_results(path)
+            frame = pd.concat([previous[previous[previous.columns[0]] < frame.iloc[0, 0]], frame], ignore_index=True)
+        write_results(frame, year, output_dir, [fmt])
+
+def run_year_streaming(year, emission_rates, neighboring_emission_factors, cache=None, force=False, store_path=DEFAULT_STORE_PATH,
+                       instrumentation=DISABLED, neighbor_series=None, result_formats=DEFAULT_RESULT_FORMATS, output_dir=OUTPUT_DIR,
+                       data_dir=None, download=True):
+    """
+    Compute ``year`` month by month and write the outputs of ``run_year``.
+
+    Each month is appended to a temporary consumption-based EF CSV as soon as it is
+    computed. The result files and the store are written, and the outputs moved into
+    place, only once every month succeeded.
+
+    Args:
+        year (int): Year to compute.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+        neighboring_emission_factors (dict): Emission factors per region in t CO2e/MWh.
+        cache (ParsedDataCache): Cache of parsed IESO files, if any.
+        force (bool): Recompute and overwrite an existing output file.
+        store_path (str): Hourly EF store to add the year to, or None to skip it.
+        instrumentation (Instrumentation): Records the stages of every month.
+        neighbor_series (NeighborFactorSeries): Time-varying factors of the neighboring regions.
+        result_formats (tuple): Formats of the ``Hourly_Results_<year>`` files.
+        output_dir (str): Directory of the outputs.
+        data_dir (str): Directory of the IESO reports, ``IESO_DATA_DIR`` by default.
+        download (bool): Fetch missing or incomplete reports before reading them.
+
+    Returns:
+        str: Path of the saved file, or None if it already existed, was computed from the same
+        factors and reports (when ``cache`` records them), and ``force`` is False.
+    """
+    consumption_path = consumption_ef_path(output_dir, year)
+
+    # An existing output is kept unless the factors or reports it was computed from changed since, as in run_year
+    stages = YearStages(year, cache, data_dir=data_dir)
+    if not force and stages.output_is_current(consumption_path, emission_rates, neighboring_emission_factors, neighbor_series):
+        print(f"Consumption-based EF for {year} already exists at {consumption_path}.")
+        print("Skipping analysis.")
+        return None
+
+    # Months are appended to temporary outputs that replace the existing ones once the year is complete,
+    # so a failed run leaves the outputs and the store as they were
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=output_dir, prefix=f".stream-{year}-")
+    tmp_consumption_path = consumption_ef_path(tmp_dir, year)
+    try:
+        # The hourly results of a year are small; only the generator data is held one month at a time
+        result_months, store_months = [], []
+        for month_frames in iter_year_months(year, emission_rates, neighboring_emission_factors, cache, data_dir, download,
+                                             neighbor_series, instrumentation):
+            with instrumentation.stage("write", year=year) as stage:
+                month_frames[1].to_csv(tmp_consumption_path, mode="a", header=not result_months, index=False)
+                result_months.append(results_frame(*month_frames))
+                store_months.append(year_frame(*month_frames))
+                stage.rows_out = len(month_frames[1])
+
+        with instrumentation.stage("write", year=year) as stage:
+            results = pd.concat(result_months, ignore_index=True)
+            write_results(results, year, tmp_dir, result_formats)
+            if store_path:
+                HourlyEFStore(store_path, writable=True).write(pd.concat(store_months, ignore_index=True))
+            for fmt in result_formats:
+                os.replace(results_path(tmp_dir, year, fmt), results_path(output_dir, year, fmt))
+            os.replace(tmp_consumption_path, consumption_path)
+            stage.rows_out = hours = len(results)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    stages.record_output(consumption_path, emission_rates, neighboring_emission_factors, neighbor_series)
+
+    print(f"Consumption-based EF data saved to: {consumption_path} ({hours:,} hours)")
+    if store_path:
+        print(f"Hourly results added to: {store_path}")
+    for fmt in result_formats:
+        print(f"Hourly results saved to: {results_path(output_dir, year, fmt)}")
+    return consumption_path
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Extend the outputs of the current year as the IESO reports are updated.
+
+IESO rewrites the month-to-date generator report and the year-to-date demand and
+intertie reports as new hours are published, keeping the rows already published in
+place. ``YearWatcher`` remembers how far it has read each report and, when a report
+changes, parses only the complete rows past that byte offset. Hours for which the
+generator output, demand and trade flows are all known, continuing from the last hour
+already written, are then computed and appended to the outputs of ``run_year``:
+``Consumption-based_EF_<year>.csv``, the hourly EF store and the ``Hourly_Results``
+files.
+
+A report whose already-read rows changed (e.g. revised upstream) is parsed again from
+its start, but hours already written are not recomputed; rerun the year with
+``--force`` to apply revisions.
+"""
+
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .ef_store import DEFAULT_STORE_PATH
+from .pipeline import (
+    OUTPUT_DIR, GeneratorOutput, calculate_consumption_based_ef, calculate_supply_based_ef, consumption_ef_path,
+    download_year_files, parse_demand_lines, parse_generator_rows, parse_trade_flow_lines, timestep_keys,
+    timestep_starts, transform_trade_flow, year_source_files
+)
+from .results import DEFAULT_RESULT_FORMATS
+from .streaming import append_outputs
+
+
+logger = logging.getLogger("ontario_ef")
+
+DEFAULT_POLL_SECONDS = 300
+
+
+### 1. Reading appended rows
+class ReportTail:
+    """
+    Byte offset of the rows of an IESO report that have already been read.
+
+    Args:
+        path (str): Report file.
+        header_rows (int): Column header rows following the ``\\\\`` preamble rows.
+    """
+
+    def __init__(self, path, header_rows=1):
+        self.path = path
+        self.header_rows = header_rows
+        self.header = None
+        self.offset = 0
+        self.last_line = b""
+        self.signature = None
+
+    def read(self):
+        """
+        Return the complete rows appended since the last call.
+
+        Returns:
+            bytes: New data rows, without preamble or header (empty when nothing changed).
+            bool: True when the file was read from its start again, so rows returned
+            earlier may be repeated.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return b"", False
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self.signature:
+            return b"", False
+        self.signature = signature
+
+        with open(self.path, "rb") as f:
+            restart = not self._unchanged(f)
+            if restart:
+                f.seek(0)
+                content = f.read()
+                data_start = self._data_start(content)
+                if data_start is None:
+                    self.header = None
+                    return b"", False
+                self.header = content[:data_start]
+                self.offset, self.last_line = data_start, b""
+                data = content[data_start:]
+            else:
+                f.seek(self.offset)
+                data = f.read()
+
+        # Keep only complete rows; a partially written last row is read next time
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return b"", restart
+        rows = data[:end]
+        self.offset += end
+        self.last_line = rows[rows.rfind(b"\n", 0, end - 1) + 1:]
+        return rows, restart
+
+    def _unchanged(self, f):
+        """Tell whether the header and the last row read are still in place in the open file ``f``."""
+        if self.header is None:
+            return False
+        if _header_rows(f.read(len(self.header))) != _header_rows(self.header):
+            return False
+        f.seek(self.offset - len(self.last_line))
+        return f.read(len(self.last_line)) == self.last_line
+
+    def _data_start(self, content):
+        """Return the offset of the first data row, or None if the header is incomplete."""
+        position, header_rows = 0, 0
+        while header_rows < self.header_rows:
+            line_end = content.find(b"\n", position)
+            if line_end == -1:
+                return None
+            if not content.startswith(b"\\", position):
+                header_rows += 1
+            position = line_end + 1
+        return position
+
+    def header_lines(self):
+        return self.header.decode().splitlines(keepends=True)
+
+def _header_rows(header):
+    """Return the column header rows of a report header, leaving out the preamble rows that change with every update."""
+    return [line for line in header.split(b"\n") if not line.startswith(b"\\")]
+
+
+### 2. Incremental computation
+def hour_offsets(keys, year):
+    """Return the hour offsets of ``(Date, Hour)`` keys from the start of ``year`` (EST)."""
+    return (timestep_starts(keys) - np.datetime64(f"{year}-01-01")) // np.timedelta64(1, "h")
+
+def last_written_hour(path, year):
+    """Return the offset of the last hour of ``Consumption-based_EF_<year>.csv``, or -1."""
+    if not os.path.exists(path):
+        return -1
+    with open(path, "rb") as f:
+        f.seek(max(os.path.getsize(path) - 4096, 0))
+        lines = f.read().strip().splitlines()
+    if not lines or lines[-1].startswith(b"Delivery Date"):
+        return -1
+    date, hour = lines[-1].decode().split(",")[:2]
+    return int(hour_offsets(pd.MultiIndex.from_arrays([[date], [int(hour)]], names=["Date", "Hour"]), year)[0])
+
+class YearWatcher:
+    """
+    Append the hours published since the last poll to the outputs of ``year``.
+
+    Args:
+        year (int): Year to extend, usually the current one.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+        neighboring_emission_factors (dict): Emission factors per region in t CO2e/MWh.
+        data_dir (str): Directory of the IESO reports, ``IESO_DATA_DIR`` by default.
+        output_dir (str): Directory of the outputs.
+        store_path (str): Hourly EF store to add the hours to, or None to skip it.
+        result_formats (tuple): Formats of the ``Hourly_Results_<year>`` files.
+        neighbor_series (NeighborFactorSeries): Time-varying factors of the neighboring regions.
+    """
+
+    def __init__(self, year, emission_rates, neighboring_emission_factors, data_dir=None, output_dir=OUTPUT_DIR,
+                 store_path=DEFAULT_STORE_PATH, result_formats=DEFAULT_RESULT_FORMATS, neighbor_series=None):
+        self.year = year
+        self.emission_rates = emission_rates
+        self.neighboring_emission_factors = neighboring_emission_factors
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self.store_path = store_path
+        self.result_formats = result_formats
+        self.neighbor_series = neighbor_series
+
+        generator_files, (_, demand_path), (_, trade_flow_path) = year_source_files(year, data_dir)
+        self.generator_tails = [ReportTail(path) for _, path in generator_files]
+        self.demand_tail = ReportTail(demand_path)
+        self.trade_flow_tail = ReportTail(trade_flow_path, header_rows=2)
+
+        self.consumption_path = consumption_ef_path(output_dir, year)
+        self.last_hour = last_written_hour(self.consumption_path, year)
+
+        # Rows read but not written yet, keyed by generator file for the generator rows
+        self.generator_rows = {}
+        self.demand = None
+        self.trade_flow = None
+
+    # Reading
+    def _read_generator_rows(self):
+        """Add the rows appended to the generator reports; return True if any report changed."""
+        changed = False
+        for tail in self.generator_tails:
+            data, restart = tail.read()
+            if restart:
+                self.generator_rows.pop(tail.path, None)
+            changed |= restart or bool(data)
+            if not data:
+                continue
+            rows = parse_generator_rows(data, source=tail.path)
+            days = (pd.to_datetime(rows["Delivery Date"]) - pd.Timestamp(self.year, 1, 1)).dt.days.to_numpy()
+            rows = rows[days * 24 + 23 > self.last_hour]
+            if tail.path in self.generator_rows:
+                rows = pd.concat([self.generator_rows[tail.path], rows], ignore_index=True)
+            self.generator_rows[tail.path] = rows
+        return changed
+
+    def _read_hourly(self, tail, current, parse):
+        """Return ``current`` with the rows appended to an hourly report, and whether the report changed."""
+        data, restart = tail.read()
+        if restart:
+            current = None
+        if not data:
+            return current, restart
+        rows = parse(tail.header_lines() + data.decode().splitlines(keepends=True))
+        rows = rows[hour_offsets(timestep_keys(rows, "Date"), self.year) > self.last_hour]
+        return (rows if current is None else pd.concat([current, rows], ignore_index=True)), True
+
+    # Polling
+    def poll(self):
+        """
+        Read the report rows appended since the last poll and write the hours they complete.
+
+        Returns:
+            int: Number of hours appended to the outputs.
+        """
+        generator_changed = self._read_generator_rows()
+        self.demand, demand_changed = self._read_hourly(self.demand_tail, self.demand, parse_demand_lines)
+        self.trade_flow, trade_flow_changed = self._read_hourly(
+            self.trade_flow_tail, self.trade_flow, lambda lines: transform_trade_flow(parse_trade_flow_lines(lines))
+        )
+        if not (generator_changed or demand_changed or trade_flow_changed):
+            return 0
+        if not self.generator_rows or self.demand is None or self.trade_flow is None:
+            return 0
+
+        generator_rows = pd.concat(list(self.generator_rows.values()), ignore_index=True)
+        if generator_rows.empty:
+            return 0
+        transformed_gen_data = GeneratorOutput.from_raw(generator_rows).to_frame().fillna(0)
+
+        # Hours known in every report, continuing from the last hour written
+        hours = {
+            name: hour_offsets(timestep_keys(df, date_col), self.year)
+            for name, df, date_col in (("generator", transformed_gen_data, "Delivery Date"), ("demand", self.demand, "Date"),
+                                       ("trade_flow", self.trade_flow, "Date"))
+        }
+        known = np.intersect1d(np.intersect1d(hours["generator"], hours["demand"]), hours["trade_flow"])
+        known = known[known > self.last_hour]
+        new_hours = known[known - self.last_hour - 1 == np.arange(len(known))]
+        if not len(new_hours):
+            return 0
+
+        # Calculate the supply-based and consumption-based EF of the new hours only
+        supplybased_ef, total_output_df = calculate_supply_based_ef(
+            transformed_gen_data[np.isin(hours["generator"], new_hours)], self.emission_rates
+        )
+        consumption_based_ef, spot_check_df = calculate_consumption_based_ef(
+            supplybased_ef, self.demand[np.isin(hours["demand"], new_hours)],
+            self.trade_flow[np.isin(hours["trade_flow"], new_hours)], self.neighboring_emission_factors,
+            total_output_df, self.neighbor_series
+        )
+        self._append(supplybased_ef, consumption_based_ef, total_output_df, spot_check_df)
+
+        # Forget the rows written, keeping generator days that are not complete yet
+        self.last_hour = int(new_hours[-1])
+        self.demand = self.demand[hours["demand"] > self.last_hour]
+        self.trade_flow = self.trade_flow[hours["trade_flow"] > self.last_hour]
+        for path, rows in self.generator_rows.items():
+            days = (pd.to_datetime(rows["Delivery Date"]) - pd.Timestamp(self.year, 1, 1)).dt.days.to_numpy()
+            self.generator_rows[path] = rows[days * 24 + 23 > self.last_hour]
+        return len(new_hours)
+
+    def _append(self, supplybased_ef, consumption_based_ef, total_output_df, spot_check_df):
+        """Append the hours computed by ``poll`` to every output of the year."""
+        append_outputs(self.year, supplybased_ef, consumption_based_ef, total_output_df, spot_check_df, self.output_dir,
+                       self.store_path, self.result_formats)
+
+    def run(self, poll_seconds=DEFAULT_POLL_SECONDS, download=False, polls=None):
+        """
+        Poll the reports every ``poll_seconds`` until interrupted (or ``polls`` times).
+
+        Args:
+            poll_seconds (float): Seconds between polls.
+            download (bool): Revalidate the reports with IESO before each poll.
+            polls (int): Number of polls to run; unlimited when None.
+        """
+        count = 0
+        while polls is None or count < polls:
+            start_time = time.time()
+            if download:
+                download_year_files(self.year, data_dir=self.data_dir)
+            appended = self.poll()
+            if appended:
+                logger.info("Appended %d hours of %d in %.3f s (last hour: %s).", appended, self.year,
+                            time.time() - start_time, pd.Timestamp(self.year, 1, 1) + pd.Timedelta(hours=self.last_hour))
+            count += 1
+            if polls is None or count < polls:
+                time.sleep(poll_seconds)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Compute consumption-based emission factors for every IESO transmission zone.
+
+Each zone is balanced like the province in ``calculate_consumption_based_ef``: the
+output of its generators, less its intertie exports, plus its intertie imports, against
+its demand. A zone with surplus supply sends it to an Ontario-wide pool at the
+supply-based EF of its generators; zones short of supply draw from that pool, at most
+the pooled surplus, at the pool's EF. With a single zone this reduces exactly to the
+province-wide consumption-based EF.
+
+All zones are computed at once from (hours x zones) matrices. The inputs are:
+
+* ``PUB_DemandZonal_<year>.csv``, downloaded from IESO to ``data/IESO/<year>/Demand/``.
+  Its zone columns (e.g. ``Northwest``, ``Toronto``) name the zones.
+* ``data/zones/generator_zones.csv``: ``Generator,Zone`` with one row per generator of
+  the ``PUB_GenOutputCapabilityMonth`` reports. IESO does not publish this table.
+* ``data/zones/intertie_zones.csv``: ``Intertie,Zone`` with one row per intertie, named
+  by the first word of its flow column (``MANITOBA``, ``MICHIGAN``, ``MINNESOTA``,
+  ``NEW-YORK``, ``QUEBEC``).
+
+Example:
+    python src/zonal_ef.py --years 2022-2024
+"""
+
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .pipeline import (
+    IESO_DATA_DIR, IESO_REPORTS_URL, OUTPUT_DIR, align_on_timesteps, download_files, get_emission_rates,
+    get_neighboring_emission_factors, intertie_emission_factors, map_generator_technologies, parse_years,
+    prepare_year_data, timestep_keys, timestep_starts
+)
+from .neighbor_factors import NeighborFactorSeries
+
+
+ZONES_DIR = os.path.join("data", "zones")
+GENERATOR_ZONES_PATH = os.path.join(ZONES_DIR, "generator_zones.csv")
+INTERTIE_ZONES_PATH = os.path.join(ZONES_DIR, "intertie_zones.csv")
+
+# Columns of the zonal demand report that are not zones
+NON_ZONE_COLUMNS = ["Date", "Hour", "Ontario Demand", "Zone Total", "Diff"]
+
+
+### 1. Inputs
+def zonal_demand_file(year, data_dir=None):
+    """Return the ``(url, local path)`` of the zonal demand report of ``year``."""
+    file_name = f"PUB_DemandZonal_{year}.csv"
+    return (f"{IESO_REPORTS_URL}DemandZonal/{file_name}",
+            os.path.join(data_dir or IESO_DATA_DIR, str(year), "Demand", file_name))
+
+def parse_zonal_demand(file_path):
+    """
+    Parse a ``PUB_DemandZonal`` report.
+
+    Returns:
+        pd.DataFrame: ``Date``, ``Hour`` and the demand of every zone in MWh.
+    """
+    with open(file_path, 'r') as file:
+        lines = [line for line in file if '\\' not in line]
+    raw_df = pd.read_csv(io.StringIO("".join(lines)))
+    raw_df.columns = [str(col).strip() for col in raw_df.columns]
+
+    zones = [col for col in raw_df.columns if col not in NON_ZONE_COLUMNS]
+    zonal_df = raw_df[["Date", "Hour"]].copy()
+    zonal_df[zones] = raw_df[zones].apply(pd.to_numeric, errors="coerce").fillna(0)
+    return zonal_df
+
+def load_zone_mapping(path, key_column):
+    """
+    Load a ``<key_column>,Zone`` mapping CSV.
+
+    Returns:
+        dict: Maps each upper-case key to its zone.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(
+            f"Zone mapping not found at {path}. Create it with '{key_column},Zone' columns and one row per "
+            f"{key_column.lower()}, using the zone names of the PUB_DemandZonal report columns "
+            "(see the docstring of ontario_ef.zonal)."
+        )
+
+    df = pd.read_csv(path)
+    if key_column not in df.columns or "Zone" not in df.columns:
+        raise ValueError(f"Zone mapping {path} must have '{key_column}' and 'Zone' columns.")
+    return dict(zip(df[key_column].astype(str).str.strip().str.upper(), df["Zone"].astype(str).str.strip()))
+
+def zone_membership(names, mapping, zones, kind):
+    """
+    Build the (names x zones) membership matrix of generators or interties.
+
+    Raises:
+        ValueError: If a name has no zone, or a zone is not a column of the zonal demand.
+    """
+    keys = [str(name).upper() for name in names]
+    missing = sorted({key for key in keys if key not in mapping})
+    if missing:
+        raise ValueError(f"No zone for {len(missing)} {kind}s ({', '.join(missing[:5])}{', ...' if len(missing) > 5 else ''}); "
+                         f"add them to the {kind} zone mapping.")
+    unknown = sorted({mapping[key] for key in keys} - set(zones))
+    if unknown:
+        raise ValueError(f"Zones {unknown} of the {kind} zone mapping are not in the zonal demand report {zones}.")
+
+    membership = np.zeros((len(keys), len(zones)))
+    membership[np.arange(len(keys)), [zones.index(mapping[key]) for key in keys]] = 1.0
+    return membership
+
+
+### 2. Zonal emission factors
+def zonal_ef_from_arrays(gen_output_mwh, generator_rates, generator_zones, zonal_demand_mwh, flows_mwh, intertie_factors,
+                         intertie_zones):
+    """
+    Calculate the consumption-based EF of every zone and timestep.
+
+    Args:
+        gen_output_mwh (np.ndarray): (timesteps x generators) output.
+        generator_rates (np.ndarray): Emission rate of each generator in t CO2e/MWh.
+        generator_zones (np.ndarray): (generators x zones) membership matrix.
+        zonal_demand_mwh (np.ndarray): (timesteps x zones) demand.
+        flows_mwh (np.ndarray): (timesteps x interties) flows, positive for exports.
+        intertie_factors (np.ndarray): Emission factor of each intertie in t CO2e/MWh, or a
+            (timesteps x interties) matrix of factors that vary over time.
+        intertie_zones (np.ndarray): (interties x zones) membership matrix.
+
+    Returns:
+        np.ndarray: (timesteps x zones) consumption-based EF in g CO2e/kWh, 0 without demand.
+        np.ndarray: (timesteps x zones) supply-based EF of the generators of each zone in g CO2e/kWh.
+    """
+    # Output and emissions of the generators of each zone, in one product
+    zones = generator_zones.shape[1]
+    output_and_emissions = gen_output_mwh @ np.hstack([generator_zones, generator_zones * generator_rates[:, None]])
+    output_mwh, emissions_t_co2e = output_and_emissions[:, :zones], output_and_emissions[:, zones:]
+    supply_ef_t_co2e_mwh = np.divide(emissions_t_co2e, output_mwh, out=np.zeros_like(emissions_t_co2e), where=output_mwh > 0)
+
+    # Intertie exports, imports and import emissions of each zone
+    exports_mwh = np.where(flows_mwh > 0, flows_mwh, 0)
+    imports_mwh = np.where(flows_mwh < 0, -flows_mwh, 0)
+    zonal_exports_mwh = exports_mwh @ intertie_zones
+    zonal_imports_mwh = imports_mwh @ intertie_zones
+    zonal_import_emissions_t_co2e = (imports_mwh * intertie_factors) @ intertie_zones
+
+    # Surplus supply is pooled at the supply-based EF of its zone; deficits draw from the pool
+    balance_difference_mwh = output_mwh - zonal_exports_mwh + zonal_imports_mwh - zonal_demand_mwh
+    surplus_mwh = np.maximum(balance_difference_mwh, 0)
+    deficit_mwh = np.maximum(-balance_difference_mwh, 0)
+    pool_supply_mwh = surplus_mwh.sum(axis=1)
+    pool_demand_mwh = deficit_mwh.sum(axis=1)
+    pool_ef_t_co2e_mwh = np.divide((surplus_mwh * supply_ef_t_co2e_mwh).sum(axis=1), pool_supply_mwh,
+                                   out=np.zeros_like(pool_supply_mwh), where=pool_supply_mwh > 0)
+    drawn_share = np.minimum(np.divide(pool_supply_mwh, pool_demand_mwh, out=np.zeros_like(pool_demand_mwh), where=pool_demand_mwh > 0), 1)
+    drawn_mwh = deficit_mwh * drawn_share[:, None]
+
+    consumption_emissions_t_co2e = (
+        supply_ef_t_co2e_mwh * (output_mwh - zonal_exports_mwh - surplus_mwh) +
+        zonal_import_emissions_t_co2e +
+        pool_ef_t_co2e_mwh[:, None] * drawn_mwh
+    )
+    consumption_ef_t_co2e_mwh = np.divide(
+        consumption_emissions_t_co2e, zonal_demand_mwh,
+        out=np.zeros_like(consumption_emissions_t_co2e), where=zonal_demand_mwh > 0
+    )
+
+    # Convert EF to g CO2e/kWh for publishing
+    return consumption_ef_t_co2e_mwh * 1000, supply_ef_t_co2e_mwh * 1000
+
+def calculate_zonal_ef(transformed_gen_data, zonal_demand_df, transformed_trade_flow, emission_rates, neighboring_emission_factors,
+                       generator_zone_map, intertie_zone_map, neighbor_series=None):
+    """
+    Calculate the consumption-based EF of every zone for each timestep.
+
+    Args:
+        transformed_gen_data (pd.DataFrame): Hourly output per Fuel-Generator column.
+        zonal_demand_df (pd.DataFrame): Output of ``parse_zonal_demand``.
+        transformed_trade_flow (pd.DataFrame): Preprocessed trade flow data.
+        emission_rates (dict): Emission rates per technology in t CO2e/MWh.
+        neighboring_emission_factors (dict): Emission factors per region in t CO2e/MWh.
+        generator_zone_map (dict): Zone of each generator, from ``load_zone_mapping``.
+        intertie_zone_map (dict): Zone of each intertie, from ``load_zone_mapping``.
+        neighbor_series (NeighborFactorSeries): Time-varying factors of the neighboring regions.
+
+    Returns:
+        pd.DataFrame: ``Delivery Date``, ``Hour`` and a ``<Zone> EF (g CO2e/kWh)`` column per zone.
+
+    Raises:
+        MisalignedTimestepsError: If the inputs do not cover the same timesteps.
+    """
+    timesteps = transformed_gen_data[["Delivery Date", "Hour"]].reset_index(drop=True)
+    keys = timestep_keys(timesteps, "Delivery Date")
+    aligned = align_on_timesteps(keys, {
+        "zonal_demand_df": (zonal_demand_df, "Date"),
+        "transformed_trade_flow": (transformed_trade_flow, "Date"),
+    })
+    zones = [col for col in zonal_demand_df.columns if col not in NON_ZONE_COLUMNS]
+
+    # Generators: output, emission rate and zone
+    generator_columns = transformed_gen_data.columns[2:]
+    technologies, membership = map_generator_technologies(generator_columns)
+    generator_rates = membership @ np.array([emission_rates[tech] for tech in technologies], dtype=np.float64)
+    generator_zones = zone_membership([str(col).split(" - ", 1)[-1] for col in generator_columns], generator_zone_map, zones, "generator")
+    gen_output = np.nan_to_num(transformed_gen_data[generator_columns].to_numpy(dtype=np.float64))
+
+    # Interties: flows, emission factor and zone
+    trade_flow = aligned["transformed_trade_flow"]
+    flow_columns = [col for col in trade_flow.columns if col not in ["Date", "Hour"]]
+    intertie_factors = intertie_emission_factors(flow_columns, neighboring_emission_factors)
+    if neighbor_series is not None:
+        intertie_factors = neighbor_series.factor_matrix(timestep_starts(keys), flow_columns, intertie_factors)
+    intertie_zones = zone_membership([col.split(" ")[0] for col in flow_columns], intertie_zone_map, zones, "intertie")
+    flows = trade_flow[flow_columns].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+    zonal_demand = aligned["zonal_demand_df"][zones].to_numpy(dtype=np.float64)
+    zonal_ef, _ = zonal_ef_from_arrays(gen_output, generator_rates, generator_zones, zonal_demand, flows, intertie_factors, intertie_zones)
+    return pd.concat([timesteps, pd.DataFrame(zonal_ef, columns=[f"{zone} EF (g CO2e/kWh)" for zone in zones])], axis=1)
+
+
+### 3. Command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute hourly consumption-based EFs for every IESO transmission zone.")
+    parser.add_argument("--years", type=parse_years, required=True, help="Years to compute, e.g. 2022 or 2020-2024.")
+    parser.add_argument("--generator-zones", default=GENERATOR_ZONES_PATH, help="Generator,Zone mapping CSV.")
+    parser.add_argument("--intertie-zones", default=INTERTIE_ZONES_PATH, help="Intertie,Zone mapping CSV.")
+    parser.add_argument("--neighbor-series", help="CSV or Parquet file of hourly or monthly neighboring region factors.")
+    parser.add_argument("--max-gap-hours", type=float, default=None, help="Longest time a series factor is carried forward.")
+    parser.add_argument("--out", default=OUTPUT_DIR, help="Output directory.")
+    args = parser.parse_args(argv)
+
+    # Check the mappings before downloading or parsing anything
+    generator_zone_map = load_zone_mapping(args.generator_zones, "Generator")
+    intertie_zone_map = load_zone_mapping(args.intertie_zones, "Intertie")
+    emission_rates = get_emission_rates(False)
+    neighboring_emission_factors = get_neighboring_emission_factors(False)
+    neighbor_series = NeighborFactorSeries.from_file(args.neighbor_series, args.max_gap_hours) if args.neighbor_series else None
+
+    os.makedirs(args.out, exist_ok=True)
+    for year in args.years:
+        transformed_gen_data, _, transformed_trade_flow = prepare_year_data(year)
+        [zonal_demand_path] = download_files([zonal_demand_file(year)])
+        zonal_demand_df = parse_zonal_demand(zonal_demand_path)
+
+        start_time = time.time()
+        zonal_ef = calculate_zonal_ef(transformed_gen_data, zonal_demand_df, transformed_trade_flow, emission_rates,
+                                      neighboring_emission_factors, generator_zone_map, intertie_zone_map, neighbor_series)
+        print(f"Computed {zonal_ef.shape[1] - 2} zones x {len(zonal_ef):,} hours of {year} in {time.time() - start_time:.2f} s.")
+
+        output_path = os.path.join(args.out, f"Zonal_Consumption-based_EF_{year}.csv")
+        zonal_ef.to_csv(output_path, index=False)
+        print(f"Zonal consumption-based EF data saved to: {output_path}")
+    return 0
@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Command line entry point of the scenario evaluation.
+
+The implementation lives in ``ontario_ef.scenarios``; see its docstring for the method.
+
+Example:
+    python src/scenarios.py 2022 --sample 10000 --spread 0.25 --out data/output/scenarios
+"""
+
+import sys
+
+from ontario_ef.scenarios import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Command line entry point of the Scope 2 calculator.
+
+The calculator lives in ``ontario_ef.scope2``; see its docstring for the load profile layouts.
+
+Example:
+    python src/scope2_calculator.py meters.csv --format long --meter-col meter_id \
+        --time-col timestamp --value-col kwh --out data/output/scope2
+"""
+
+import sys
+
+from ontario_ef.scope2 import main
+
+if __name__ == "__main__":
+    sys.exit(main())
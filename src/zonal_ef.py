@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Command line entry point of the zonal emission factors.
+
+The implementation lives in ``ontario_ef.zonal``; see its docstring for the inputs.
+
+Example:
+    python src/zonal_ef.py --years 2022-2024
+"""
+
+import sys
+
+from ontario_ef.zonal import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Shared fixtures: a small year of IESO reports trimmed from the bundled 2020 reports."""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+FIXTURE_YEAR = 2020
+# Days of each month kept in the fixture reports
+FIXTURE_DAYS = ("01", "02")
+
+BASELINE_PATH = os.path.join(ROOT, "tests", "data", f"baseline_{FIXTURE_YEAR}.csv")
+
+RATES = {"Biofuel": 0.00615, "Hydro": 0.0, "Natural Gas": 0.525, "Nuclear": 0.00015, "Solar": 0.00615, "Wind": 0.00074}
+NEIGHBORS = {"Manitoba": 0.0022, "Michigan": 0.502, "Minnesota": 0.463, "New York": 0.211, "Quebec": 0.0017}
+
+
+def consumption_ef_frame(start, days, first_value):
+    """Consumption-based EFs of every hour of ``days`` days from ``start``, counting up from ``first_value``."""
+    dates = pd.date_range(start, periods=days, freq="D").strftime("%Y-%m-%d")
+    frame = pd.DataFrame({"Delivery Date": np.repeat(dates, 24), "Hour": np.tile(np.arange(1, 25), days)})
+    frame["Consumption-based EF (g CO2e/kWh)"] = first_value + np.arange(len(frame), dtype=np.float64)
+    return frame
+
+
+def trim_report(source, destination):
+    """Copy the preamble and header rows of ``source``, and the data rows of the ``FIXTURE_DAYS`` of each month."""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with open(source) as src, open(destination, "w") as dst:
+        for line in src:
+            if not line[:1].isdigit() or line[8:10] in FIXTURE_DAYS:
+                dst.write(line)
+
+
+def build_fixture_reports(data_dir):
+    """Write the trimmed reports of ``FIXTURE_YEAR`` under ``data_dir`` in the layout of ``data/IESO``."""
+    source_dir = os.path.join(ROOT, "data", "IESO", str(FIXTURE_YEAR))
+    for sub_dir in ("Generator", "Demand", "Trade"):
+        for file_name in sorted(os.listdir(os.path.join(source_dir, sub_dir))):
+            if file_name.endswith(".csv"):
+                trim_report(os.path.join(source_dir, sub_dir, file_name), os.path.join(data_dir, str(FIXTURE_YEAR), sub_dir, file_name))
+    return data_dir
+
+
+@pytest.fixture(scope="session")
+def fixture_data_dir(tmp_path_factory):
+    """Directory of the trimmed reports, shared by the whole session; tests must not modify it."""
+    return build_fixture_reports(str(tmp_path_factory.mktemp("IESO")))
+
+
+@pytest.fixture(scope="session")
+def year_data(fixture_data_dir):
+    """``prepare_year_data`` of the fixture reports: generator output, demand and trade flow; tests must not modify them."""
+    from ontario_ef.pipeline import prepare_year_data
+
+    return prepare_year_data(FIXTURE_YEAR, data_dir=fixture_data_dir, download=False)
+
+
+@pytest.fixture
+def fixture_workdir(tmp_path, monkeypatch):
+    """Working directory with its own copy of the trimmed reports in ``data/IESO``, for the functions using relative paths."""
+    build_fixture_reports(str(tmp_path / "data" / "IESO"))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    """Hourly results of the original code on the fixture reports (see ``tests/data``)."""
+    return pd.read_csv(BASELINE_PATH, dtype={"Delivery Date": str})
+
+
+def assert_matches_baseline(frame, baseline, columns):
+    assert frame["Delivery Date"].astype(str).tolist() == baseline["Delivery Date"].tolist()
+    assert frame["Hour"].astype(int).tolist() == baseline["Hour"].tolist()
+    for column in columns:
+        np.testing.assert_allclose(frame[column].to_numpy(dtype=np.float64), baseline[column].to_numpy(), rtol=1e-12, atol=1e-9,
+                                   err_msg=column)
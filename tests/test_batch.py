@@ -0,0 +1,59 @@
+"""The non-interactive batch mode over several years."""
+
+import argparse
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES
+
+from ontario_ef import pipeline
+from ontario_ef.pipeline import consumption_ef_path, main, parse_years, run_years
+
+
+@pytest.mark.parametrize("spec, years", [
+    ("2020", [2020]), ("2020-2022", [2020, 2021, 2022]), ("2023, 2020-2021,2021", [2020, 2021, 2023]),
+])
+def test_year_selections(spec, years):
+    assert parse_years(spec) == years
+
+
+@pytest.mark.parametrize("spec", ["2020-21x", "twenty", "2022-2020"])
+def test_invalid_year_selections(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_years(spec)
+
+
+@pytest.fixture
+def local_reports(fixture_workdir, monkeypatch):
+    """Working directory with the fixture reports and factor files, where years are computed without downloading."""
+    monkeypatch.setattr(pipeline, "download_year_files", lambda year, **kwargs: [])
+    pd.DataFrame({"Technology": list(RATES), "Emission Rate (t CO2e/GWh)": [rate * 1000 for rate in RATES.values()]}).to_csv(
+        os.path.join("data", "emission_rates.csv"), index=False)
+    pd.DataFrame({"Region": list(NEIGHBORS), "Emission Factor (t CO2e/GWh)": [factor * 1000 for factor in NEIGHBORS.values()]}).to_csv(
+        os.path.join("data", "neighboring_emission_factors.csv"), index=False)
+    return fixture_workdir
+
+
+def test_a_failed_year_does_not_stop_the_others(local_reports, tmp_path):
+    output_dir = str(tmp_path / "output")
+
+    statuses = run_years([FIXTURE_YEAR + 1, FIXTURE_YEAR], RATES, NEIGHBORS, jobs=1, store_path=None, result_formats=(),
+                         output_dir=output_dir)
+
+    assert statuses[FIXTURE_YEAR][0] == "written"
+    assert statuses[FIXTURE_YEAR + 1][0].startswith("failed: ")
+    assert os.path.exists(consumption_ef_path(output_dir, FIXTURE_YEAR))
+    assert run_years([FIXTURE_YEAR], RATES, NEIGHBORS, jobs=1, store_path=None, result_formats=(),
+                     output_dir=output_dir)[FIXTURE_YEAR][0] == "skipped"
+
+
+def test_exit_code_reports_failed_years(local_reports, capsys):
+    options = ["--jobs", "1", "--no-store", "--no-cache", "--results-formats", "--quiet"]
+
+    assert main(["--years", str(FIXTURE_YEAR), *options]) == 0
+    assert main(["--years", f"{FIXTURE_YEAR}-{FIXTURE_YEAR + 1}", *options]) == 1
+    summary = capsys.readouterr().out.splitlines()
+    assert summary[-3].startswith(str(FIXTURE_YEAR)) and summary[-3].endswith("skipped")
+    assert summary[-2].startswith(str(FIXTURE_YEAR + 1)) and "failed" in summary[-2]
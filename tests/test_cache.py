@@ -0,0 +1,94 @@
+"""Invalidation of the parsed data cache and of the memoized stages of a year."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES
+
+from ontario_ef import pipeline
+from ontario_ef.ieso_cache import ParsedDataCache
+from ontario_ef.pipeline import YearStages, consumption_ef_path, run_year
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParsedDataCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def count_generator_loads(monkeypatch):
+    """Count the loads of the transformed generator data, the stage every factor-only change should skip."""
+    calls = []
+    load = pipeline.load_transformed_generator_data
+
+    def counting_load(*args, **kwargs):
+        calls.append(args[0])
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "load_transformed_generator_data", counting_load)
+    return calls
+
+
+def test_entry_is_rebuilt_when_its_source_or_params_change(cache, tmp_path):
+    source = tmp_path / "report.csv"
+    source.write_text("a\n1\n")
+    builds = []
+
+    def build():
+        builds.append(1)
+        return pd.DataFrame({"a": [len(builds)]})
+
+    cache.load_or_build("entry", [str(source)], build, params={"rate": 1})
+    cache.load_or_build("entry", [str(source)], build, params={"rate": 1})
+    assert len(builds) == 1
+
+    cache.load_or_build("entry", [str(source)], build, params={"rate": 2})
+    assert len(builds) == 2
+
+    source.write_text("a\n2\n")
+    assert cache.load_or_build("entry", [str(source)], build, params={"rate": 2})["a"].tolist() == [3]
+
+    # Only the latest entry of a name is kept
+    assert len([name for name in os.listdir(cache.cache_dir) if name.startswith("entry-")]) == 1
+
+
+def test_factor_change_recomputes_only_the_ef_stages(fixture_data_dir, cache, count_generator_loads):
+    YearStages(FIXTURE_YEAR, cache, data_dir=fixture_data_dir).consumption_ef(RATES, NEIGHBORS)
+    assert count_generator_loads == [FIXTURE_YEAR]
+
+    rates = {**RATES, "Natural Gas": 0.4}
+    cached = YearStages(FIXTURE_YEAR, cache, data_dir=fixture_data_dir).consumption_ef(rates, NEIGHBORS)
+    assert count_generator_loads == [FIXTURE_YEAR]
+
+    fresh = YearStages(FIXTURE_YEAR, data_dir=fixture_data_dir).consumption_ef(rates, NEIGHBORS)
+    for cached_frame, fresh_frame in zip(cached, fresh):
+        pd.testing.assert_frame_equal(cached_frame.reset_index(drop=True), fresh_frame.reset_index(drop=True), check_dtype=False)
+
+
+def test_output_key_follows_factors_and_reports(fixture_workdir, cache):
+    stages = YearStages(FIXTURE_YEAR, cache)
+    output_path = str(fixture_workdir / "output.csv")
+    open(output_path, "w").close()
+    stages.record_output(output_path, RATES, NEIGHBORS)
+
+    assert stages.output_is_current(output_path, RATES, NEIGHBORS)
+    assert not stages.output_is_current(output_path, RATES, {**NEIGHBORS, "Michigan": 0.4})
+
+    with open(stages.all_paths[-1], "a") as f:
+        f.write(f"{FIXTURE_YEAR}-12-31,24,0,0,0\n")
+    assert not stages.output_is_current(output_path, RATES, NEIGHBORS)
+
+
+def test_run_year_skips_unchanged_outputs_and_recomputes_changed_ones(fixture_workdir, cache):
+    options = dict(cache=cache, store_path=None, result_formats=[])
+    path = run_year(FIXTURE_YEAR, RATES, NEIGHBORS, **options)
+    assert path == consumption_ef_path(pipeline.OUTPUT_DIR, FIXTURE_YEAR)
+    first = pd.read_csv(path)
+
+    assert run_year(FIXTURE_YEAR, RATES, NEIGHBORS, **options) is None
+
+    assert run_year(FIXTURE_YEAR, {**RATES, "Natural Gas": 0.4}, NEIGHBORS, **options) == path
+    changed = pd.read_csv(path)
+    assert (changed.iloc[:, 2] <= first.iloc[:, 2]).all() and (changed.iloc[:, 2] < first.iloc[:, 2]).any()
@@ -0,0 +1,42 @@
+"""Day-ahead forecast of the bundled 2024 reports, scored against the persistence forecast."""
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import NEIGHBORS, RATES, ROOT
+from ontario_ef.day_ahead import DayAheadForecaster, backtest
+
+DATA_DIR = os.path.join(ROOT, "data", "IESO")
+
+
+def test_forecast_beats_persistence():
+    first_date, last_date = pd.Timestamp("2024-11-01"), pd.Timestamp("2024-11-14")
+    forecaster = DayAheadForecaster.from_reports(first_date - pd.Timedelta(days=1), last_date, RATES, NEIGHBORS, data_dir=DATA_DIR)
+
+    scores = backtest(forecaster, first_date, last_date)
+
+    assert scores["Delivery Date"].tolist() == pd.date_range(first_date, last_date).strftime("%Y-%m-%d").tolist()
+    assert scores["Forecast MAE (g CO2e/kWh)"].mean() < 0.5 * scores["Persistence MAE (g CO2e/kWh)"].mean()
+
+
+def test_a_day_after_the_last_report_uses_its_latest_rows(tmp_path, caplog):
+    # Reports up to November 2024; December is not published yet
+    for sub_dir, file_name in [("Generator", "PUB_GenOutputCapabilityMonth_202411.csv"), ("Demand", "PUB_Demand_2024.csv"),
+                               ("Trade", "PUB_IntertieScheduleFlowYear_2024.csv")]:
+        os.makedirs(tmp_path / "2024" / sub_dir)
+        os.symlink(os.path.join(DATA_DIR, "2024", sub_dir, file_name), tmp_path / "2024" / sub_dir / file_name)
+
+    with caplog.at_level(logging.WARNING, logger="ontario_ef"):
+        forecaster = DayAheadForecaster.from_reports("2024-12-01", "2024-12-01", RATES, NEIGHBORS, data_dir=str(tmp_path))
+        forecast = forecaster.forecast("2024-12-01")
+
+    assert forecaster.dates[-1] == "2024-11-30"
+    assert "using the capability and forecast rows of 2024-11-30" in caplog.text
+    assert forecast["Delivery Date"].tolist() == ["2024-12-01"] * 24
+    ef = forecast["Consumption-based EF (g CO2e/kWh)"].to_numpy()
+    actual = forecaster.actual("2024-11-30")["Consumption-based EF (g CO2e/kWh)"].to_numpy()
+    assert np.isfinite(ef).all()
+    assert np.abs(ef - actual).mean() < 30
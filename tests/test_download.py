@@ -0,0 +1,136 @@
+"""Downloads from a local HTTP server: conditional GETs, incomplete transfers and retries."""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from ontario_ef.pipeline import download_file, download_files
+
+BODY = b"\\Created at 2025-01-05 00:00:00\n\\For December 2024\nDate,Hour,Ontario Demand\n2024-12-01,1,15000\n"
+LAST_MODIFIED = "Sun, 05 Jan 2025 00:00:00 GMT"
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    """Answer each GET with the next response queued for its path, and record the request headers."""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        status, headers, body = self.server.responses[self.path].pop(0)
+        if status == 200 and "ETag" in headers and self.headers.get("If-None-Match") == headers["ETag"]:
+            status, body = 304, b""
+        self.send_response(status)
+        headers = {"Content-Length": str(len(body)), **headers}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        # A shorter body than the Content-Length is a transfer cut short
+        self.wfile.write(body)
+        self.close_connection = int(headers["Content-Length"]) != len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ReportHandler)
+    server.responses = {}
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.startswith(".download-")]
+
+
+def test_a_download_keeps_its_validators(server, tmp_path):
+    server.responses["/report.csv"] = [(200, {"ETag": '"v1"', "Last-Modified": LAST_MODIFIED}, BODY)]
+    save_path = str(tmp_path / "2024" / "report.csv")
+
+    assert download_file(server.url + "/report.csv", save_path, backoff=0) == save_path
+
+    with open(save_path, "rb") as f:
+        assert f.read() == BODY
+    with open(save_path + ".etag") as f:
+        assert f.read() == '"v1"'
+    assert os.path.getmtime(save_path) == 1736035200
+    assert not leftovers(tmp_path / "2024")
+
+
+def test_an_unchanged_file_is_not_downloaded_again(server, tmp_path):
+    server.responses["/report.csv"] = [(200, {"ETag": '"v1"', "Last-Modified": LAST_MODIFIED}, BODY)] * 2
+    save_path = str(tmp_path / "report.csv")
+    download_file(server.url + "/report.csv", save_path, backoff=0)
+
+    download_file(server.url + "/report.csv", save_path, backoff=0)
+
+    _, headers = server.requests[-1]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+    with open(save_path, "rb") as f:
+        assert f.read() == BODY
+
+
+def test_an_incomplete_transfer_leaves_no_file(server, tmp_path):
+    server.responses["/report.csv"] = [(200, {"Content-Length": str(len(BODY))}, BODY[:20])]
+    save_path = str(tmp_path / "report.csv")
+
+    with pytest.raises(requests.RequestException):
+        download_file(server.url + "/report.csv", save_path, retries=0)
+
+    assert not os.path.exists(save_path)
+    assert not leftovers(tmp_path)
+
+
+def test_an_incomplete_transfer_keeps_the_previous_copy(server, tmp_path):
+    save_path = str(tmp_path / "report.csv")
+    with open(save_path, "wb") as f:
+        f.write(b"previous")
+    server.responses["/report.csv"] = [(200, {"Content-Length": str(len(BODY))}, BODY[:20])]
+
+    download_file(server.url + "/report.csv", save_path, retries=0)
+
+    with open(save_path, "rb") as f:
+        assert f.read() == b"previous"
+    assert not leftovers(tmp_path)
+
+
+def test_server_errors_are_retried(server, tmp_path):
+    server.responses["/report.csv"] = [(503, {}, b""), (200, {"Content-Length": str(len(BODY))}, BODY[:20]), (200, {}, BODY)]
+    save_path = str(tmp_path / "report.csv")
+
+    download_file(server.url + "/report.csv", save_path, retries=2, backoff=0)
+
+    assert len(server.requests) == 3
+    with open(save_path, "rb") as f:
+        assert f.read() == BODY
+
+
+def test_client_errors_are_not_retried(server, tmp_path):
+    server.responses["/report.csv"] = [(404, {}, b""), (200, {}, BODY)]
+
+    with pytest.raises(requests.HTTPError):
+        download_file(server.url + "/report.csv", str(tmp_path / "report.csv"), retries=2, backoff=0)
+
+    assert len(server.requests) == 1
+
+
+def test_complete_reports_are_not_revalidated(server, tmp_path):
+    complete_path = str(tmp_path / "complete.csv")
+    with open(complete_path, "wb") as f:
+        f.write(BODY)
+    server.responses["/current.csv"] = [(200, {}, BODY)]
+    files = [(server.url + "/complete.csv", complete_path), (server.url + "/current.csv", str(tmp_path / "current.csv"))]
+
+    assert download_files(files, max_workers=2) == [path for _, path in files]
+
+    assert [path for path, _ in server.requests] == ["/current.csv"]
+    assert os.path.exists(tmp_path / "current.csv")
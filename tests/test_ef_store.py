@@ -0,0 +1,53 @@
+"""Round trip of hourly results through the memory-mapped store."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES
+
+from ontario_ef.ef_store import STORE_COLUMNS, HourlyEFStore, year_frame
+from ontario_ef.pipeline import YearStages
+
+
+@pytest.fixture(scope="module")
+def hourly(fixture_data_dir):
+    return year_frame(*YearStages(FIXTURE_YEAR, data_dir=fixture_data_dir).consumption_ef(RATES, NEIGHBORS))
+
+
+def test_written_hours_read_back_unchanged(tmp_path, hourly):
+    store = HourlyEFStore(str(tmp_path / "hourly.efstore"), writable=True)
+    store.write(hourly)
+
+    reopened = HourlyEFStore(str(tmp_path / "hourly.efstore"))
+    values = reopened.range(f"{FIXTURE_YEAR}-01-01", f"{FIXTURE_YEAR + 1}-01-01")
+    hour_starts = pd.to_datetime(hourly["Delivery Date"]) + pd.to_timedelta(hourly["Hour"] - 1, unit="h")
+    written = values.loc[hour_starts.to_numpy()]
+    for name in STORE_COLUMNS:
+        np.testing.assert_array_equal(written[name].to_numpy(), hourly[name].to_numpy(dtype=np.float64))
+
+    # Hours between the fixture days were never written
+    assert values["consumption_ef"].isna().sum() == len(values) - len(hourly)
+    assert reopened.lookup(f"{FIXTURE_YEAR}-01-01 00:30", "consumption_ef") == hourly["consumption_ef"].iloc[0]
+
+
+def test_aggregates_skip_unwritten_hours(tmp_path, hourly):
+    store = HourlyEFStore(str(tmp_path / "hourly.efstore"), writable=True)
+    store.write(hourly)
+
+    months = pd.to_datetime(hourly["Delivery Date"]).dt.month
+    expected = hourly.groupby(months)["consumption_ef"].mean()
+    monthly = store.aggregate("month", "consumption_ef")
+    assert monthly.index.names == ["Year", "Month"]
+    np.testing.assert_allclose(monthly.to_numpy(), expected.to_numpy(), rtol=1e-12)
+
+    hour_of_day = store.aggregate("hour", "consumption_ef", how="max")
+    np.testing.assert_allclose(hour_of_day.to_numpy(), hourly.groupby("Hour")["consumption_ef"].max().to_numpy())
+
+
+@pytest.mark.parametrize("period, names", [("month", ["Year", "Month"]), ("year", ["Year"]), ("hour", ["Hour"])])
+def test_aggregate_of_an_empty_store_is_empty(tmp_path, period, names):
+    aggregated = HourlyEFStore(str(tmp_path / "empty.efstore"), writable=True).aggregate(period)
+
+    assert aggregated.empty
+    assert list(aggregated.index.names) == names
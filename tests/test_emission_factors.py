@@ -0,0 +1,19 @@
+"""The vectorized supply- and consumption-based EF against the output of the original row-by-row code."""
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES, assert_matches_baseline
+
+from ontario_ef.pipeline import calculate_consumption_based_ef, calculate_supply_based_ef, prepare_year_data
+
+
+def test_supply_and_consumption_ef_match_baseline(fixture_data_dir, baseline):
+    transformed_gen_data, demand_df, transformed_trade_flow = prepare_year_data(FIXTURE_YEAR, data_dir=fixture_data_dir, download=False)
+
+    supplybased_ef, total_output_df = calculate_supply_based_ef(transformed_gen_data, RATES)
+    consumption_based_ef, spot_check_df = calculate_consumption_based_ef(
+        supplybased_ef, demand_df, transformed_trade_flow, NEIGHBORS, total_output_df
+    )
+
+    assert_matches_baseline(supplybased_ef, baseline, ["Supply-based EF (g CO2e/kWh)"])
+    assert_matches_baseline(total_output_df, baseline, ["Total Output"])
+    assert_matches_baseline(consumption_based_ef, baseline, ["Consumption-based EF (g CO2e/kWh)"])
+    assert_matches_baseline(spot_check_df, baseline, ["Total Exports (MWh)", "Total Imports (MWh)", "Total Import Emissions (t CO2e)"])
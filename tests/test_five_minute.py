@@ -0,0 +1,54 @@
+"""5-minute emission factors against the hourly ones on reports holding hourly values."""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES
+
+from ontario_ef.five_minute import INTERVAL_COLUMNS, INTERVALS_PER_HOUR, calculate_five_minute_ef
+from ontario_ef.pipeline import calculate_consumption_based_ef, calculate_supply_based_ef, parse_and_clean_trade_flow, year_source_files
+
+
+def write_report(frame, data_dir, kind):
+    os.makedirs(os.path.join(data_dir, str(FIXTURE_YEAR), kind), exist_ok=True)
+    path = os.path.join(data_dir, str(FIXTURE_YEAR), kind, f"PUB_{kind}5Min_{FIXTURE_YEAR}.csv")
+    with open(path, "w") as f:
+        f.write("\\Hourly values repeated in every interval\n")
+        frame.to_csv(f, index=False)
+
+
+def by_interval(hourly):
+    """Repeat every hourly row for the 12 intervals of its hour."""
+    repeated = hourly.loc[hourly.index.repeat(INTERVALS_PER_HOUR)].reset_index(drop=True)
+    repeated.insert(2, "Interval", np.tile(np.arange(1, INTERVALS_PER_HOUR + 1), len(hourly)))
+    return repeated
+
+
+def test_constant_intervals_match_the_hourly_ef(year_data, fixture_data_dir, tmp_path):
+    transformed_gen_data, demand_df, transformed_trade_flow = year_data
+    data_dir = str(tmp_path)
+
+    # Generator rows of every hour, with the hourly output in each of the 12 intervals
+    generators = transformed_gen_data.melt(id_vars=["Delivery Date", "Hour"], var_name="Column", value_name="Output")
+    labels = generators["Column"].str.split(" - ", n=1, expand=True)
+    generator_report = pd.DataFrame({"Delivery Date": generators["Delivery Date"], "Hour": generators["Hour"],
+                                     "Generator": labels[1], "Fuel Type": labels[0]})
+    for column in INTERVAL_COLUMNS:
+        generator_report[column] = generators["Output"].to_numpy()
+    write_report(generator_report, data_dir, "Generator")
+    write_report(by_interval(demand_df.rename(columns={"Date": "Delivery Date"})), data_dir, "Demand")
+    _, _, (_, trade_path) = year_source_files(FIXTURE_YEAR, fixture_data_dir)
+    write_report(by_interval(parse_and_clean_trade_flow(trade_path).rename(columns={"Date": "Delivery Date"})), data_dir, "Trade")
+
+    five_minute = calculate_five_minute_ef(FIXTURE_YEAR, RATES, NEIGHBORS, data_dir=data_dir, memory_mb=64)
+
+    supplybased_ef, total_output_df = calculate_supply_based_ef(transformed_gen_data, RATES)
+    consumption_based_ef, _ = calculate_consumption_based_ef(supplybased_ef, demand_df, transformed_trade_flow, NEIGHBORS, total_output_df)
+    assert len(five_minute) == len(consumption_based_ef) * INTERVALS_PER_HOUR
+    assert five_minute["Interval"].tolist() == list(range(1, INTERVALS_PER_HOUR + 1)) * len(consumption_based_ef)
+    for column, hourly in (("Supply-based EF (g CO2e/kWh)", supplybased_ef), ("Consumption-based EF (g CO2e/kWh)", consumption_based_ef)):
+        expected = np.repeat(hourly[column].to_numpy(dtype=np.float64), INTERVALS_PER_HOUR)
+        np.testing.assert_allclose(five_minute[column].to_numpy(), expected, rtol=1e-9, err_msg=column)
+    assert (five_minute["Delivery Date"].to_numpy()[::INTERVALS_PER_HOUR] == consumption_based_ef["Delivery Date"].astype(str).to_numpy()).all()
@@ -0,0 +1,84 @@
+"""Stage records of the instrumentation and of an instrumented run."""
+
+import json
+import os
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES
+
+from ontario_ef.instrumentation import DISABLED, Instrumentation, JsonLinesSink
+from ontario_ef.pipeline import run_year
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_hold_the_counts_context_and_errors(tmp_path):
+    path = str(tmp_path / "stages.jsonl")
+    instrumentation = Instrumentation([JsonLinesSink(path)], run_id="test")
+
+    with instrumentation.stage("parse", year=2020) as stage:
+        stage.rows_in, stage.rows_out, stage.skipped_rows = 10, 8, 2
+        stage.extra["files"] = 1
+    with pytest.raises(KeyError):
+        with instrumentation.stage("write", year=2020):
+            raise KeyError("Hour")
+
+    parse, write = read_records(path)
+    assert {key: parse[key] for key in ("stage", "run_id", "year", "rows_in", "rows_out", "skipped_rows", "files", "pid")} == {
+        "stage": "parse", "run_id": "test", "year": 2020, "rows_in": 10, "rows_out": 8, "skipped_rows": 2, "files": 1, "pid": os.getpid(),
+    }
+    assert parse["duration_s"] >= 0 and "error" not in parse
+    assert parse["process_peak_rss_mb"] > 0 and parse["peak_rss_growth_mb"] >= 0
+    assert write["stage"] == "write" and write["error"] == "KeyError('Hour')"
+
+
+def test_tracemalloc_peak_covers_the_stage_allocations():
+    records = []
+    instrumentation = Instrumentation([records.append], profile="tracemalloc")
+
+    try:
+        with instrumentation.stage("transform"):
+            values = np.ones(4 * 1024 * 1024)
+        del values
+    finally:
+        # The first tracemalloc stage starts tracing for the rest of the process
+        tracemalloc.stop()
+
+    assert records[0]["traced_peak_mb"] >= 32
+
+
+def test_cprofile_writes_one_dump_per_stage(tmp_path):
+    records = []
+    instrumentation = Instrumentation([records.append], profile="cprofile", profile_dir=str(tmp_path))
+
+    with instrumentation.stage("supply_ef", year=2020):
+        sum(range(1000))
+
+    assert os.path.basename(records[0]["profile"]).startswith("supply_ef-2020-")
+    assert os.path.exists(records[0]["profile"])
+
+
+def test_disabled_instrumentation_ignores_the_counts():
+    with DISABLED.stage("parse", year=2020) as stage:
+        stage.rows_out = 10
+
+    assert not DISABLED.enabled and stage.extra == {}
+
+
+def test_a_run_records_every_stage(fixture_data_dir, tmp_path):
+    path = str(tmp_path / "stages.jsonl")
+
+    run_year(FIXTURE_YEAR, RATES, NEIGHBORS, store_path=None, instrumentation=Instrumentation([JsonLinesSink(path)]), result_formats=(),
+             output_dir=str(tmp_path / "output"), data_dir=fixture_data_dir, download=False)
+
+    records = read_records(path)
+    assert {record["stage"] for record in records} == {"parse", "transform", "supply_ef", "consumption_ef", "write"}
+    assert all(record["year"] == FIXTURE_YEAR and "error" not in record for record in records)
+    generator_parse = next(record for record in records if record["stage"] == "parse" and record["source"] == "generator")
+    assert generator_parse["rows_out"] > 0 and generator_parse["skipped_rows"] == 0
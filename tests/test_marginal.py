@@ -0,0 +1,50 @@
+"""Binned and rolling marginal emission factors on synthetic hourly series."""
+
+import numpy as np
+
+from ontario_ef.marginal import estimate_marginal_ef, hourly_deltas
+
+
+def synthetic_hours(days, seed=0):
+    """Hour starts of ``days`` (day numbers from 2022-01-01) with random demand and emissions."""
+    rng = np.random.default_rng(seed)
+    hour_starts = (np.datetime64("2022-01-01T00", "h") + (np.repeat(days, 24) * 24 + np.tile(np.arange(24), len(days))).astype("timedelta64[h]"))
+    demand = 15000 + rng.normal(0, 800, len(hour_starts))
+    emissions = 0.05 * demand + rng.normal(0, 20, len(hour_starts))
+    return hour_starts, emissions, demand
+
+
+def test_a_linear_response_gives_its_slope():
+    hour_starts, _, demand = synthetic_hours(np.arange(120))
+
+    by_season_hour, binned, rolling = estimate_marginal_ef(hour_starts, 0.4 * demand + 100, demand, window_days=14)
+
+    # 0.4 t CO2e/MWh is 400 g CO2e/kWh
+    winter = by_season_hour[by_season_hour["Season"] == "Winter"]
+    np.testing.assert_allclose(winter["Marginal EF (g CO2e/kWh)"], 400, rtol=1e-9)
+    np.testing.assert_allclose(binned, 400, rtol=1e-9)
+    np.testing.assert_allclose(rolling[np.isfinite(rolling)], 400, rtol=1e-9)
+
+
+def test_rolling_windows_cover_the_previous_calendar_days():
+    # Ten days are missing from the reports
+    days = np.concatenate([np.arange(0, 20), np.arange(30, 60)])
+    hour_starts, emissions, demand = synthetic_hours(days, seed=3)
+    window, min_observations = 7, 3
+
+    _, _, rolling = estimate_marginal_ef(hour_starts, emissions, demand, window_days=window, min_observations=min_observations)
+
+    delta_emissions, delta_demand, valid = hourly_deltas(hour_starts, emissions, demand)
+    day_of = hour_starts.astype("datetime64[D]").astype(np.int64)
+    hour_of = (hour_starts - hour_starts.astype("datetime64[D]")).astype(np.int64)
+    expected = np.full(len(hour_starts), np.nan)
+    for t in range(len(hour_starts)):
+        window_hours = valid & (hour_of == hour_of[t]) & (day_of >= day_of[t] - window) & (day_of < day_of[t])
+        if window_hours.sum() >= min_observations:
+            expected[t] = np.polyfit(delta_demand[window_hours], delta_emissions[window_hours], 1)[0] * 1000
+    np.testing.assert_allclose(rolling, expected, rtol=1e-6, atol=1e-9)
+
+    # Right after the gap, only the days within the window count: none on day 30, a few more each day after
+    after_gap = day_of == day_of[0] + 30
+    assert np.isnan(rolling[after_gap]).all()
+    assert np.isfinite(rolling[day_of == day_of[0] + 30 + min_observations]).any()
@@ -0,0 +1,55 @@
+"""Time-varying factors of the neighboring regions against the scalar factors."""
+
+import numpy as np
+import pandas as pd
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES, assert_matches_baseline
+
+from ontario_ef.neighbor_factors import FACTOR_COLUMN, NeighborFactorSeries
+from ontario_ef.pipeline import compute_year
+
+
+def write_series(path, rows):
+    pd.DataFrame(rows, columns=["Region", "Timestamp", FACTOR_COLUMN]).to_csv(path, index=False)
+    return str(path)
+
+
+def test_constant_series_match_the_scalar_factors(fixture_data_dir, tmp_path, baseline):
+    # Monthly factors equal to the scalar ones, in t CO2e/GWh
+    rows = [(region, f"{FIXTURE_YEAR}-{month:02d}-01", factor * 1000) for region, factor in NEIGHBORS.items() for month in range(1, 13)]
+    neighbor_series = NeighborFactorSeries.from_file(write_series(tmp_path / "series.csv", rows))
+
+    hourly = compute_year(FIXTURE_YEAR, RATES, NEIGHBORS, data_dir=fixture_data_dir, download=False, neighbor_series=neighbor_series)
+
+    assert_matches_baseline(hourly, baseline, list(baseline.columns[2:]))
+
+    # Factors doubled from the first hour on double the emissions of the imports
+    rows = [(region, f"{FIXTURE_YEAR}-01-01", factor * 2000) for region, factor in NEIGHBORS.items()]
+    neighbor_series = NeighborFactorSeries.from_file(write_series(tmp_path / "doubled.csv", rows))
+    hourly = compute_year(FIXTURE_YEAR, RATES, NEIGHBORS, data_dir=fixture_data_dir, download=False, neighbor_series=neighbor_series)
+    column = "Total Import Emissions (t CO2e)"
+    np.testing.assert_allclose(hourly[column], 2 * baseline[column], rtol=1e-12)
+
+
+def test_factors_are_carried_forward_up_to_the_gap_limit(tmp_path):
+    rows = [("New York", "2022-01-01 00:00", 200), ("New York", "2022-01-01 05:00", 300), ("New York", "2022-01-01 05:00", 400)]
+    path = write_series(tmp_path / "series.csv", rows)
+    hour_starts = np.datetime64("2021-12-31T23", "ns") + np.arange(9) * np.timedelta64(1, "h")
+
+    factors, fallback_hours = NeighborFactorSeries.from_file(path, max_gap_hours=2).factors("NEW", hour_starts, 0.1)
+
+    # The hour before the series, and hours 3-4 more than 2 hours after a factor, use the fallback
+    np.testing.assert_allclose(factors, [0.1, 0.2, 0.2, 0.2, 0.1, 0.1, 0.4, 0.4, 0.4])
+    assert fallback_hours == 3
+    unlimited, _ = NeighborFactorSeries.from_file(path).factors("NEW", hour_starts, 0.1)
+    np.testing.assert_allclose(unlimited, [0.1, 0.2, 0.2, 0.2, 0.2, 0.2, 0.4, 0.4, 0.4])
+
+
+def test_timezone_aware_timestamps_are_converted_to_est(tmp_path):
+    path = write_series(tmp_path / "series.csv", [("Michigan", "2022-07-01T05:00:00+00:00", 500)])
+    neighbor_series = NeighborFactorSeries.from_file(path)
+
+    factors, _ = neighbor_series.factors("MIC", np.array(["2022-06-30T23", "2022-07-01T00"], dtype="datetime64[ns]"), 0.0)
+
+    np.testing.assert_allclose(factors, [0.0, 0.5])
+    assert neighbor_series.fingerprint() != NeighborFactorSeries.from_file(path, max_gap_hours=24).fingerprint()
@@ -0,0 +1,65 @@
+"""The importable package API."""
+
+import os
+import subprocess
+import sys
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES, ROOT, assert_matches_baseline
+
+from ontario_ef import compute_year
+
+# Import time of ontario_ef.pipeline on top of pandas and numpy; about 3 ms when the stores,
+# the cache and the worker pools are imported where they are used, about 20 ms when they are not
+PIPELINE_IMPORT_LIMIT_US = 12_000
+
+# Modules that ``from ontario_ef import compute_year`` must leave to the functions using them
+DEFERRED_MODULES = (
+    "ontario_ef.ef_store", "ontario_ef.ieso_cache", "ontario_ef.neighbor_factors", "ontario_ef.results",
+    "concurrent.futures.process", "email.utils", "cProfile", "tracemalloc", "requests",
+)
+
+
+def run_python(code, *options):
+    """Run ``code`` in a fresh interpreter that imports from ``src``, and return the completed process."""
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, "src"))
+    # Cold starts read the cached bytecode, as they do after installation
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return subprocess.run([sys.executable, *options, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+
+def test_compute_year_matches_baseline(fixture_data_dir, baseline):
+    hourly = compute_year(FIXTURE_YEAR, RATES, NEIGHBORS, data_dir=fixture_data_dir, download=False)
+
+    assert_matches_baseline(hourly, baseline, list(baseline.columns[2:]))
+
+
+def test_import_loads_no_third_party_module():
+    code = "import sys, ontario_ef; from ontario_ef import DEFAULT_STORE_PATH, DEFAULT_CACHE_DIR, Instrumentation, JsonLinesSink; " \
+           "print(sorted({'pandas', 'numpy'} & set(sys.modules)))"
+
+    assert run_python(code).stdout.strip() == "[]"
+
+
+def test_compute_year_defers_stores_and_pools():
+    code = f"import sys; from ontario_ef import compute_year; print(sorted(set({DEFERRED_MODULES!r}) & set(sys.modules)))"
+
+    assert run_python(code).stdout.strip() == "[]"
+
+
+def test_pipeline_cold_start():
+    # -X importtime reports "import time: self [us] | cumulative [us] | module" on stderr; the
+    # first run writes the bytecode of edited modules, the second one is timed
+    code = "import numpy, pandas; import ontario_ef.pipeline"
+    run_python(code)
+    stderr = run_python(code, "-X", "importtime").stderr
+    cumulative = next(int(line.split("|")[1]) for line in stderr.splitlines() if line.endswith("| ontario_ef.pipeline"))
+
+    assert cumulative < PIPELINE_IMPORT_LIMIT_US
+
+
+def test_script_reexports_the_public_names_only():
+    import Ontario_EF_Code
+    from ontario_ef import pipeline
+
+    assert all(getattr(Ontario_EF_Code, name) is getattr(pipeline, name) for name in pipeline.__all__)
+    assert not {"pd", "np", "os", "logger", "DISABLED"} & set(vars(Ontario_EF_Code))
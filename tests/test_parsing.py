@@ -0,0 +1,86 @@
+"""Parsing of the generator reports, and their array-backed layout."""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import FIXTURE_YEAR
+
+from ontario_ef.ieso_cache import ParsedDataCache
+from ontario_ef.pipeline import (
+    HOUR_COLUMNS, GeneratorOutput, aggregate_transformed_generator_data, parse_and_clean_generator_month, parse_generator_rows,
+    year_source_files
+)
+
+
+def generator_row(generator, hours, trailing=","):
+    return f"2020-01-01,{generator},GAS,Output,{','.join(hours)}{trailing}"
+
+
+def test_blank_cells_are_nan_and_malformed_rows_are_skipped():
+    hours = [str(hour) for hour in range(1, 25)]
+    rows = [
+        generator_row("FULL", hours),
+        generator_row("BLANKS", [" "] + hours[1:23] + [" "]),
+        "Delivery Date,Generator,Fuel Type,Measurement," + ",".join(HOUR_COLUMNS),
+        generator_row("SHORT", hours[:12]),
+        generator_row("EXTRA", hours, ",1,"),
+    ]
+
+    raw_df = parse_generator_rows("\n".join(rows).encode())
+
+    assert raw_df["Generator"].astype(str).tolist() == ["FULL", "BLANKS"]
+    assert raw_df.attrs["skipped_rows"] == 2
+    assert all(raw_df[col].dtype == np.float32 for col in HOUR_COLUMNS)
+    np.testing.assert_array_equal(raw_df.loc[0, HOUR_COLUMNS].to_numpy(dtype=np.float64), np.arange(1, 25))
+    assert np.isnan(raw_df.loc[1, "Hour 1"]) and np.isnan(raw_df.loc[1, "Hour 24"]) and raw_df.loc[1, "Hour 2"] == 2
+
+
+def test_non_numeric_hours_fall_back_to_nan():
+    hours = [str(hour) for hour in range(1, 25)]
+    raw_df = parse_generator_rows(generator_row("TEXT", hours[:5] + ["n/a"] + hours[6:]).encode())
+
+    assert np.isnan(raw_df.loc[0, "Hour 6"]) and raw_df.loc[0, "Hour 7"] == 7
+
+
+def test_parallel_months_match_serial_months(fixture_data_dir, tmp_path):
+    serial = aggregate_transformed_generator_data(FIXTURE_YEAR, download=False, jobs=1, data_dir=fixture_data_dir)
+
+    # Workers fill the cache, then read it back
+    cache = ParsedDataCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        parallel = aggregate_transformed_generator_data(FIXTURE_YEAR, cache, download=False, jobs=2, data_dir=fixture_data_dir)
+        pd.testing.assert_frame_equal(parallel, serial)
+    assert len([name for name in os.listdir(tmp_path / "cache") if name.endswith(".npz")]) == 12
+
+
+def test_generator_output_matches_a_pivot(fixture_data_dir):
+    generator_files, _, _ = year_source_files(FIXTURE_YEAR, fixture_data_dir)
+    raw_df = parse_and_clean_generator_month(generator_files[0][1])
+
+    frame = GeneratorOutput.from_raw(raw_df).to_frame()
+
+    # The melt and pivot the array layout replaced
+    output = raw_df[raw_df["Measurement"] == "Output"].astype({"Delivery Date": str, "Generator": str, "Fuel Type": str})
+    melted = output.melt(id_vars=["Delivery Date", "Generator", "Fuel Type"], value_vars=HOUR_COLUMNS, var_name="Hour")
+    melted["Hour"] = melted["Hour"].str[5:].astype(int)
+    melted["Fuel-Generator"] = melted["Fuel Type"] + " - " + melted["Generator"]
+    reference = melted.pivot(index=["Delivery Date", "Hour"], columns="Fuel-Generator", values="value").astype(np.float32)
+    pd.testing.assert_frame_equal(frame.set_index(["Delivery Date", "Hour"]), reference, check_names=False)
+
+
+def test_generators_missing_from_a_month_are_nan():
+    hours = [str(hour) for hour in range(1, 25)]
+    january = GeneratorOutput.from_raw(parse_generator_rows("\n".join([generator_row("OLD", hours), generator_row("BOTH", hours)]).encode()))
+    february = GeneratorOutput.from_raw(parse_generator_rows(generator_row("BOTH", hours).replace("2020-01-01", "2020-02-01").encode()))
+
+    year = GeneratorOutput.concat([january, february])
+
+    assert year.columns == ["GAS - BOTH", "GAS - OLD"]
+    assert list(year.dates) == ["2020-01-01", "2020-02-01"]
+    assert np.isnan(year.values[1, :, 1]).all()
+    np.testing.assert_array_equal(year.generator_series("BOTH").to_numpy(), np.tile(np.arange(1, 25), 2))
+    round_trip = GeneratorOutput.from_frame(year.to_frame())
+    np.testing.assert_array_equal(round_trip.values, year.values)
+    assert round_trip.columns == year.columns
@@ -0,0 +1,59 @@
+"""Result files of every format read back against the computed hours."""
+
+import importlib.util
+
+import numpy as np
+import pytest
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES, assert_matches_baseline
+
+from ontario_ef.pipeline import compute_year
+from ontario_ef.results import RESULT_COLUMNS, TIME_COLUMN, read_results, write_results
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+@pytest.fixture(scope="module")
+def hourly(fixture_data_dir):
+    return compute_year(FIXTURE_YEAR, RATES, NEIGHBORS, data_dir=fixture_data_dir, download=False)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "npz", "parquet", "feather"])
+def test_result_files_read_back(hourly, tmp_path, fmt):
+    if fmt in ("parquet", "feather"):
+        pytest.importorskip("pyarrow")
+    path, = write_results(hourly, FIXTURE_YEAR, str(tmp_path), [fmt])
+
+    frame = read_results(path)
+
+    assert list(frame.columns) == list(hourly.columns)
+    assert frame[TIME_COLUMN].tolist() == hourly[TIME_COLUMN].tolist()
+    assert frame["Delivery Date"].tolist() == hourly["Delivery Date"].astype(str).tolist()
+    assert frame["Hour"].tolist() == hourly["Hour"].tolist()
+    # npz files hold float32 values
+    rtol = 1e-6 if fmt == "npz" else 0
+    for column in RESULT_COLUMNS.values():
+        np.testing.assert_allclose(frame[column].to_numpy(dtype=np.float64), hourly[column], rtol=rtol, err_msg=column)
+
+
+def test_result_files_keep_the_spot_check_columns(hourly, tmp_path, baseline):
+    path, = write_results(hourly, FIXTURE_YEAR, str(tmp_path), ["csv"])
+    spot_check = ["Total Exports (MWh)", "Total Imports (MWh)", "Total Import Emissions (t CO2e)"]
+
+    frame = read_results(path, columns=spot_check)
+
+    assert list(frame.columns) == [TIME_COLUMN, "Delivery Date", "Hour"] + spot_check
+    assert_matches_baseline(frame, baseline, spot_check)
+
+
+@pytest.mark.skipif(HAS_PYARROW, reason="pyarrow is installed")
+def test_columnar_formats_name_the_missing_dependency(hourly, tmp_path):
+    with pytest.raises(ImportError, match="pyarrow"):
+        write_results(hourly, FIXTURE_YEAR, str(tmp_path), ["parquet"])
+
+
+def test_unknown_formats_are_rejected(hourly, tmp_path):
+    with pytest.raises(ValueError, match="Unknown result format"):
+        write_results(hourly, FIXTURE_YEAR, str(tmp_path), ["xlsx"])
+    with pytest.raises(FileNotFoundError):
+        read_results(str(tmp_path / "missing.npz"))
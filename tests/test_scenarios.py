@@ -0,0 +1,36 @@
+"""Scenario evaluation against the consumption-based EF computed one scenario at a time."""
+
+import numpy as np
+
+from conftest import NEIGHBORS, RATES
+
+from ontario_ef.pipeline import calculate_consumption_based_ef, calculate_supply_based_ef
+from ontario_ef.scenarios import ScenarioBasis, sample_scenarios, scenarios_from_factors, summarize_scenarios
+
+
+def test_every_scenario_matches_the_hourly_calculation(year_data):
+    transformed_gen_data, demand_df, transformed_trade_flow = year_data
+    basis = ScenarioBasis.from_year_data(transformed_gen_data, demand_df, transformed_trade_flow)
+    scenarios = sample_scenarios(scenarios_from_factors(RATES, NEIGHBORS), 5, spread=0.5, seed=1)
+
+    ef = basis.evaluate(scenarios, chunk_size=2, dtype=np.float64)
+
+    assert ef.shape == (5, len(transformed_gen_data))
+    for i, scenario in scenarios.iterrows():
+        rates = {tech: scenario[tech] for tech in RATES}
+        neighbors = {region: scenario[region] for region in NEIGHBORS}
+        supplybased_ef, total_output_df = calculate_supply_based_ef(transformed_gen_data, rates)
+        consumption_based_ef, _ = calculate_consumption_based_ef(supplybased_ef, demand_df, transformed_trade_flow, neighbors, total_output_df)
+        np.testing.assert_allclose(ef[i], consumption_based_ef["Consumption-based EF (g CO2e/kWh)"], rtol=1e-9, atol=1e-9)
+
+
+def test_summary_weights_the_hours_by_demand(year_data):
+    basis = ScenarioBasis.from_year_data(*year_data)
+    scenarios = scenarios_from_factors(RATES, NEIGHBORS)
+
+    ef = basis.evaluate(scenarios, dtype=np.float64)
+    summary = summarize_scenarios(basis, ef, scenarios)
+
+    expected = (ef[0] * basis.demand).sum() / basis.demand.sum()
+    np.testing.assert_allclose(summary["Demand-weighted EF (g CO2e/kWh)"].iloc[0], expected, rtol=1e-12)
+    np.testing.assert_allclose(summary["Natural Gas"].iloc[0], RATES["Natural Gas"] * 1000)
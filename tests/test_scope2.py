@@ -0,0 +1,78 @@
+"""Hourly emission factors and per-meter totals of the Scope 2 calculator."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import consumption_ef_frame
+
+from ontario_ef.ef_store import HourlyEFStore, load_consumption_ef
+from ontario_ef.scope2 import calculate_scope2_emissions
+
+EF_COLUMN = "Consumption-based EF (g CO2e/kWh)"
+
+
+@pytest.fixture
+def ef_sources(tmp_path):
+    """2021-01-01/02 in the output CSVs, 2022-01-01 and one overwritten 2021 hour in the store."""
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    csv_hours = consumption_ef_frame("2021-01-01", 2, 100.0)
+    csv_hours.to_csv(output_dir / "Consumption-based_EF_2021.csv", index=False)
+
+    store_hours = pd.concat([consumption_ef_frame("2022-01-01", 1, 500.0), consumption_ef_frame("2021-01-01", 1, 900.0).iloc[:1]], ignore_index=True)
+    store_path = str(tmp_path / "hourly.efstore")
+    HourlyEFStore(store_path, writable=True).write(store_hours.rename(columns={EF_COLUMN: "consumption_ef"}))
+    return store_path, str(output_dir), csv_hours, store_hours
+
+
+def hour_offsets(frame, epoch):
+    return ((pd.to_datetime(frame["Delivery Date"]) - epoch).dt.days * 24 + frame["Hour"] - 1).to_numpy()
+
+
+def test_loader_keeps_the_years_of_the_store_and_the_csvs(ef_sources):
+    store_path, output_dir, csv_hours, store_hours = ef_sources
+
+    epoch, values = load_consumption_ef(store_path, output_dir)
+
+    expected = np.full(len(values), np.nan)
+    expected[hour_offsets(csv_hours, epoch)] = csv_hours[EF_COLUMN]
+    # Hours held by the store replace those of the CSVs
+    expected[hour_offsets(store_hours, epoch)] = store_hours[EF_COLUMN]
+    np.testing.assert_array_equal(values, expected)
+    assert values[hour_offsets(store_hours, epoch)[-1]] == 900.0
+    assert np.isfinite(values).sum() == len(csv_hours) + 24
+
+
+def test_loader_reads_the_csvs_without_a_store(ef_sources, tmp_path):
+    _, output_dir, csv_hours, _ = ef_sources
+
+    epoch, values = load_consumption_ef(str(tmp_path / "missing.efstore"), output_dir)
+
+    assert epoch == pd.Timestamp("2021-01-01")
+    np.testing.assert_array_equal(values, csv_hours[EF_COLUMN].to_numpy())
+
+
+def test_loader_without_any_source_fails(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_consumption_ef(str(tmp_path / "missing.efstore"), str(tmp_path))
+
+
+def test_months_without_emission_factors_stay_empty(ef_sources, tmp_path):
+    store_path, output_dir, csv_hours, store_hours = ef_sources
+    matched = pd.date_range("2021-01-01", periods=48, freq="h")
+    unmatched = pd.date_range("2030-03-01", periods=24, freq="h")
+    profile_path = tmp_path / "meters.csv"
+    pd.DataFrame({"meter_id": "A", "timestamp": matched.append(unmatched), "kwh": 2.0}).to_csv(profile_path, index=False)
+
+    summary = calculate_scope2_emissions(str(profile_path), out_dir=str(tmp_path / "scope2"), chunksize=10,
+                                         store_path=store_path, ef_output_dir=output_dir)
+
+    monthly = pd.read_csv(tmp_path / "scope2" / "scope2_monthly.csv").set_index(["Year", "Month"])
+    ef = csv_hours[EF_COLUMN].to_numpy().copy()
+    ef[0] = store_hours[EF_COLUMN].iloc[-1]
+    assert monthly.loc[(2021, 1), "Emissions (t CO2e)"] == pytest.approx(2.0 * ef.sum() / 1e6, rel=1e-12)
+    assert monthly.loc[(2021, 1), "Unmatched Hours"] == 0
+    assert np.isnan(monthly.loc[(2030, 3), "Emissions (t CO2e)"])
+    assert monthly.loc[(2030, 3), "Unmatched Hours"] == 24
+    assert summary["unmatched_hours"] == 24
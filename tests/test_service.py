@@ -0,0 +1,120 @@
+"""Request handling, aggregate cache and hot reload of the emission factor service."""
+
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+from conftest import consumption_ef_frame
+
+from ontario_ef.ef_store import HourlyEFStore
+from ontario_ef.service import EFService
+
+EF_COLUMN = "Consumption-based EF (g CO2e/kWh)"
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Service over 2021-01-01 in an output CSV and 2022-01-01 in the store, without background reloads."""
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    consumption_ef_frame("2021-01-01", 1, 100.0).to_csv(output_dir / "Consumption-based_EF_2021.csv", index=False)
+    store_path = str(tmp_path / "hourly.efstore")
+    HourlyEFStore(store_path, writable=True).write(consumption_ef_frame("2022-01-01", 1, 500.0).rename(columns={EF_COLUMN: "consumption_ef"}))
+    return EFService(store_path, str(output_dir), cache_size=4, reload_interval=0)
+
+
+def get(service, target):
+    return service.dispatch("GET", target, b"")
+
+
+def post_batch(service, times):
+    return service.dispatch("POST", "/batch", json.dumps({"times": times}).encode())
+
+
+def test_lookups_cover_the_store_and_the_csvs(service):
+    assert get(service, "/ef?time=2021-01-01T05:30") == (200, {"hour_start": "2021-01-01T05:00:00", "consumption_ef": 105.0})
+    assert get(service, "/ef?time=2022-01-02T00:00-04:00")[1]["consumption_ef"] == 523.0
+    assert post_batch(service, ["2022-01-01T01:10", "2021-01-01T23:00", "2030-01-01T00:00"]) == (200, {"consumption_ef": [501.0, 123.0, None]})
+    # Timestamps with different UTC offsets are converted one at a time
+    assert post_batch(service, ["2021-01-01T03:00-05:00", "2021-01-01T04:00-04:00"]) == (200, {"consumption_ef": [103.0, 103.0]})
+
+
+@pytest.mark.parametrize("times, position", [
+    ([None], 0),
+    (["2021-01-01T00:00", 1609459200], 1),
+    (["2021-01-01T00:00", "2021-01-01T01:00", "yesterday"], 2),
+    (["2021-01-01T00:00-05:00", "2021-01-01T00:00+01:00", "NaT"], 2),
+    (["NaT"], 0),
+])
+def test_batch_rejects_entries_that_are_not_timestamps(service, times, position):
+    status, payload = post_batch(service, times)
+
+    assert status == 400
+    assert payload["error"].startswith(f"times[{position}] is not an ISO 8601 timestamp")
+
+
+@pytest.mark.parametrize("method, target, body, status", [
+    ("GET", "/ef", b"", 400),
+    ("GET", "/ef?time=noon", b"", 400),
+    ("POST", "/batch", b"{not json", 400),
+    ("POST", "/batch", b'{"times": "2021-01-01"}', 400),
+    ("GET", "/aggregate?period=week", b"", 400),
+    ("GET", "/batch", b"", 405),
+    ("GET", "/unknown", b"", 404),
+])
+def test_bad_requests_get_client_errors(service, method, target, body, status):
+    assert service.dispatch(method, target, body)[0] == status
+
+
+def test_aggregates_are_cached_until_a_reload(service, tmp_path):
+    first = get(service, "/aggregate?period=year&how=max")
+    assert first == (200, {"period": "year", "how": "max", "results": [{"year": 2021, "consumption_ef": 123.0},
+                                                                        {"year": 2022, "consumption_ef": 523.0}]})
+    assert get(service, "/aggregate?period=year&how=max") == first
+    get(service, "/aggregate?period=month")
+    assert service.cache.stats() == {"size": 2, "maxsize": 4, "hits": 1, "misses": 2}
+
+    # A new output CSV is picked up although the store exists, and the cache starts over
+    consumption_ef_frame("2023-01-01", 1, 900.0).to_csv(tmp_path / "output" / "Consumption-based_EF_2023.csv", index=False)
+    assert asyncio.run(service.reload_if_changed())
+    assert not asyncio.run(service.reload_if_changed())
+    assert service.cache.stats()["size"] == 0
+    assert get(service, "/aggregate?period=year&how=max")[1]["results"][-1] == {"year": 2023, "consumption_ef": 923.0}
+    assert get(service, "/ef?time=2023-01-01T02:00")[1]["consumption_ef"] == 902.0
+
+
+def test_changed_csv_values_are_reloaded(service, tmp_path):
+    consumption_ef_frame("2021-01-01", 1, 200.0).to_csv(tmp_path / "output" / "Consumption-based_EF_2021.csv", index=False)
+
+    assert asyncio.run(service.reload_if_changed())
+    assert get(service, "/ef?time=2021-01-01T05:30")[1]["consumption_ef"] == 205.0
+    assert service.health()["reloads"] == 1
+
+
+def test_http_requests_on_one_connection(service):
+    async def exchange():
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for request in (b"GET /ef?time=2021-01-01T01:00 HTTP/1.1\r\nHost: test\r\n\r\n",
+                        b'POST /batch HTTP/1.1\r\nHost: test\r\nContent-Length: 15\r\n\r\n{"times": [7]}\n'):
+            writer.write(request)
+            status_line = await reader.readline()
+            headers = {}
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode().partition(":")
+                headers[name.lower()] = value.strip()
+            body = await reader.readexactly(int(headers["content-length"]))
+            responses.append((status_line.split()[1], json.loads(body)))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    (ok, found), (bad, error) = asyncio.run(exchange())
+    assert (ok, found["consumption_ef"]) == (b"200", 101.0)
+    assert bad == b"400"
+    assert error["error"] == "times[0] is not an ISO 8601 timestamp: 7."
@@ -0,0 +1,57 @@
+"""The month-by-month streaming mode against the batch mode."""
+
+import filecmp
+import os
+
+import pytest
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES
+
+from ontario_ef import streaming
+from ontario_ef.pipeline import consumption_ef_path, run_year, run_years
+from ontario_ef.results import results_path
+from ontario_ef.streaming import run_year_streaming
+
+
+@pytest.mark.parametrize("run", ["run_year", "run_years"])
+def test_streaming_outputs_are_identical_to_batch(fixture_data_dir, tmp_path, run):
+    formats = ["npz", "csv"]
+    outputs = {}
+    for stream in (False, True):
+        output_dir = str(tmp_path / ("stream" if stream else "batch"))
+        store_path = os.path.join(output_dir, "hourly.efstore")
+        if run == "run_year":
+            year_run = run_year_streaming if stream else run_year
+            year_run(FIXTURE_YEAR, RATES, NEIGHBORS, store_path=store_path, result_formats=formats, output_dir=output_dir,
+                     data_dir=fixture_data_dir, download=False)
+        else:
+            statuses = run_years([FIXTURE_YEAR], RATES, NEIGHBORS, jobs=1, store_path=store_path, result_formats=formats, stream=stream,
+                                 output_dir=output_dir, data_dir=fixture_data_dir)
+            assert statuses[FIXTURE_YEAR][0] == "written"
+        outputs[stream] = [consumption_ef_path(output_dir, FIXTURE_YEAR), store_path] + [results_path(output_dir, FIXTURE_YEAR, fmt) for fmt in formats]
+
+    for batch_path, stream_path in zip(outputs[False], outputs[True]):
+        assert filecmp.cmp(batch_path, stream_path, shallow=False), batch_path
+
+
+def test_failed_stream_leaves_outputs_untouched(fixture_workdir, monkeypatch):
+    output_dir = os.path.join("data", "stream")
+    store_path = os.path.join(output_dir, "stream.efstore")
+    run_year_streaming(FIXTURE_YEAR, RATES, NEIGHBORS, store_path=store_path, output_dir=output_dir, download=False)
+    before = {name: open(os.path.join(output_dir, name), "rb").read() for name in os.listdir(output_dir)}
+
+    months = streaming.iter_year_months
+
+    def failing_months(*args, **kwargs):
+        for month, frames in enumerate(months(*args, **kwargs), start=1):
+            if month == 3:
+                raise RuntimeError("report unavailable")
+            yield frames
+
+    monkeypatch.setattr(streaming, "iter_year_months", failing_months)
+    with pytest.raises(RuntimeError):
+        run_year_streaming(FIXTURE_YEAR, {**RATES, "Natural Gas": 0.4}, NEIGHBORS, force=True, store_path=store_path, output_dir=output_dir,
+                           download=False)
+
+    assert {name: open(os.path.join(output_dir, name), "rb").read() for name in os.listdir(output_dir)} == before
+    assert os.path.exists(consumption_ef_path(output_dir, FIXTURE_YEAR))
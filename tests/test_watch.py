@@ -0,0 +1,90 @@
+"""Reading appended report rows, and the current year extended poll by poll against a full run."""
+
+import os
+
+import pandas as pd
+
+from conftest import FIXTURE_YEAR, NEIGHBORS, RATES, assert_matches_baseline
+
+from ontario_ef.pipeline import consumption_ef_path, year_source_files
+from ontario_ef.watch import ReportTail, YearWatcher
+
+HEADER = b"\\\\Hourly Demand Report,,,\n\\\\Created at 2025-01-01 07:30:13,,,\n\\\\For 2025,,,\nDate,Hour,Market Demand,Ontario Demand\n"
+ROWS = [b"2025-01-01,%d,16000,13000\n" % hour for hour in range(1, 7)]
+
+
+def write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def test_report_tail_returns_each_complete_row_once(tmp_path):
+    path = str(tmp_path / "PUB_Demand_2025.csv")
+    tail = ReportTail(path)
+    assert tail.read() == (b"", False)
+
+    write(path, HEADER + ROWS[0] + ROWS[1] + ROWS[2][:10])
+    assert tail.read() == (ROWS[0] + ROWS[1], True)
+    assert tail.offset == len(HEADER) + len(ROWS[0] + ROWS[1])
+    assert tail.header_lines()[-1] == "Date,Hour,Market Demand,Ontario Demand\n"
+
+    # The rewritten report has a new creation time and the rest of the partial row
+    write(path, HEADER.replace(b"07:30:13", b"08:30:13") + b"".join(ROWS[:4]))
+    assert tail.read() == (ROWS[2] + ROWS[3], False)
+    assert tail.read() == (b"", False)
+
+
+def test_report_tail_starts_over_after_a_revision(tmp_path):
+    path = str(tmp_path / "PUB_Demand_2025.csv")
+    tail = ReportTail(path)
+    write(path, HEADER + b"".join(ROWS[:3]))
+    tail.read()
+
+    revised = [ROWS[0], ROWS[1], ROWS[2].replace(b"16000", b"16001"), ROWS[3]]
+    write(path, HEADER + b"".join(revised))
+
+    assert tail.read() == (b"".join(revised), True)
+
+
+def stage(source, destination, rows=None, partial=0):
+    """Copy the header and first ``rows`` data rows (all by default) of ``source``, then ``partial`` bytes of the next row."""
+    with open(source, "rb") as f:
+        lines = f.readlines()
+    end = len(lines) if rows is None else next(index for index, line in enumerate(lines) if line[:1].isdigit()) + rows
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    write(destination, b"".join(lines[:end]) + b"".join(lines[end:end + 1])[:partial])
+
+
+def test_polls_of_staged_reports_match_a_full_run(fixture_data_dir, tmp_path, baseline):
+    data_dir = str(tmp_path / "IESO")
+    output_dir = str(tmp_path / "output")
+    source_files = year_source_files(FIXTURE_YEAR, fixture_data_dir)
+    staged_files = year_source_files(FIXTURE_YEAR, data_dir)
+    sources = {"generator": source_files[0][0][1], "demand": source_files[1][1], "trade_flow": source_files[2][1]}
+    destinations = {"generator": staged_files[0][0][1], "demand": staged_files[1][1], "trade_flow": staged_files[2][1]}
+    with open(sources["generator"], "rb") as f:
+        first_day_rows = sum(line.startswith(b"%d-01-01" % FIXTURE_YEAR) for line in f)
+
+    watcher = YearWatcher(FIXTURE_YEAR, RATES, NEIGHBORS, data_dir=data_dir, output_dir=output_dir, store_path=None, result_formats=())
+    assert watcher.poll() == 0
+
+    # The generator rows of the first day, and some hours of demand and flows ending in a partial row
+    stage(sources["generator"], destinations["generator"], first_day_rows)
+    stage(sources["demand"], destinations["demand"], 10)
+    stage(sources["trade_flow"], destinations["trade_flow"], 30, partial=12)
+    assert watcher.poll() == 10
+    assert watcher.poll() == 0
+
+    # Demand and flows past the first day: the generator rows bound the hours
+    stage(sources["demand"], destinations["demand"], 40, partial=5)
+    stage(sources["trade_flow"], destinations["trade_flow"], 40)
+    assert watcher.poll() == 14
+
+    # The full reports: the second day completes the hours of January that are in the fixture
+    for name in sources:
+        stage(sources[name], destinations[name])
+    assert watcher.poll() == 24
+
+    written = pd.read_csv(consumption_ef_path(output_dir, FIXTURE_YEAR), dtype={"Delivery Date": str})
+    assert_matches_baseline(written, baseline.head(48), ["Consumption-based EF (g CO2e/kWh)"])
+    assert YearWatcher(FIXTURE_YEAR, RATES, NEIGHBORS, data_dir=data_dir, output_dir=output_dir).last_hour == 47
@@ -0,0 +1,56 @@
+"""Zonal emission factors against the province-wide consumption-based EF."""
+
+import numpy as np
+import pytest
+
+from conftest import NEIGHBORS, RATES
+
+from ontario_ef.pipeline import calculate_consumption_based_ef, calculate_supply_based_ef
+from ontario_ef.zonal import calculate_zonal_ef
+
+
+def zone_maps(transformed_gen_data, transformed_trade_flow, zone_of):
+    """Generator and intertie zone mappings, with ``zone_of(i, name)`` choosing the zone of the i-th name."""
+    generators = [str(col).split(" - ", 1)[-1].upper() for col in transformed_gen_data.columns[2:]]
+    interties = [col.split(" ")[0] for col in transformed_trade_flow.columns if col not in ["Date", "Hour"]]
+    return {name: zone_of(i, name) for i, name in enumerate(generators)}, {name: zone_of(i, name) for i, name in enumerate(interties)}
+
+
+def test_a_single_zone_matches_the_provincial_ef(year_data):
+    transformed_gen_data, demand_df, transformed_trade_flow = year_data
+    zonal_demand_df = demand_df[["Date", "Hour"]].assign(Province=demand_df["Ontario Demand"])
+    generator_zone_map, intertie_zone_map = zone_maps(transformed_gen_data, transformed_trade_flow, lambda i, name: "Province")
+
+    zonal_ef = calculate_zonal_ef(transformed_gen_data, zonal_demand_df, transformed_trade_flow, RATES, NEIGHBORS,
+                                  generator_zone_map, intertie_zone_map)
+
+    supplybased_ef, total_output_df = calculate_supply_based_ef(transformed_gen_data, RATES)
+    consumption_based_ef, _ = calculate_consumption_based_ef(supplybased_ef, demand_df, transformed_trade_flow, NEIGHBORS, total_output_df)
+    assert list(zonal_ef.columns) == ["Delivery Date", "Hour", "Province EF (g CO2e/kWh)"]
+    np.testing.assert_allclose(zonal_ef["Province EF (g CO2e/kWh)"], consumption_based_ef["Consumption-based EF (g CO2e/kWh)"],
+                               rtol=1e-12, atol=1e-9)
+
+
+def test_zones_without_supply_draw_from_the_pool(year_data):
+    transformed_gen_data, demand_df, transformed_trade_flow = year_data
+    # Every generator and intertie is in East; West only has demand, which East's surplus covers
+    zonal_demand_df = demand_df[["Date", "Hour"]].assign(East=demand_df["Ontario Demand"] * 0.5, West=10.0)
+    generator_zone_map, intertie_zone_map = zone_maps(transformed_gen_data, transformed_trade_flow, lambda i, name: "East")
+
+    zonal_ef = calculate_zonal_ef(transformed_gen_data, zonal_demand_df, transformed_trade_flow, RATES, NEIGHBORS,
+                                  generator_zone_map, intertie_zone_map)
+
+    # West consumes East's generation at East's supply-based EF
+    supplybased_ef, _ = calculate_supply_based_ef(transformed_gen_data, RATES)
+    np.testing.assert_allclose(zonal_ef["West EF (g CO2e/kWh)"], supplybased_ef["Supply-based EF (g CO2e/kWh)"], rtol=1e-12)
+
+
+def test_generators_without_a_zone_are_rejected(year_data):
+    transformed_gen_data, demand_df, transformed_trade_flow = year_data
+    zonal_demand_df = demand_df[["Date", "Hour"]].assign(Province=demand_df["Ontario Demand"])
+    generator_zone_map, intertie_zone_map = zone_maps(transformed_gen_data, transformed_trade_flow, lambda i, name: "Province")
+    del generator_zone_map[next(iter(generator_zone_map))]
+
+    with pytest.raises(ValueError, match="No zone for 1 generators"):
+        calculate_zonal_ef(transformed_gen_data, zonal_demand_df, transformed_trade_flow, RATES, NEIGHBORS,
+                           generator_zone_map, intertie_zone_map)